@@ -0,0 +1,177 @@
+"""
+Measure the CPU spent per request turning the hot-path read queries into SQL.
+
+Compares building the statement on every request, as the repositories used to,
+with the module-level statements they now reuse. Statement preparation covers
+building the statement, generating its cache key and looking up (or, on a cache
+miss, producing) the compiled SQL. The end-to-end figures also include running
+the query against the test database, with and without server-side prepared
+statements.
+
+Run with:
+
+    python -m benchmarks.query_compilation [iterations]
+"""
+
+import sys
+import time
+from typing import Callable
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session, contains_eager
+
+from daap_api.config import settings
+from daap_api.db import Base, create_database_engine
+from daap_api.models.orm import metadata_repositories
+from daap_api.models.orm.metadata_orm_models import (
+    DataProductTable,
+    DataProductVersionTable,
+    SchemaTable,
+    Status,
+)
+from daap_api.models.orm.metadata_repositories import (
+    DataProductRepository,
+    SchemaRepository,
+)
+
+
+def inline_fetch_latest(name: str):
+    """
+    The statement DataProductRepository.fetch_latest used to build per request
+    """
+    return (
+        select(DataProductVersionTable)
+        .select_from(DataProductTable)
+        .join(DataProductVersionTable, DataProductTable.current_version)
+        .filter_by(name=name)
+        .options(contains_eager(DataProductVersionTable.data_product))
+    )
+
+
+def inline_fetch_latest_schema(data_product_name: str, table_name: str):
+    """
+    The statement SchemaRepository.fetch_latest used to build per request
+    """
+    return (
+        select(SchemaTable)
+        .select_from(DataProductTable)
+        .join(DataProductVersionTable, DataProductTable.current_version)
+        .join(SchemaTable, SchemaTable.data_product_id == DataProductVersionTable.id)
+        .where(SchemaTable.name == table_name)
+        .where(DataProductVersionTable.name == data_product_name)
+    )
+
+
+def cpu_per_call(function: Callable[[], object], iterations: int) -> float:
+    """
+    Mean CPU time in microseconds, after a warm up call to fill caches
+    """
+    function()
+    start = time.process_time()
+    for _ in range(iterations):
+        function()
+    return (time.process_time() - start) / iterations * 1_000_000
+
+
+def statement_preparation(engine, iterations: int):
+    dialect = engine.dialect
+    compiled_cache = {}
+
+    def prepare(statement):
+        statement._compile_w_cache(
+            dialect, compiled_cache=compiled_cache, column_keys=[]
+        )
+
+    return {
+        "DataProductRepository.fetch_latest": (
+            cpu_per_call(
+                lambda: prepare(inline_fetch_latest("hmpps_use_of_force")),
+                iterations,
+            ),
+            cpu_per_call(
+                lambda: prepare(metadata_repositories._fetch_latest_data_product),
+                iterations,
+            ),
+        ),
+        "SchemaRepository.fetch_latest": (
+            cpu_per_call(
+                lambda: prepare(
+                    inline_fetch_latest_schema("hmpps_use_of_force", "statements")
+                ),
+                iterations,
+            ),
+            cpu_per_call(
+                lambda: prepare(metadata_repositories._fetch_latest_schema),
+                iterations,
+            ),
+        ),
+    }
+
+
+def end_to_end(engine, iterations: int):
+    with Session(engine) as session:
+
+        def before():
+            session.execute(inline_fetch_latest("hmpps_use_of_force")).scalar()
+            session.execute(
+                inline_fetch_latest_schema("hmpps_use_of_force", "statements")
+            ).scalar()
+            session.expunge_all()
+
+        def after():
+            DataProductRepository(session).fetch_latest("hmpps_use_of_force")
+            SchemaRepository(session).fetch_latest("hmpps_use_of_force", "statements")
+            session.expunge_all()
+
+        return cpu_per_call(before, iterations), cpu_per_call(after, iterations)
+
+
+def seed(engine):
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        version = DataProductVersionTable(
+            name="hmpps_use_of_force",
+            version="v1.0",
+            description="Data product for hmpps_use_of_force dev data",
+            domain="HMPPS",
+            data_product_owner="dataplatformlabs@digital.justice.gov.uk",
+            data_product_owner_display_name="Data Platform Labs",
+            email="dataplatformlabs@digital.justice.gov.uk",
+            status=Status.draft,
+            retention_period=3000,
+            dpia_required=False,
+        )
+        version.schemas.append(
+            SchemaTable(
+                name="statements",
+                table_description="Statements made by officers",
+                columns=[{"name": "id", "type": "int", "description": "ID"}],
+            )
+        )
+        session.add(DataProductTable(name=version.name, current_version=version))
+        session.commit()
+
+
+def main(iterations: int):
+    engine = create_database_engine(settings.database_url_test)
+    seed(engine)
+
+    print(f"CPU per request in microseconds, mean of {iterations} requests\n")
+    print(f"{'Statement preparation':<40}{'before':>10}{'after':>10}")
+    for name, (before, after) in statement_preparation(engine, iterations).items():
+        print(f"{name:<40}{before:>10.1f}{after:>10.1f}")
+
+    print(f"\n{'End to end, both reads':<40}{'before':>10}{'after':>10}")
+    for prepare_threshold in (None, settings.database_prepare_threshold):
+        settings.database_prepare_threshold = prepare_threshold
+        engine = create_database_engine(settings.database_url_test)
+        before, after = end_to_end(engine, iterations)
+        label = f"prepare_threshold={prepare_threshold}"
+        print(f"{label:<40}{before:>10.1f}{after:>10.1f}")
+
+    Base.metadata.drop_all(engine)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
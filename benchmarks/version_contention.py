@@ -0,0 +1,108 @@
+"""
+Measure the throughput of concurrent updates to a single data product.
+
+Each of N writers repeatedly updates the description of the same data product,
+once through the previous update path, which read the current version without
+locking it, and once through DataProductRepository.update_latest. For each,
+reports updates per second, and how many updates failed.
+
+Run with:
+
+    python -m benchmarks.version_contention [updates per writer]
+"""
+
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy.orm import Session
+
+from daap_api.config import settings
+from daap_api.db import Base, create_database_engine
+from daap_api.models.orm.metadata_orm_models import DataProductVersionTable, Status
+from daap_api.models.orm.metadata_repositories import DataProductRepository
+from daap_api.services.versioning_service import VersioningService
+
+WRITERS = (1, 2, 4, 8, 16)
+NAME = "hmpps_use_of_force"
+
+
+def unlocked_update(session: Session, description: str):
+    repo = DataProductRepository(session)
+    current_metadata = repo.fetch_latest(NAME)
+    new_version = VersioningService(current_metadata).update_metadata(
+        description=description
+    )
+    repo.update(current_metadata.data_product, new_version)
+
+
+def locked_update(session: Session, description: str):
+    DataProductRepository(session).update_latest(
+        NAME,
+        lambda current_metadata: VersioningService(current_metadata).update_metadata(
+            description=description
+        ),
+    )
+
+
+def run(engine, update, writers: int, updates: int) -> tuple[float, int]:
+    def writer(number: int) -> int:
+        failed = 0
+        with Session(engine) as session:
+            for n in range(updates):
+                try:
+                    update(session, f"update {n} from writer {number}")
+                except DataProductRepository.IntegrityError:
+                    session.rollback()
+                    failed += 1
+                session.expire_all()
+        return failed
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=writers) as executor:
+        failed = sum(executor.map(writer, range(writers)))
+    elapsed = time.perf_counter() - start
+
+    return (writers * updates - failed) / elapsed, failed
+
+
+def seed(engine):
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    # Statements prepared on pooled connections refer to the dropped types
+    engine.dispose()
+    with Session(engine) as session:
+        DataProductRepository(session).create(
+            DataProductVersionTable(
+                name=NAME,
+                description="Data product for hmpps_use_of_force dev data",
+                domain="HMPPS",
+                data_product_owner="dataplatformlabs@digital.justice.gov.uk",
+                data_product_owner_display_name="Data Platform Labs",
+                email="dataplatformlabs@digital.justice.gov.uk",
+                status=Status.draft,
+                retention_period=3000,
+                dpia_required=False,
+            )
+        )
+
+
+def main(updates: int):
+    engine = create_database_engine(settings.database_url_test, pool_size=max(WRITERS))
+
+    print(f"{updates} updates per writer\n")
+    print(f"{'':<10}{'unlocked':>24}{'update_latest':>24}")
+    print(f"{'writers':<10}" + f"{'updates/s':>14}{'failed':>10}" * 2)
+    for writers in WRITERS:
+        row = f"{writers:<10}"
+        for update in (unlocked_update, locked_update):
+            seed(engine)
+            throughput, failed = run(engine, update, writers, updates)
+            row += f"{throughput:>14.1f}{failed:>10}"
+        print(row)
+
+    Base.metadata.drop_all(engine)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20)
@@ -1,7 +1,12 @@
-from typing import Generator, Self
+import itertools
+import re
+import time
+from typing import Generator, Optional, Self, Sequence
 
-from fastapi import Depends
-from sqlalchemy import create_engine
+import structlog
+from fastapi import Depends, HTTPException, Request, status
+from sqlalchemy import Engine, create_engine, event, text
+from sqlalchemy.exc import OperationalError
 from sqlalchemy.orm import DeclarativeBase, Session
 
 
@@ -31,7 +36,109 @@ class Base(DeclarativeBase):
 
 from .config import settings
 
-engine = create_engine(settings.database_url, echo=True)
+logger = structlog.get_logger(__name__)
+
+# Returned from writes, and accepted by reads, to guarantee reads see earlier writes
+CONSISTENCY_TOKEN_HEADER = "X-Consistency-Token"
+LSN_REGEX = re.compile(r"^[0-9A-Fa-f]{1,8}/[0-9A-Fa-f]{1,8}$")
+
+
+class SessionRouter:
+    """
+    Chooses which database a session should use. Writes always go to the primary,
+    while reads are spread across read replicas if any are configured.
+
+    A write returns a consistency token: the primary's WAL position after commit.
+    A read that presents the token is only sent to a replica once that replica
+    has replayed up to the token, waiting up to wait_timeout seconds before
+    falling back to the primary.
+    """
+
+    def __init__(
+        self,
+        primary: Engine,
+        replicas: Sequence[Engine] = (),
+        wait_timeout: float = 0.5,
+        poll_interval: float = 0.01,
+    ):
+        self.primary = primary
+        self.replicas = list(replicas)
+        self.wait_timeout = wait_timeout
+        self.poll_interval = poll_interval
+        self._replica_cycle = itertools.cycle(self.replicas)
+
+    def read_engine(self, consistency_token: Optional[str] = None) -> Engine:
+        if not self.replicas:
+            return self.primary
+
+        replica = next(self._replica_cycle)
+        if consistency_token is None:
+            return replica
+
+        deadline = time.monotonic() + self.wait_timeout
+        try:
+            while not self.has_replayed(replica, consistency_token):
+                if time.monotonic() >= deadline:
+                    logger.info("Replica is lagging - reading from the primary")
+                    return self.primary
+                time.sleep(self.poll_interval)
+        except OperationalError:
+            logger.exception("Replica is unavailable - reading from the primary")
+            return self.primary
+
+        return replica
+
+    @staticmethod
+    def has_replayed(engine: Engine, consistency_token: str) -> bool:
+        """
+        Whether a replica has replayed the WAL up to the consistency token.
+        A database that is not in recovery is not replicating, so is always up to date.
+        """
+        with engine.connect() as connection:
+            return connection.execute(
+                text(
+                    "SELECT NOT pg_is_in_recovery() "
+                    "OR pg_last_wal_replay_lsn() >= CAST(:token AS pg_lsn)"
+                ),
+                {"token": consistency_token},
+            ).scalar()
+
+    @staticmethod
+    def consistency_token(session: Session) -> str:
+        """
+        A token that a later read can present to see everything committed so far
+        """
+        return session.execute(
+            text("SELECT CAST(pg_current_wal_lsn() AS text)")
+        ).scalar()
+
+
+def create_database_engine(url: str, **kwargs) -> Engine:
+    """
+    Create an engine that prepares frequently run queries on the server,
+    so that Postgres doesn't need to parse and plan them on every request
+    """
+    engine = create_engine(
+        url,
+        query_cache_size=settings.database_query_cache_size,
+        connect_args={"prepare_threshold": settings.database_prepare_threshold},
+        **kwargs,
+    )
+
+    @event.listens_for(engine, "connect")
+    def set_prepared_max(dbapi_connection, connection_record):
+        dbapi_connection.prepared_max = settings.database_prepared_max
+
+    return engine
+
+
+engine = create_database_engine(settings.database_url, echo=True)
+replica_engines = [
+    create_database_engine(url, echo=True) for url in settings.database_replica_urls
+]
+session_router = SessionRouter(
+    engine, replica_engines, wait_timeout=settings.replica_wait_timeout_seconds
+)
 
 
 def get_session() -> Generator[Session, None, None]:
@@ -42,4 +149,20 @@ def get_session() -> Generator[Session, None, None]:
         yield session
 
 
+def get_read_session(request: Request) -> Generator[Session, None, None]:
+    """
+    FastAPI dependency for a read-only ORM session, which may use a read replica
+    """
+    consistency_token = request.headers.get(CONSISTENCY_TOKEN_HEADER)
+    if consistency_token is not None and not LSN_REGEX.match(consistency_token):
+        raise HTTPException(
+            status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid {CONSISTENCY_TOKEN_HEADER}: {consistency_token}",
+        )
+
+    with Session(session_router.read_engine(consistency_token)) as session:
+        yield session
+
+
 session_dependency = Depends(get_session)
+read_session_dependency = Depends(get_read_session)
@@ -12,7 +12,29 @@ from idempotency_header_middleware.backends import MemoryBackend
 from pydantic import AnyHttpUrl, computed_field
 
 from .config import settings, setup_logging
-from .routers import metadata_router
+from .models.orm.metadata_repositories import VERSION_CREATED_JOB
+from .routers import (
+    events_router,
+    jobs_router,
+    metadata_router,
+    subscriptions_router,
+    table_stats_router,
+    uploads_router,
+)
+from .services.analytics_export import analytics_exporter
+from .services.catalogue_snapshot import catalogue_cache
+from .services.change_listener import change_listener
+from .services.change_notifications import (
+    DELIVER_NOTIFICATIONS_JOB,
+    notification_dispatcher,
+    notify_version_created,
+)
+from .services.event_broker import event_broker
+from .services.glue_sync import glue_sync
+from .services.job_queue import job_workers
+from .services.stats_buffer import stats_buffer
+from .services.stats_refresh import stats_refresher
+from .services.version_archiver import version_archiver
 
 IDEMPOTENT_KEY_METHODS = ["POST", "PATCH"]
 ID_REGEX = re.compile(
@@ -29,8 +51,43 @@ async def lifespan(app: FastAPI):
     log = structlog.get_logger(__name__)
     log.info("example")
 
+    if settings.catalogue_snapshot_enabled:
+        change_listener.subscribe(catalogue_cache)
+    if settings.catalogue_events_enabled:
+        change_listener.subscribe(event_broker)
+    if settings.job_workers_enabled:
+        job_workers.register(VERSION_CREATED_JOB, notify_version_created)
+        job_workers.register(
+            DELIVER_NOTIFICATIONS_JOB, notification_dispatcher.dispatch
+        )
+        change_listener.subscribe(job_workers)
+        job_workers.start()
+    if settings.glue_sync_enabled:
+        change_listener.subscribe(glue_sync)
+        glue_sync.start()
+    if settings.version_archive_enabled:
+        version_archiver.start()
+    if settings.analytics_export_enabled:
+        analytics_exporter.start()
+    if settings.table_stats_buffer_enabled:
+        stats_buffer.start()
+    if settings.stats_refresh_enabled:
+        change_listener.subscribe(stats_refresher)
+        stats_refresher.start()
+    if change_listener.subscribers:
+        change_listener.start()
+
     yield
 
+    event_broker.close()
+    await change_listener.stop()
+    await job_workers.stop()
+    await glue_sync.stop()
+    await version_archiver.stop()
+    await analytics_exporter.stop()
+    await stats_buffer.stop()
+    await stats_refresher.stop()
+
 
 app = FastAPI(
     lifespan=lifespan,  # type: ignore
@@ -42,6 +99,11 @@ app = FastAPI(
 )
 
 app.include_router(metadata_router.v1_router)
+app.include_router(events_router.v1_router)
+app.include_router(jobs_router.v1_router)
+app.include_router(subscriptions_router.v1_router)
+app.include_router(uploads_router.v1_router)
+app.include_router(table_stats_router.v1_router)
 
 if settings.BACKEND_CORS_ORIGINS:
     app.add_middleware(
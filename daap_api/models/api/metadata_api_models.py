@@ -1,9 +1,20 @@
-from typing import Optional
-
-from pydantic import BaseModel, ConfigDict, Field
+from datetime import datetime, timezone
+from typing import Annotated, Optional, Union
+
+from pydantic import (
+    AnyHttpUrl,
+    BaseModel,
+    ConfigDict,
+    Field,
+    field_validator,
+    model_validator,
+)
 from pydantic.alias_generators import to_camel
 
-from ..orm.metadata_orm_models import Status
+from ..orm.metadata_orm_models import ChangeType, Status
+
+# S3 numbers the parts of a multipart upload from 1 to 10,000
+MAX_UPLOAD_PART_NUMBER = 10000
 
 
 class Column(BaseModel):
@@ -44,6 +55,36 @@ class SchemaRead(SchemaBase):
     id: str
 
 
+class SchemaInferenceRequest(BaseModel):
+    """
+    A Parquet file to infer a schema from: either a file in S3, or a file
+    uploaded to the landing zone
+    """
+
+    model_config = ConfigDict(alias_generator=to_camel, extra="forbid")
+
+    location: Optional[str] = Field(
+        default=None,
+        pattern=r"^s3://[^/]+/.+$",
+        json_schema_extra={
+            "example": "s3://data-development/curated/hmpps_use_of_force/statement/part-0.parquet"
+        },
+    )
+    upload_key: Optional[str] = Field(
+        default=None,
+        description="The key of a completed upload",
+        json_schema_extra={
+            "example": "hmpps_use_of_force/statement/0f6c.../statement.parquet"
+        },
+    )
+
+    @model_validator(mode="after")
+    def check_one_file(self) -> "SchemaInferenceRequest":
+        if (self.location is None) == (self.upload_key is None):
+            raise ValueError("Exactly one of location and uploadKey is required")
+        return self
+
+
 class DataProductBase(BaseModel):
     """
     Base fields that are readable and writable
@@ -150,9 +191,9 @@ class DataProductRead(DataProductBase):
         json_schema_extra={"example": "my_data_product"},
     )
 
-    schemas: list[SchemaId] = Field(
+    schemas: list[Union[SchemaRead, SchemaId]] = Field(
         default_factory=list,
-        description="List of schemas defined for this data product",
+        description="List of schemas defined for this data product. These are IDs only, unless schemas are expanded.",
     )
 
     version: str = Field(
@@ -165,14 +206,487 @@ class DataProductRead(DataProductBase):
     )
 
     @staticmethod
-    def from_model(model):
+    def from_model(model, expand_schemas=False):
         value = DataProductRead.model_validate(model.to_attributes())
         if model.data_product is not None:
             value.id = model.data_product.external_id
-        value.schemas = [SchemaId(id=schema.external_id) for schema in model.schemas]
+        if expand_schemas:
+            value.schemas = [
+                SchemaRead.model_validate(schema.to_attributes())
+                for schema in model.schemas
+            ]
+        else:
+            value.schemas = [
+                SchemaId(id=schema.external_id) for schema in model.schemas
+            ]
 
         return value
 
+    @staticmethod
+    def sparse_dump_from_model(model, fields: set[str], expand_schemas=False) -> dict:
+        """
+        Serialize only the requested fields of a data product.
+
+        The model only needs the columns backing those fields to be loaded,
+        so callers can prune their queries to match.
+        """
+        values = {}
+        for field in fields:
+            if field == "id":
+                values["id"] = f"dp:{model.name}"
+            elif field == "schemas":
+                values["schemas"] = [
+                    SchemaRead.model_validate(schema.to_attributes())
+                    if expand_schemas
+                    else SchemaId(id=schema.external_id)
+                    for schema in model.schemas
+                ]
+            else:
+                values[field] = getattr(model, field)
+
+        return DataProductRead.model_construct(**values).model_dump(
+            mode="json", by_alias=True, include=fields
+        )
+
+
+# Maps the public (camel case) names of data product fields to their attribute names
+DATA_PRODUCT_READ_FIELDS = {
+    field.alias or name: name for name, field in DataProductRead.model_fields.items()
+}
+
 
 class SchemaReadWithDataProduct(SchemaRead):
     data_product: DataProductRead
+
+
+class DataProductBatchItem(BaseModel):
+    """
+    The result of looking up one ID in a batch read of data products
+    """
+
+    model_config = ConfigDict(alias_generator=to_camel)
+
+    id: str = Field(description="The ID that was requested")
+    found: bool
+    data_product: Optional[DataProductRead] = None
+
+
+class SchemaBatchItem(BaseModel):
+    """
+    The result of looking up one ID in a batch read of schemas
+    """
+
+    id: str = Field(description="The ID that was requested")
+    found: bool
+    schema_: Optional[SchemaRead] = Field(default=None, alias="schema")
+
+
+class DataProductSuggestion(BaseModel):
+    id: str = Field(json_schema_extra={"example": "dp:hmpps_use_of_force"})
+    name: str = Field(json_schema_extra={"example": "hmpps_use_of_force"})
+
+
+class SchemaSuggestion(BaseModel):
+    model_config = ConfigDict(alias_generator=to_camel)
+
+    id: str = Field(json_schema_extra={"example": "dp:hmpps_use_of_force:statement"})
+    name: str = Field(json_schema_extra={"example": "statement"})
+    data_product_id: str = Field(json_schema_extra={"example": "dp:hmpps_use_of_force"})
+
+
+class AutocompleteResults(BaseModel):
+    """
+    Data products and tables whose names match a partial search term
+    """
+
+    model_config = ConfigDict(alias_generator=to_camel)
+
+    data_products: list[DataProductSuggestion]
+    schemas: list[SchemaSuggestion]
+
+
+class CatalogueCounts(BaseModel):
+    model_config = ConfigDict(alias_generator=to_camel)
+
+    data_products: int = Field(
+        default=0, description="Number of data products (current versions only)"
+    )
+    tables: int = Field(
+        default=0, description="Number of tables in the current data product versions"
+    )
+    columns: int = Field(
+        default=0,
+        description="Number of columns in the current data product versions",
+    )
+
+    def add(self, data_products: int, tables: int, columns: int):
+        self.data_products += data_products
+        self.tables += tables
+        self.columns += columns
+
+
+class CatalogueStats(CatalogueCounts):
+    """
+    Summary statistics about the data products registered on the platform
+    """
+
+    dpia_required: int = Field(
+        default=0,
+        description="Number of data products that require a data privacy impact assessment",
+    )
+    by_domain: dict[str, CatalogueCounts] = Field(default_factory=dict)
+    by_status: dict[Status, CatalogueCounts] = Field(default_factory=dict)
+
+    @staticmethod
+    def from_rows(rows):
+        value = CatalogueStats()
+        for row in rows:
+            counts = (row.data_products, row.tables, row.columns)
+            value.add(*counts)
+            value.by_domain.setdefault(row.domain, CatalogueCounts()).add(*counts)
+            value.by_status.setdefault(Status(row.status), CatalogueCounts()).add(
+                *counts
+            )
+            if row.dpia_required:
+                value.dpia_required += row.data_products
+
+        return value
+
+
+class CatalogueChange(BaseModel):
+    """
+    A change to a data product or schema
+    """
+
+    model_config = ConfigDict(alias_generator=to_camel)
+
+    seq: int = Field(description="Position of the change in the change feed")
+    id: str = Field(
+        description="ID of the data product or schema that changed",
+        json_schema_extra={"example": "dp:hmpps_use_of_force:statement"},
+    )
+    version: str = Field(
+        description="The version of the data product that the change created"
+    )
+    change: ChangeType
+    changed_at: datetime
+
+    @staticmethod
+    def from_model(model) -> "CatalogueChange":
+        return CatalogueChange.model_validate(
+            {
+                "seq": model.seq,
+                "id": model.entity_id,
+                "version": model.version,
+                "change": model.change,
+                "changedAt": model.changed_at,
+            }
+        )
+
+
+class ChangeFeed(BaseModel):
+    """
+    A page of changes to the catalogue, oldest first
+    """
+
+    model_config = ConfigDict(alias_generator=to_camel)
+
+    changes: list[CatalogueChange]
+    next_since: int = Field(
+        description="Pass as `since` to fetch the changes after this page"
+    )
+
+
+class JobCounts(BaseModel):
+    model_config = ConfigDict(alias_generator=to_camel)
+
+    ready: int = Field(default=0, description="Jobs waiting for a worker")
+    waiting: int = Field(
+        default=0, description="Jobs being run, or waiting to be retried"
+    )
+    failed: int = Field(
+        default=0, description="Jobs that ran out of attempts and were given up on"
+    )
+    oldest_ready_seconds: Optional[float] = Field(
+        default=None,
+        description="How long the oldest job waiting for a worker has been queued",
+    )
+
+    def add(self, row):
+        self.ready += row.ready
+        self.waiting += row.waiting
+        self.failed += row.failed
+        if row.oldest_ready_seconds is not None:
+            self.oldest_ready_seconds = max(
+                self.oldest_ready_seconds or 0.0, float(row.oldest_ready_seconds)
+            )
+
+
+class JobKindStats(JobCounts):
+    completed: int = Field(
+        default=0, description="Jobs completed by this worker since it started"
+    )
+    retried: int = Field(
+        default=0, description="Failed attempts retried by this worker since it started"
+    )
+    latency_p50_seconds: Optional[float] = Field(
+        default=None,
+        description="Median time from enqueue to completion of recent jobs on this worker",
+    )
+    latency_p95_seconds: Optional[float] = Field(
+        default=None,
+        description="95th percentile time from enqueue to completion of recent jobs on this worker",
+    )
+
+
+class JobQueueStats(JobCounts):
+    """
+    Depth of the background job queue, and throughput and latency of this
+    worker's job runners
+    """
+
+    by_kind: dict[str, JobKindStats] = Field(default_factory=dict)
+
+    @staticmethod
+    def from_rows(rows, metrics):
+        """
+        Combine queue depths from JobRepository.stats with a worker's metrics,
+        keyed by job kind
+        """
+        value = JobQueueStats()
+        for row in rows:
+            value.add(row)
+            value.by_kind.setdefault(row.kind, JobKindStats()).add(row)
+        for kind, kind_metrics in metrics.items():
+            stats = value.by_kind.setdefault(kind, JobKindStats())
+            stats.completed = kind_metrics.completed
+            stats.retried = kind_metrics.retried
+            (
+                stats.latency_p50_seconds,
+                stats.latency_p95_seconds,
+            ) = kind_metrics.latency_percentiles()
+
+        return value
+
+
+class SubscriptionCreate(BaseModel):
+    model_config = ConfigDict(alias_generator=to_camel)
+
+    url: AnyHttpUrl = Field(
+        description="URL to POST change notifications to",
+        json_schema_extra={"example": "https://example.justice.gov.uk/notifications"},
+    )
+
+
+class SubscriptionRead(SubscriptionCreate):
+    """
+    A subscription to notifications of new versions of a data product.
+
+    Notifications are POSTed to the URL as `{"notifications": [...]}`, with
+    each notification describing the changes to each schema in a new version.
+    Notifications made within a few seconds of each other are sent together.
+    """
+
+    id: int
+    data_product_id: str = Field(
+        json_schema_extra={"example": "dp:hmpps_use_of_force"},
+    )
+    created_at: datetime
+
+    @staticmethod
+    def from_model(model) -> "SubscriptionRead":
+        return SubscriptionRead.model_validate(
+            {
+                "id": model.id,
+                "dataProductId": f"dp:{model.data_product_name}",
+                "url": model.url,
+                "createdAt": model.created_at,
+            }
+        )
+
+
+class UploadCreate(BaseModel):
+    model_config = ConfigDict(alias_generator=to_camel, extra="forbid")
+
+    filename: str = Field(
+        pattern=r"^[A-Za-z0-9_.-]+$",
+        max_length=255,
+        description="Name of the file being uploaded",
+        json_schema_extra={"example": "statement.parquet"},
+    )
+
+
+class UploadRead(BaseModel):
+    """
+    A multipart upload of a file to the landing zone for a table.
+
+    Upload the file in parts of at least 5MB (except the last), in parallel if
+    you like, using presigned URLs from the parts endpoint. Then complete the
+    upload with the ETag returned for each part, or abort it.
+    """
+
+    model_config = ConfigDict(alias_generator=to_camel)
+
+    upload_id: str
+    key: str = Field(
+        description="Where the file will be in the landing zone bucket",
+        json_schema_extra={
+            "example": "hmpps_use_of_force/statement/0f6c.../statement.parquet"
+        },
+    )
+
+
+class UploadPartsRequest(BaseModel):
+    model_config = ConfigDict(alias_generator=to_camel, extra="forbid")
+
+    key: str
+    part_numbers: list[Annotated[int, Field(ge=1, le=MAX_UPLOAD_PART_NUMBER)]] = Field(
+        min_length=1,
+        description="Numbers of the parts to upload. Parts are numbered from 1.",
+        json_schema_extra={"example": [1, 2, 3]},
+    )
+
+
+class UploadPartUrl(BaseModel):
+    model_config = ConfigDict(alias_generator=to_camel)
+
+    part_number: int
+    url: str = Field(description="PUT the part to this URL")
+
+
+class UploadParts(BaseModel):
+    model_config = ConfigDict(alias_generator=to_camel)
+
+    parts: list[UploadPartUrl]
+    expires_in: int = Field(description="Seconds until the URLs expire")
+
+
+class UploadedPart(BaseModel):
+    model_config = ConfigDict(alias_generator=to_camel)
+
+    part_number: int = Field(ge=1, le=MAX_UPLOAD_PART_NUMBER)
+    etag: str = Field(description="The ETag header returned when the part was PUT")
+
+
+class UploadComplete(BaseModel):
+    model_config = ConfigDict(alias_generator=to_camel, extra="forbid")
+
+    key: str
+    parts: list[UploadedPart] = Field(min_length=1)
+
+
+class UploadCompleted(BaseModel):
+    model_config = ConfigDict(alias_generator=to_camel)
+
+    key: str
+    etag: str
+
+
+class FileValidationRequest(BaseModel):
+    model_config = ConfigDict(alias_generator=to_camel, extra="forbid")
+
+    keys: list[str] = Field(
+        min_length=1,
+        description="Keys of CSV or Parquet files in the landing zone",
+        json_schema_extra={
+            "example": ["hmpps_use_of_force/statement/0f6c.../statement.parquet"]
+        },
+    )
+
+
+class ColumnValidationRead(BaseModel):
+    model_config = ConfigDict(alias_generator=to_camel)
+
+    name: str
+    type: str
+    null_count: int
+    error: Optional[str] = Field(
+        description="Why values can't be read as the column's type, if they can't"
+    )
+
+
+class FileValidationRead(BaseModel):
+    """
+    Whether a file matches its table's schema. Columns are matched by name,
+    ignoring case. Nulls are counted but allowed.
+    """
+
+    model_config = ConfigDict(alias_generator=to_camel)
+
+    key: str
+    valid: bool
+    rows: int
+    missing_columns: list[str]
+    unexpected_columns: list[str]
+    columns: list[ColumnValidationRead]
+    error: Optional[str] = Field(description="Why the file can't be read, if it can't")
+
+    @staticmethod
+    def from_model(model) -> "FileValidationRead":
+        return FileValidationRead.model_validate(
+            {
+                "key": model.key,
+                "valid": model.valid,
+                "rows": model.rows,
+                "missingColumns": model.missing_columns,
+                "unexpectedColumns": model.unexpected_columns,
+                "columns": [
+                    {
+                        "name": column.name,
+                        "type": column.type,
+                        "nullCount": column.null_count,
+                        "error": column.error,
+                    }
+                    for column in model.columns
+                ],
+                "error": model.error,
+            }
+        )
+
+
+class TableStatsRead(BaseModel):
+    """
+    Operational stats about the data in a table, reported by ingestion jobs
+    """
+
+    model_config = ConfigDict(alias_generator=to_camel)
+
+    row_count: Optional[int] = Field(
+        default=None, ge=0, json_schema_extra={"example": 1200000}
+    )
+    last_updated: Optional[datetime] = Field(
+        default=None,
+        description="When data last landed in the table",
+        json_schema_extra={"example": "2024-01-01T10:00:00"},
+    )
+    s3_location: Optional[str] = Field(
+        default=None,
+        json_schema_extra={
+            "example": "s3://data-development/curated/hmpps_use_of_force/statement/"
+        },
+    )
+
+
+class TableStatsCreate(TableStatsRead):
+    model_config = ConfigDict(extra="forbid")
+
+    id: str = Field(
+        description="The ID of the table's schema",
+        json_schema_extra={"example": "dp:hmpps_use_of_force:statement"},
+    )
+
+    @field_validator("last_updated")
+    @classmethod
+    def to_utc(cls, value: Optional[datetime]) -> Optional[datetime]:
+        """
+        Times are stored in UTC, without a time zone
+        """
+        if value is not None and value.tzinfo is not None:
+            return value.astimezone(timezone.utc).replace(tzinfo=None)
+        return value
+
+
+class TableStatsBatch(BaseModel):
+    model_config = ConfigDict(alias_generator=to_camel, extra="forbid")
+
+    stats: list[TableStatsCreate] = Field(min_length=1)
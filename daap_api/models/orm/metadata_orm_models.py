@@ -4,7 +4,17 @@ from datetime import datetime
 from enum import Enum
 from typing import Optional
 
-from sqlalchemy import ForeignKey, Index
+from sqlalchemy import (
+    DDL,
+    BigInteger,
+    ForeignKey,
+    Index,
+    column,
+    event,
+    func,
+    table,
+    text,
+)
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy.types import JSON
 
@@ -19,19 +29,44 @@ class Status(Enum):
     retired = "retired"
 
 
+class ChangeType(Enum):
+    created = "created"
+    updated = "updated"
+    deleted = "deleted"
+
+
+class JobStatus(Enum):
+    pending = "pending"
+    failed = "failed"
+
+
+# Trigram indexes back the autocomplete queries
+event.listen(
+    Base.metadata, "before_create", DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+)
+
+
 class SchemaTable(Base):
     __tablename__ = "schemas"
     __table_args__ = (
         Index(
             "ix_schemas_name_data_product_id", "name", "data_product_id", unique=True
         ),
+        Index(
+            "ix_schemas_name_trgm",
+            "name",
+            postgresql_using="gin",
+            postgresql_ops={"name": "gin_trgm_ops"},
+        ),
     )
 
     id: Mapped[int] = mapped_column(
         primary_key=True,
     )
 
-    data_product_id: Mapped[int] = mapped_column(ForeignKey("data_product_versions.id"))
+    data_product_id: Mapped[int] = mapped_column(
+        ForeignKey("data_product_versions.id"), index=True
+    )
     data_product_version: Mapped["DataProductVersionTable"] = relationship(
         back_populates="schemas"
     )
@@ -63,6 +98,14 @@ class SchemaTable(Base):
 
 class DataProductTable(Base):
     __tablename__ = "data_products"
+    __table_args__ = (
+        Index(
+            "ix_data_products_name_trgm",
+            "name",
+            postgresql_using="gin",
+            postgresql_ops={"name": "gin_trgm_ops"},
+        ),
+    )
 
     id: Mapped[int] = mapped_column(
         primary_key=True,
@@ -71,7 +114,7 @@ class DataProductTable(Base):
         index=True,
     )
     current_version_id: Mapped[int] = mapped_column(
-        ForeignKey("data_product_versions.id")
+        ForeignKey("data_product_versions.id"), index=True
     )
     current_version: Mapped["DataProductVersionTable"] = relationship(
         back_populates="data_product"
@@ -87,6 +130,11 @@ class DataProductVersionTable(Base):
 
     __table_args__ = (
         Index("ix_data_prouduct_versions_name_version", "name", "version", unique=True),
+        Index(
+            "ix_data_product_versions_superseded_at",
+            "superseded_at",
+            postgresql_where=text("superseded_at IS NOT NULL"),
+        ),
     )
 
     id: Mapped[int] = mapped_column(
@@ -117,6 +165,8 @@ class DataProductVersionTable(Base):
     creation_date: Mapped[Optional[datetime]]
     s3_location: Mapped[Optional[str]]
     row_count: Mapped[Optional[int]]
+    # When a newer version was made current. None for the current version.
+    superseded_at: Mapped[Optional[datetime]]
 
     version: Mapped[str] = mapped_column(default="v1.0")
 
@@ -160,3 +210,207 @@ class DataProductVersionTable(Base):
             "s3Location": self.s3_location,
             "rowCount": self.row_count,
         }
+
+
+class ReadModelTable(Base):
+    """
+    Pre-rendered API responses for the current version of each data product
+    and schema, keyed by the ID used to fetch them. Documents are written in
+    the same transaction as the version they render.
+    """
+
+    __tablename__ = "read_models"
+
+    id: Mapped[str] = mapped_column(primary_key=True)
+    data_product_name: Mapped[str] = mapped_column(index=True)
+    document: Mapped[bytes]
+
+
+class ArchivedVersionTable(Base):
+    """
+    Superseded versions of data products that have been moved out of the
+    data_product_versions and schemas tables into Parquet files (see
+    version_archive), and where to find them.
+    """
+
+    __tablename__ = "archived_versions"
+
+    name: Mapped[str] = mapped_column(primary_key=True)
+    version: Mapped[str] = mapped_column(primary_key=True)
+    location: Mapped[str]
+    archived_at: Mapped[datetime] = mapped_column(server_default=func.now())
+
+
+class CatalogueChangeTable(Base):
+    """
+    Append-only log of changes to data products and schemas, for clients that
+    sync the catalogue incrementally. Sequence numbers are assigned in commit
+    order, so a client that has seen a sequence number will never later see a
+    smaller one appear.
+    """
+
+    __tablename__ = "catalogue_changes"
+    __table_args__ = (
+        Index(
+            "ix_catalogue_changes_data_product_name_version",
+            "data_product_name",
+            "version",
+        ),
+    )
+
+    seq: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    entity_id: Mapped[str]
+    data_product_name: Mapped[str]
+    version: Mapped[str]
+    change: Mapped[ChangeType]
+    changed_at: Mapped[datetime] = mapped_column(server_default=func.now())
+
+
+class SyncWatermarkTable(Base):
+    """
+    How far through the change log (see CatalogueChangeTable) each process
+    that copies the catalogue elsewhere has got. A seq of None means nothing
+    has been copied yet.
+    """
+
+    __tablename__ = "sync_watermarks"
+
+    name: Mapped[str] = mapped_column(primary_key=True)
+    seq: Mapped[Optional[int]] = mapped_column(BigInteger)
+    updated_at: Mapped[datetime] = mapped_column(
+        server_default=func.now(), onupdate=func.now()
+    )
+
+
+class TableStatsTable(Base):
+    """
+    Operational stats about the data in each table, reported by ingestion jobs.
+    These change every time data lands, so are kept apart from the versioned
+    metadata, and updating them doesn't create a new version.
+    """
+
+    __tablename__ = "table_stats"
+
+    data_product_name: Mapped[str] = mapped_column(primary_key=True)
+    table_name: Mapped[str] = mapped_column(primary_key=True)
+    row_count: Mapped[Optional[int]] = mapped_column(BigInteger)
+    last_updated: Mapped[Optional[datetime]]
+    s3_location: Mapped[Optional[str]]
+    updated_at: Mapped[datetime] = mapped_column(
+        server_default=func.now(), onupdate=func.now()
+    )
+
+
+class SubscriptionTable(Base):
+    """
+    A consumer to notify of new versions of a data product, by POSTing
+    batches of change notifications to its URL
+    """
+
+    __tablename__ = "subscriptions"
+    __table_args__ = (
+        Index(
+            "ix_subscriptions_data_product_name_url",
+            "data_product_name",
+            "url",
+            unique=True,
+        ),
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    data_product_name: Mapped[str]
+    url: Mapped[str]
+    created_at: Mapped[datetime] = mapped_column(server_default=func.now())
+
+
+class JobTable(Base):
+    """
+    Queue of side effects to run in the background, such as notifying consumers
+    of a new version. Jobs are enqueued in the same transaction as the change
+    that causes them, so a job exists if and only if its change was committed.
+
+    A pending job can be claimed once run_after has passed. Claiming a job
+    pushes run_after out by a lease, so that if the worker dies the job is
+    claimed again once the lease expires. Completed jobs are deleted, and jobs
+    that run out of attempts are kept as failed for inspection.
+
+    A job can be given a key, so that a job with the same kind and key that is
+    still waiting to run can be found, and more work merged into it.
+    """
+
+    __tablename__ = "jobs"
+    __table_args__ = (
+        Index(
+            "ix_jobs_ready",
+            "run_after",
+            postgresql_where=text("status = 'pending'"),
+        ),
+        Index(
+            "ix_jobs_kind_key",
+            "kind",
+            "key",
+            postgresql_where=text("status = 'pending' AND key IS NOT NULL"),
+        ),
+    )
+
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    kind: Mapped[str]
+    payload: Mapped[dict] = mapped_column(JSON)
+    key: Mapped[Optional[str]]
+    status: Mapped[JobStatus] = mapped_column(default=JobStatus.pending)
+    attempts: Mapped[int] = mapped_column(default=0)
+    last_error: Mapped[Optional[str]]
+    created_at: Mapped[datetime] = mapped_column(server_default=func.now())
+    run_after: Mapped[datetime] = mapped_column(server_default=func.now())
+
+
+# Summary counts for the stats endpoint, maintained as a materialised view so
+# that dashboards polling it don't scan the whole catalogue. The view is
+# refreshed concurrently in the background after writes (see StatsRefresher).
+data_product_stats = table(
+    "data_product_stats",
+    column("domain"),
+    column("status"),
+    column("dpia_required"),
+    column("data_products"),
+    column("tables"),
+    column("columns"),
+)
+
+event.listen(
+    Base.metadata,
+    "after_create",
+    DDL(
+        """
+        CREATE MATERIALIZED VIEW IF NOT EXISTS data_product_stats AS
+        SELECT
+            data_product_versions.domain,
+            data_product_versions.status,
+            data_product_versions.dpia_required,
+            count(DISTINCT data_product_versions.id) AS data_products,
+            count(schemas.id) AS tables,
+            coalesce(sum(json_array_length(schemas.columns)), 0) AS columns
+        FROM data_products
+        JOIN data_product_versions
+            ON data_product_versions.id = data_products.current_version_id
+        LEFT JOIN schemas ON schemas.data_product_id = data_product_versions.id
+        GROUP BY
+            data_product_versions.domain,
+            data_product_versions.status,
+            data_product_versions.dpia_required
+        """
+    ),
+)
+event.listen(
+    Base.metadata,
+    "after_create",
+    DDL(
+        "CREATE UNIQUE INDEX IF NOT EXISTS ix_data_product_stats_domain_status_dpia "
+        "ON data_product_stats (domain, status, dpia_required)"
+    ),
+)
+event.listen(
+    Base.metadata,
+    "before_drop",
+    DDL("DROP MATERIALIZED VIEW IF EXISTS data_product_stats"),
+)
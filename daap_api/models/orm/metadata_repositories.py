@@ -1,14 +1,144 @@
-from typing import Optional, Sequence
+import json
+from datetime import timedelta
+from typing import Callable, Collection, Optional, Sequence
 
-from sqlalchemy import select
+import structlog
+from sqlalchemy import (
+    Row,
+    bindparam,
+    delete,
+    func,
+    or_,
+    select,
+    text,
+    tuple_,
+    update,
+)
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.exc import IntegrityError
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, contains_eager, load_only, selectinload
 
-from .metadata_orm_models import DataProductTable, DataProductVersionTable, SchemaTable
+from ..api.metadata_api_models import DataProductRead, SchemaRead
+from .metadata_orm_models import (
+    ArchivedVersionTable,
+    CatalogueChangeTable,
+    ChangeType,
+    DataProductTable,
+    DataProductVersionTable,
+    JobStatus,
+    JobTable,
+    ReadModelTable,
+    SchemaTable,
+    SubscriptionTable,
+    SyncWatermarkTable,
+    TableStatsTable,
+    data_product_stats,
+)
+
+logger = structlog.get_logger(__name__)
+
+# Postgres NOTIFY channel used to tell other workers that the catalogue has changed
+CATALOGUE_CHANNEL = "catalogue_changes"
+
+
+def notify_catalogue_change(
+    session: Session, version: DataProductVersionTable, seq: int
+):
+    """
+    Queue a notification that a new version of a data product has been saved,
+    up to position seq in the change log.
+    Postgres only delivers the notification if the current transaction commits.
+    """
+    payload = json.dumps(
+        {"dataProduct": version.name, "version": version.version, "seq": seq}
+    )
+    session.execute(select(func.pg_notify(CATALOGUE_CHANNEL, payload)))
+
+
+# Job sent to consumers of a data product when a new version is saved
+VERSION_CREATED_JOB = "version_created"
+
+
+def enqueue_version_created(
+    session: Session,
+    version: DataProductVersionTable,
+    previous_version: Optional[DataProductVersionTable] = None,
+    tables: Optional[Collection[str]] = None,
+):
+    """
+    Queue a job to notify consumers of a new version of a data product, in the
+    current transaction. If tables is set, only changes to those tables are
+    notified, e.g. when a schema is added without creating a new version.
+    """
+    JobRepository(session).enqueue(
+        VERSION_CREATED_JOB,
+        {
+            "dataProduct": version.name,
+            "version": version.version,
+            "previousVersion": previous_version.version if previous_version else None,
+            "tables": sorted(tables) if tables is not None else None,
+        },
+    )
+
+
+# Statements for the hot read paths are built once, with bound parameters, rather
+# than on every request. SQLAlchemy memoizes the cache key of a statement object,
+# so reusing one skips both building the statement and working out which cached
+# compiled form to use.
+_current_versions = (
+    select(DataProductVersionTable)
+    .select_from(DataProductTable)
+    .join(DataProductVersionTable, DataProductTable.current_version)
+    .options(contains_eager(DataProductVersionTable.data_product))
+)
+_fetch_latest_data_product = _current_versions.where(
+    DataProductTable.name == bindparam("name")
+)
+_fetch_latest_data_product_with_schemas = _fetch_latest_data_product.options(
+    selectinload(DataProductVersionTable.schemas)
+)
+_lock_data_product = (
+    select(DataProductTable.id)
+    .where(DataProductTable.name == bindparam("name"))
+    .with_for_update()
+)
+_fetch_locked_data_product = _fetch_latest_data_product_with_schemas.execution_options(
+    populate_existing=True
+)
+_fetch_latest_schema = (
+    select(SchemaTable)
+    .select_from(DataProductTable)
+    .join(DataProductVersionTable, DataProductTable.current_version)
+    .join(SchemaTable, SchemaTable.data_product_id == DataProductVersionTable.id)
+    .where(SchemaTable.name == bindparam("table_name"))
+    .where(DataProductTable.name == bindparam("data_product_name"))
+)
+_fetch_read_model = select(ReadModelTable.document).where(
+    ReadModelTable.id == bindparam("id")
+)
+
+
+# Advisory lock held while appending to the change log
+CHANGE_LOG_LOCK_KEY = 0x636C6F67
+
+# How many times an update is attempted before giving up
+MAX_UPDATE_ATTEMPTS = 3
+
+
+class VersionMismatch(Exception):
+    """
+    Raised when an update is conditional on the data product being at a
+    version that is no longer current
+    """
+
+    def __init__(self, current_version: str):
+        super().__init__(f"The current version is {current_version}")
+        self.current_version = current_version
 
 
 class DataProductRepository:
     IntegrityError = IntegrityError
+    VersionMismatch = VersionMismatch
 
     def __init__(self, session: Session):
         self.session = session
@@ -23,6 +153,11 @@ class DataProductRepository:
             current_version=data_product_version, name=data_product_version.name
         )
         self.session.add(data_product)
+        self.session.flush()
+        ReadModelRepository(self.session).save(data_product_version)
+        seq = ChangeLogRepository(self.session).record_version(data_product_version)
+        enqueue_version_created(self.session, data_product_version)
+        notify_catalogue_change(self.session, data_product_version, seq)
         self.session.commit()
         self.session.refresh(data_product_version)
         return data_product_version
@@ -33,45 +168,284 @@ class DataProductRepository:
         """
         Update a data product to a new version
         """
+        is_new_version = new_version.id is None
+        previous_version = data_product.current_version
         data_product.current_version = new_version
         self.session.add(new_version)
         self.session.add(
             data_product,
         )
 
+        if is_new_version:
+            if previous_version is not None:
+                previous_version.superseded_at = func.now()
+            self.session.flush()
+            ReadModelRepository(self.session).save(new_version)
+            seq = ChangeLogRepository(self.session).record_version(
+                new_version, previous_version
+            )
+            enqueue_version_created(self.session, new_version, previous_version)
+            notify_catalogue_change(self.session, new_version, seq)
+
         self.session.commit()
         self.session.refresh(new_version)
         return new_version
 
+    def update_latest(
+        self,
+        name: str,
+        make_version: Callable[[DataProductVersionTable], DataProductVersionTable],
+        if_match: Optional[Collection[str]] = None,
+        max_attempts: int = MAX_UPDATE_ATTEMPTS,
+    ) -> Optional[DataProductVersionTable]:
+        """
+        Update a data product to the version that make_version derives from its
+        current version, or return None if the data product does not exist.
+
+        The data product is locked while the new version is derived and saved,
+        so concurrent updates are applied one after the other, each derived from
+        the version saved by the one before. If if_match is set, the update is
+        only made if the current version is one of those given, otherwise
+        VersionMismatch is raised.
+
+        If saving still violates a unique constraint, for example because of a
+        writer that does not take the lock, the update is derived again from the
+        new current version, up to max_attempts times.
+        """
+        for attempt in range(1, max_attempts + 1):
+            try:
+                current_version = self.lock_latest(name)
+                if current_version is None:
+                    self.session.rollback()
+                    return None
+                if if_match is not None and current_version.version not in if_match:
+                    raise VersionMismatch(current_version.version)
+
+                new_version = make_version(current_version)
+                return self.update(current_version.data_product, new_version)
+            except IntegrityError:
+                self.session.rollback()
+                if attempt == max_attempts:
+                    raise
+                logger.info(
+                    f"Update to {name} conflicted with a concurrent update - retrying"
+                )
+            except Exception:
+                self.session.rollback()
+                raise
+
+    def lock_latest(self, name: str) -> Optional[DataProductVersionTable]:
+        """
+        Load the latest version of a data product, with its schemas, and lock the
+        data product until the end of the transaction, so that no other version
+        can be made current in the meantime.
+        """
+        # The version is loaded after taking the lock, rather than in the same
+        # statement, so that it sees a version made current by whoever held the
+        # lock before us
+        if self.session.execute(_lock_data_product, {"name": name}).scalar() is None:
+            return None
+        return self.session.execute(_fetch_locked_data_product, {"name": name}).scalar()
+
     def fetch(self, name: str, version: str) -> Optional[DataProductVersionTable]:
         """
-        Load a data product by name and version
+        Load a data product by name and version.
+        Archived versions are not loaded (see VersionArchive.fetch).
         """
         return self.session.execute(
             select(DataProductVersionTable).filter_by(name=name, version=version)
         ).scalar()
 
-    def fetch_latest(self, name: str) -> Optional[DataProductVersionTable]:
+    def fetch_many(
+        self, ids: Collection[tuple[str, str]]
+    ) -> dict[tuple[str, str], DataProductVersionTable]:
         """
-        Load the latest version of a data product by name
+        Load several data product versions, with their schemas, by (name, version),
+        keyed by the same pair. Versions that don't exist, or are archived (see
+        VersionArchive.fetch_many), are omitted from the result.
         """
-        return self.session.execute(
+        versions = self.session.execute(
+            select(DataProductVersionTable)
+            .where(
+                tuple_(
+                    DataProductVersionTable.name, DataProductVersionTable.version
+                ).in_(ids)
+            )
+            .options(selectinload(DataProductVersionTable.schemas))
+        ).scalars()
+        return {(version.name, version.version): version for version in versions}
+
+    def fetch_latest(
+        self, name: str, load_schemas: bool = False
+    ) -> Optional[DataProductVersionTable]:
+        """
+        Load the latest version of a data product by name.
+        If load_schemas is set, its schemas are loaded up front in a single query.
+        """
+        query = (
+            _fetch_latest_data_product_with_schemas
+            if load_schemas
+            else _fetch_latest_data_product
+        )
+        return self.session.execute(query, {"name": name}).scalar()
+
+    def fetch_latest_many(
+        self, names: Collection[str]
+    ) -> dict[str, DataProductVersionTable]:
+        """
+        Load the latest versions of several data products by name, keyed by name.
+        Names that don't exist are omitted from the result.
+        """
+        data_products = self.session.execute(
             select(DataProductVersionTable)
             .select_from(DataProductTable)
             .join(DataProductVersionTable, DataProductTable.current_version)
-            .filter_by(name=name)
-        ).scalar()
+            .where(DataProductTable.name.in_(names))
+            .options(
+                contains_eager(DataProductVersionTable.data_product),
+                selectinload(DataProductVersionTable.schemas),
+            )
+        ).scalars()
+        return {data_product.name: data_product for data_product in data_products}
 
-    def list(self) -> Sequence[DataProductVersionTable]:
+    def list_versions_after(
+        self, after_id: int, limit: int
+    ) -> Sequence[DataProductVersionTable]:
+        """
+        Load up to limit versions of any data product, with their schemas, by
+        ID, after after_id. Row IDs are not committed in order, so this is for
+        paging through the versions as of one snapshot, not for following new
+        ones (see ChangeLogRepository.list).
+        """
         return (
             self.session.execute(
                 select(DataProductVersionTable)
-                .select_from(DataProductTable)
-                .join(DataProductVersionTable, DataProductTable.current_version)
-                .order_by(DataProductTable.name)
+                .where(DataProductVersionTable.id > after_id)
+                .order_by(DataProductVersionTable.id)
+                .limit(limit)
+                .options(selectinload(DataProductVersionTable.schemas))
             )
             .scalars()
-            .fetchmany()
+            .all()
+        )
+
+    def existing_names(self, names: Collection[str]) -> set[str]:
+        """
+        The names of those data products that already exist
+        """
+        return set(
+            self.session.execute(
+                select(DataProductTable.name).where(DataProductTable.name.in_(names))
+            ).scalars()
+        )
+
+    def import_many(self, data_products: Sequence[Sequence[DataProductVersionTable]]):
+        """
+        Create several data products with their full version history, each
+        given as its versions (with schemas) oldest first. The last version of
+        each becomes its current version.
+
+        Every row is inserted in a single transaction, so the inserts are sent
+        in batches. Raises IntegrityError if any data product already exists.
+        Consumers are not notified, as there can't be any subscribers yet.
+        """
+        for versions in data_products:
+            for version in versions[:-1]:
+                version.superseded_at = func.now()
+        self.session.add_all(
+            version for versions in data_products for version in versions
+        )
+        self.session.add_all(
+            DataProductTable(current_version=versions[-1], name=versions[-1].name)
+            for versions in data_products
+        )
+        self.session.flush()
+
+        changes = ChangeLogRepository(self.session)
+        for versions in data_products:
+            ReadModelRepository(self.session).save(versions[-1])
+            # Each version is logged as it would have been when it was made,
+            # so that followers of the log (e.g. the analytics export) see
+            # the whole history
+            previous_version = None
+            for version in versions:
+                seq = changes.record_version(version, previous_version)
+                previous_version = version
+            notify_catalogue_change(self.session, versions[-1], seq)
+        self.session.commit()
+
+    def list(
+        self, fields: Optional[Collection[str]] = None
+    ) -> Sequence[DataProductVersionTable]:
+        """
+        Load the latest version of every data product, along with their schemas.
+
+        If fields is set, only the name and the named attributes are loaded,
+        and schemas are only loaded if requested. Accessing any other attribute
+        raises an error rather than silently querying the database again.
+        """
+        query = (
+            select(DataProductVersionTable)
+            .select_from(DataProductTable)
+            .join(DataProductVersionTable, DataProductTable.current_version)
+            .order_by(DataProductTable.name)
+        )
+
+        if fields is None:
+            query = query.options(
+                contains_eager(DataProductVersionTable.data_product),
+                selectinload(DataProductVersionTable.schemas),
+            )
+        else:
+            columns = [
+                getattr(DataProductVersionTable, field)
+                for field in fields
+                if field not in ("id", "schemas")
+            ]
+            query = query.options(
+                load_only(DataProductVersionTable.name, *columns, raiseload=True)
+            )
+            if "schemas" in fields:
+                query = query.options(selectinload(DataProductVersionTable.schemas))
+
+        return self.session.execute(query).scalars().fetchmany()
+
+    def refresh_stats(self):
+        """
+        Bring the summary statistics up to date with the committed data products.
+        The refresh is concurrent, so readers of the stats are never blocked by it.
+        It is done in the background (see StatsRefresher), as it recomputes the
+        stats for the whole catalogue.
+        """
+        self.session.execute(
+            text("REFRESH MATERIALIZED VIEW CONCURRENTLY data_product_stats")
+        )
+
+    def stats(self) -> Sequence[Row]:
+        """
+        Load the summary statistics, grouped by domain, status and DPIA requirement
+        """
+        return self.session.execute(select(data_product_stats)).all()
+
+    def autocomplete(self, query: str, limit: int) -> Sequence[str]:
+        """
+        Suggest data product names that start with the query, falling back to
+        trigram similarity so that near misses are still suggested.
+        """
+        prefix_match = DataProductTable.name.istartswith(query, autoescape=True)
+        return (
+            self.session.execute(
+                select(DataProductTable.name)
+                .where(or_(prefix_match, DataProductTable.name.op("%")(query)))
+                .order_by(
+                    prefix_match.desc(),
+                    func.similarity(DataProductTable.name, query).desc(),
+                    DataProductTable.name,
+                )
+                .limit(limit)
+            )
+            .scalars()
+            .all()
         )
 
 
@@ -87,6 +461,13 @@ class SchemaRepository:
         Raises IntegrityError if a unique constraint is violated.
         """
         self.session.add(schema)
+        self.session.flush()
+        ReadModelRepository(self.session).save(schema.data_product_version)
+        seq = ChangeLogRepository(self.session).record_schema(schema)
+        enqueue_version_created(
+            self.session, schema.data_product_version, tables=[schema.name]
+        )
+        notify_catalogue_change(self.session, schema.data_product_version, seq)
         self.session.commit()
         self.session.refresh(schema)
         return schema
@@ -98,12 +479,552 @@ class SchemaRepository:
         Load a schema by data product name and table name
         """
         return self.session.execute(
+            _fetch_latest_schema,
+            {"data_product_name": data_product_name, "table_name": table_name},
+        ).scalar()
+
+    def autocomplete(self, query: str, limit: int) -> Sequence[Row[tuple[str, str]]]:
+        """
+        Suggest (data product name, table name) pairs for tables in the current
+        version of each data product, matching the table name by prefix or
+        trigram similarity.
+        """
+        prefix_match = SchemaTable.name.istartswith(query, autoescape=True)
+        return self.session.execute(
+            select(DataProductVersionTable.name, SchemaTable.name)
+            .select_from(DataProductTable)
+            .join(DataProductVersionTable, DataProductTable.current_version)
+            .join(
+                SchemaTable, SchemaTable.data_product_id == DataProductVersionTable.id
+            )
+            .where(or_(prefix_match, SchemaTable.name.op("%")(query)))
+            .order_by(
+                prefix_match.desc(),
+                func.similarity(SchemaTable.name, query).desc(),
+                SchemaTable.name,
+                DataProductVersionTable.name,
+            )
+            .limit(limit)
+        ).all()
+
+    def fetch_latest_many(
+        self, ids: Collection[tuple[str, str]]
+    ) -> dict[tuple[str, str], SchemaTable]:
+        """
+        Load several schemas by (data product name, table name), keyed by the same pair.
+        Schemas that don't exist are omitted from the result.
+        """
+        schemas = self.session.execute(
             select(SchemaTable)
             .select_from(DataProductTable)
             .join(DataProductVersionTable, DataProductTable.current_version)
             .join(
                 SchemaTable, SchemaTable.data_product_id == DataProductVersionTable.id
             )
-            .where(SchemaTable.name == table_name)
-            .where(DataProductVersionTable.name == data_product_name)
+            .where(tuple_(DataProductVersionTable.name, SchemaTable.name).in_(ids))
+            .options(contains_eager(SchemaTable.data_product_version))
+        ).scalars()
+        return {
+            (schema.data_product_version.name, schema.name): schema
+            for schema in schemas
+        }
+
+
+class ArchiveRepository:
+    def __init__(self, session: Session):
+        self.session = session
+
+    def claim_superseded(
+        self, older_than: timedelta, limit: int
+    ) -> Sequence[DataProductVersionTable]:
+        """
+        Load and lock up to limit versions, with their schemas, that were
+        superseded more than older_than ago. Versions locked by another
+        archiver are skipped.
+        """
+        return (
+            self.session.execute(
+                select(DataProductVersionTable)
+                .where(DataProductVersionTable.superseded_at.is_not(None))
+                .where(DataProductVersionTable.superseded_at < func.now() - older_than)
+                .order_by(DataProductVersionTable.superseded_at)
+                .limit(limit)
+                .with_for_update(skip_locked=True)
+                .options(selectinload(DataProductVersionTable.schemas))
+            )
+            .scalars()
+            .all()
+        )
+
+    def archive(
+        self, versions: Sequence[DataProductVersionTable], locations: dict[str, str]
+    ):
+        """
+        Replace versions, which have been written to the archive files at
+        locations (keyed by data product name), with records of where they are
+        """
+        self.session.add_all(
+            ArchivedVersionTable(
+                name=version.name,
+                version=version.version,
+                location=locations[version.name],
+            )
+            for version in versions
+        )
+        ids = [version.id for version in versions]
+        self.session.execute(
+            delete(SchemaTable).where(SchemaTable.data_product_id.in_(ids))
+        )
+        self.session.execute(
+            delete(DataProductVersionTable).where(DataProductVersionTable.id.in_(ids))
+        )
+        self.session.commit()
+
+    def locations(self, ids: Collection[tuple[str, str]]) -> dict[tuple[str, str], str]:
+        """
+        Where archived versions are, by (name, version), keyed by the same pair.
+        Versions that aren't archived are omitted from the result.
+        """
+        archived = self.session.execute(
+            select(ArchivedVersionTable).where(
+                tuple_(ArchivedVersionTable.name, ArchivedVersionTable.version).in_(ids)
+            )
+        ).scalars()
+        return {(record.name, record.version): record.location for record in archived}
+
+
+class ChangeLogRepository:
+    def __init__(self, session: Session):
+        self.session = session
+
+    def record_version(
+        self,
+        version: DataProductVersionTable,
+        previous_version: Optional[DataProductVersionTable] = None,
+    ) -> int:
+        """
+        Record the changes made by a new current version of a data product:
+        the data product itself, plus any schemas added, changed or removed
+        since the previous version. Returns the sequence number of the last change.
+        """
+        # Not version.data_product, which is only set on the current version
+        data_product_id = f"dp:{version.name}"
+        changes = [
+            (
+                data_product_id,
+                ChangeType.created if previous_version is None else ChangeType.updated,
+            )
+        ]
+        previous_schemas = {
+            schema.name: schema
+            for schema in (previous_version.schemas if previous_version else [])
+        }
+        for schema in version.schemas:
+            previous_schema = previous_schemas.pop(schema.name, None)
+            if previous_schema is None:
+                changes.append((f"{data_product_id}:{schema.name}", ChangeType.created))
+            elif schema.changed_fields(previous_schema):
+                changes.append((f"{data_product_id}:{schema.name}", ChangeType.updated))
+        for name in previous_schemas:
+            changes.append((f"{data_product_id}:{name}", ChangeType.deleted))
+
+        return self._append(version, changes)
+
+    def record_schema(self, schema: SchemaTable) -> int:
+        """
+        Record a schema added to the current version of a data product
+        """
+        version = schema.data_product_version
+        return self._append(
+            version,
+            [(f"{version.data_product.external_id}:{schema.name}", ChangeType.created)],
+        )
+
+    def _append(
+        self,
+        version: DataProductVersionTable,
+        changes: Sequence[tuple[str, ChangeType]],
+    ) -> int:
+        # Serialise appends until commit, so that sequence numbers are
+        # committed in order, and a reader never skips one that commits late.
+        self.session.execute(select(func.pg_advisory_xact_lock(CHANGE_LOG_LOCK_KEY)))
+        rows = [
+            CatalogueChangeTable(
+                entity_id=entity_id,
+                data_product_name=version.name,
+                version=version.version,
+                change=change,
+            )
+            for entity_id, change in changes
+        ]
+        self.session.add_all(rows)
+        self.session.flush()
+        return rows[-1].seq
+
+    def changed_tables(
+        self, ids: Collection[tuple[str, str]]
+    ) -> set[tuple[str, str, str]]:
+        """
+        The tables of the given versions, by (name, version), that were created
+        or updated by a change of their own, as (name, version, table name).
+        The rest of a version's tables were copied unchanged from the previous
+        version.
+        """
+        changes = self.session.execute(
+            select(CatalogueChangeTable).where(
+                tuple_(
+                    CatalogueChangeTable.data_product_name,
+                    CatalogueChangeTable.version,
+                ).in_(ids),
+                CatalogueChangeTable.change != ChangeType.deleted,
+            )
+        ).scalars()
+        tables = set()
+        for change in changes:
+            _, *names = change.entity_id.split(":")
+            if len(names) == 2:
+                tables.add((change.data_product_name, change.version, names[1]))
+        return tables
+
+    def latest_seq(self) -> int:
+        """
+        The sequence number of the latest change, or 0 if there are none
+        """
+        return self.session.execute(
+            select(func.coalesce(func.max(CatalogueChangeTable.seq), 0))
+        ).scalar()
+
+    def list(self, since: int, limit: int) -> Sequence[CatalogueChangeTable]:
+        """
+        Load changes with a sequence number after since, oldest first
+        """
+        return (
+            self.session.execute(
+                select(CatalogueChangeTable)
+                .where(CatalogueChangeTable.seq > since)
+                .order_by(CatalogueChangeTable.seq)
+                .limit(limit)
+            )
+            .scalars()
+            .all()
+        )
+
+
+class SubscriptionRepository:
+    IntegrityError = IntegrityError
+
+    def __init__(self, session: Session):
+        self.session = session
+
+    def create(self, subscription: SubscriptionTable) -> SubscriptionTable:
+        """
+        Attempt to save a subscription.
+        Raises IntegrityError if the URL is already subscribed to the data product.
+        """
+        self.session.add(subscription)
+        self.session.commit()
+        self.session.refresh(subscription)
+        return subscription
+
+    def fetch(self, id: int) -> Optional[SubscriptionTable]:
+        return self.session.get(SubscriptionTable, id)
+
+    def fetch_by_url(
+        self, data_product_name: str, url: str
+    ) -> Optional[SubscriptionTable]:
+        return self.session.execute(
+            select(SubscriptionTable).filter_by(
+                data_product_name=data_product_name, url=url
+            )
+        ).scalar()
+
+    def urls_for_many(
+        self, data_product_names: Collection[str]
+    ) -> dict[str, list[str]]:
+        """
+        Load the URLs subscribed to each of several data products, keyed by name.
+        Data products without subscriptions are omitted from the result.
+        """
+        urls: dict[str, list[str]] = {}
+        for name, url in self.session.execute(
+            select(SubscriptionTable.data_product_name, SubscriptionTable.url)
+            .where(SubscriptionTable.data_product_name.in_(data_product_names))
+            .order_by(SubscriptionTable.id)
+        ):
+            urls.setdefault(name, []).append(url)
+        return urls
+
+    def list(self, data_product_name: str) -> Sequence[SubscriptionTable]:
+        """
+        Load the subscriptions to a data product, oldest first
+        """
+        return (
+            self.session.execute(
+                select(SubscriptionTable)
+                .where(SubscriptionTable.data_product_name == data_product_name)
+                .order_by(SubscriptionTable.id)
+            )
+            .scalars()
+            .all()
+        )
+
+    def delete(self, subscription: SubscriptionTable):
+        self.session.delete(subscription)
+        self.session.commit()
+
+
+class JobRepository:
+    def __init__(self, session: Session):
+        self.session = session
+
+    def enqueue(
+        self,
+        kind: str,
+        payload: dict,
+        delay: Optional[timedelta] = None,
+        key: Optional[str] = None,
+    ):
+        """
+        Add a job to the queue, to run after an optional delay. This does not
+        commit, so that the job is only queued if the current transaction commits.
+        A key lets the job be found with fetch_waiting until it runs.
+        """
+        job = JobTable(kind=kind, payload=payload, key=key)
+        if delay is not None:
+            job.run_after = func.now() + delay
+        self.session.add(job)
+
+    def fetch_waiting(self, kind: str, key: str) -> Optional[JobTable]:
+        """
+        Load and lock a job of the given kind and key that has not been claimed
+        and is waiting for its delay to pass, so that more work can be merged
+        into it before it runs.
+        """
+        return self.session.execute(
+            select(JobTable)
+            .where(JobTable.kind == kind)
+            .where(JobTable.key == key)
+            .where(JobTable.status == JobStatus.pending)
+            .where(JobTable.attempts == 0)
+            .where(JobTable.run_after > func.now())
+            .order_by(JobTable.id)
+            .limit(1)
+            .with_for_update(skip_locked=True)
+        ).scalar()
+
+    def claim(
+        self, kinds: Collection[str], limit: int, lease: timedelta
+    ) -> Sequence[Row]:
+        """
+        Claim up to limit ready jobs of the given kinds, oldest first, and commit.
+        Each claimed job's attempts are incremented, and it will not be claimed
+        again until the lease has passed.
+
+        Jobs locked by another worker's claim are skipped rather than waited
+        for, so any number of workers can claim concurrently. Returns rows of
+        (id, kind, payload, attempts, queued_seconds), where queued_seconds is
+        how long ago the job was enqueued.
+        """
+        ready = (
+            select(JobTable.id)
+            .where(JobTable.status == JobStatus.pending)
+            .where(JobTable.run_after <= func.now())
+            .where(JobTable.kind.in_(kinds))
+            .order_by(JobTable.run_after, JobTable.id)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        jobs = self.session.execute(
+            update(JobTable)
+            .where(JobTable.id.in_(ready.scalar_subquery()))
+            .values(attempts=JobTable.attempts + 1, run_after=func.now() + lease)
+            .returning(
+                JobTable.id,
+                JobTable.kind,
+                JobTable.payload,
+                JobTable.attempts,
+                func.extract("epoch", func.now() - JobTable.created_at).label(
+                    "queued_seconds"
+                ),
+            )
+        ).all()
+        self.session.commit()
+        return sorted(jobs, key=lambda job: job.id)
+
+    def complete(self, ids: Collection[int]):
+        """
+        Remove completed jobs from the queue
+        """
+        self.session.execute(delete(JobTable).where(JobTable.id.in_(ids)))
+        self.session.commit()
+
+    def retry(self, ids: Collection[int], error: str, delay: timedelta):
+        """
+        Make jobs ready to be claimed again after a delay
+        """
+        self.session.execute(
+            update(JobTable)
+            .where(JobTable.id.in_(ids))
+            .values(run_after=func.now() + delay, last_error=error)
+        )
+        self.session.commit()
+
+    def fail(self, ids: Collection[int], error: str):
+        """
+        Give up on jobs, leaving them in the queue as failed
+        """
+        self.session.execute(
+            update(JobTable)
+            .where(JobTable.id.in_(ids))
+            .values(status=JobStatus.failed, last_error=error)
+        )
+        self.session.commit()
+
+    def stats(self) -> Sequence[Row]:
+        """
+        Count the jobs of each kind that are ready to run, waiting (claimed,
+        or waiting to be retried) and failed, along with how long the oldest
+        ready job has been queued
+        """
+        is_pending = JobTable.status == JobStatus.pending
+        is_ready = is_pending & (JobTable.run_after <= func.now())
+        return self.session.execute(
+            select(
+                JobTable.kind,
+                func.count().filter(is_ready).label("ready"),
+                func.count().filter(is_pending & ~is_ready).label("waiting"),
+                func.count()
+                .filter(JobTable.status == JobStatus.failed)
+                .label("failed"),
+                func.extract(
+                    "epoch", func.now() - func.min(JobTable.created_at).filter(is_ready)
+                ).label("oldest_ready_seconds"),
+            )
+            .group_by(JobTable.kind)
+            .order_by(JobTable.kind)
+        ).all()
+
+
+class WatermarkRepository:
+    def __init__(self, session: Session):
+        self.session = session
+
+    def lock(self, name: str) -> Optional[SyncWatermarkTable]:
+        """
+        Load and lock a watermark until the end of the transaction, creating it
+        if it doesn't exist. Returns None if another transaction holds the lock,
+        so that only one process syncs at a time.
+        """
+        self.session.execute(
+            insert(SyncWatermarkTable)
+            .values(name=name, seq=None)
+            .on_conflict_do_nothing(index_elements=["name"])
+        )
+        return self.session.execute(
+            select(SyncWatermarkTable)
+            .where(SyncWatermarkTable.name == name)
+            .with_for_update(skip_locked=True)
+            .execution_options(populate_existing=True)
         ).scalar()
+
+
+class TableStatsRepository:
+    def __init__(self, session: Session):
+        self.session = session
+
+    def upsert_many(self, stats: dict[tuple[str, str], dict]):
+        """
+        Save stats for several tables in one statement, keyed by
+        (data product name, table name). Stats left out, or None, keep their
+        saved values, and stats older than those saved are ignored.
+        This does not commit.
+        """
+        if not stats:
+            return
+
+        # Insert in a consistent order, so concurrent upserts can't deadlock
+        statement = insert(TableStatsTable).values(
+            [
+                {
+                    "data_product_name": data_product_name,
+                    "table_name": table_name,
+                    "row_count": values.get("row_count"),
+                    "last_updated": values.get("last_updated"),
+                    "s3_location": values.get("s3_location"),
+                }
+                for (data_product_name, table_name), values in sorted(stats.items())
+            ]
+        )
+        self.session.execute(
+            statement.on_conflict_do_update(
+                index_elements=["data_product_name", "table_name"],
+                set_={
+                    name: func.coalesce(
+                        statement.excluded[name], getattr(TableStatsTable, name)
+                    )
+                    for name in ("row_count", "last_updated", "s3_location")
+                }
+                | {"updated_at": func.now()},
+                where=or_(
+                    statement.excluded.last_updated.is_(None),
+                    TableStatsTable.last_updated.is_(None),
+                    statement.excluded.last_updated >= TableStatsTable.last_updated,
+                ),
+            )
+        )
+
+    def fetch(
+        self, data_product_name: str, table_name: str
+    ) -> Optional[TableStatsTable]:
+        return self.session.get(TableStatsTable, (data_product_name, table_name))
+
+    def list(self, data_product_name: str) -> Sequence[TableStatsTable]:
+        return (
+            self.session.execute(
+                select(TableStatsTable)
+                .where(TableStatsTable.data_product_name == data_product_name)
+                .order_by(TableStatsTable.table_name)
+            )
+            .scalars()
+            .all()
+        )
+
+
+class ReadModelRepository:
+    def __init__(self, session: Session):
+        self.session = session
+
+    def save(self, version: DataProductVersionTable):
+        """
+        Render the API documents for a new current version of a data product
+        and its schemas, replacing those for the previous version.
+        This does not commit, so that documents are saved in the same
+        transaction as the version itself.
+        """
+        data_product_read = DataProductRead.from_model(version)
+        documents = {
+            data_product_read.id: data_product_read.model_dump_json(by_alias=True)
+        }
+        for schema in version.schemas:
+            schema_read = SchemaRead.model_validate(schema.to_attributes())
+            documents[
+                f"{data_product_read.id}:{schema.name}"
+            ] = schema_read.model_dump_json(by_alias=True)
+
+        self.session.execute(
+            delete(ReadModelTable).where(
+                ReadModelTable.data_product_name == version.name
+            )
+        )
+        self.session.add_all(
+            ReadModelTable(
+                id=id, data_product_name=version.name, document=document.encode()
+            )
+            for id, document in documents.items()
+        )
+
+    def fetch(self, id: str) -> Optional[bytes]:
+        """
+        Load the pre-rendered API document for a data product or schema ID
+        """
+        return self.session.execute(_fetch_read_model, {"id": id}).scalar()
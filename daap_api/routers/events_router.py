@@ -0,0 +1,106 @@
+from itertools import groupby
+from typing import Optional
+
+import structlog
+from fastapi import APIRouter, Header, HTTPException, status
+from fastapi.responses import StreamingResponse
+
+from ..config import settings
+from ..db import Session, session_router
+from ..models.orm.metadata_repositories import ChangeLogRepository
+from ..services.event_broker import Event, event_broker, version_created_event
+
+v1_router = APIRouter(prefix="/v1", tags=["v1"])
+
+logger = structlog.get_logger(__name__)
+
+# How far behind a reconnecting client can be and still catch up from the stream.
+# Clients further behind should catch up using the change feed.
+MAX_REPLAYED_CHANGES = 1000
+
+
+def replay_events(since: int) -> Optional[list[Event]]:
+    """
+    Render the changes committed after since as events, or return None if there
+    are too many to replay
+    """
+    # A short-lived session, rather than a dependency, so that the connection is
+    # returned to the pool rather than held for as long as the stream is open.
+    # This reads from the primary: a replica may not have replayed changes that
+    # committed before the client subscribed, which would then be missed.
+    with Session(session_router.primary) as session:
+        changes = ChangeLogRepository(session).list(
+            since=since, limit=MAX_REPLAYED_CHANGES + 1
+        )
+    if len(changes) > MAX_REPLAYED_CHANGES:
+        return None
+
+    # Changes from one commit are contiguous in the log, and share a version
+    return [
+        version_created_event(
+            {"dataProduct": name, "version": version, "seq": list(group)[-1].seq}
+        )
+        for (name, version), group in groupby(
+            changes, key=lambda change: (change.data_product_name, change.version)
+        )
+    ]
+
+
+@v1_router.get(
+    "/events",
+    response_class=StreamingResponse,
+    responses={200: {"content": {"text/event-stream": {}}}},
+)
+async def stream_events(last_event_id: Optional[int] = Header(default=None)):
+    """
+    Stream a `version-created` server-sent event whenever a new version of a
+    data product is saved. Each event's ID is its position in the change feed
+    (see `/v1/changes`), and browsers' EventSource reconnects with the last ID
+    seen, to replay anything missed while disconnected.
+
+    Clients that can't keep up are sent an `evicted` event, and clients are
+    sent a `resync` event if the server stops receiving changes. In both cases
+    the stream ends, and clients should reconnect.
+    """
+    if not settings.catalogue_events_enabled or not event_broker.listening:
+        raise HTTPException(
+            status.HTTP_503_SERVICE_UNAVAILABLE, "Catalogue events are unavailable"
+        )
+
+    # Subscribe before replaying, so that nothing committed in between is missed
+    subscription = event_broker.subscribe()
+    if subscription is None:
+        raise HTTPException(
+            status.HTTP_503_SERVICE_UNAVAILABLE, "Too many event subscribers"
+        )
+
+    replayed: list[Event] = []
+    if last_event_id is not None:
+        try:
+            replayed = replay_events(last_event_id)
+        except Exception:
+            subscription.close()
+            raise
+        if replayed is None:
+            subscription.close()
+            raise HTTPException(
+                status.HTTP_410_GONE,
+                f"Too many changes since {last_event_id} to replay. "
+                "Catch up using /v1/changes, then reconnect.",
+            )
+
+    async def stream():
+        last_seq = replayed[-1].seq if replayed else last_event_id
+        for event in replayed:
+            yield event.data
+        async for event in subscription.events(settings.event_keepalive_seconds):
+            # Skip anything that was both replayed and queued
+            if event.seq is not None and last_seq is not None and event.seq <= last_seq:
+                continue
+            yield event.data
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,20 @@
+from fastapi import APIRouter
+from sqlalchemy.orm import Session
+
+from ..db import read_session_dependency
+from ..models.api.metadata_api_models import JobQueueStats
+from ..models.orm.metadata_repositories import JobRepository
+from ..services.job_queue import job_workers
+
+v1_router = APIRouter(prefix="/v1", tags=["v1"])
+
+
+@v1_router.get("/jobs/stats")
+async def get_job_stats(session: Session = read_session_dependency) -> JobQueueStats:
+    """
+    Depth of the background job queue, by kind of job.
+
+    Throughput and latency come from the worker that serves the request, and
+    reset when it restarts.
+    """
+    return JobQueueStats.from_rows(JobRepository(session).stats(), job_workers.metrics)
@@ -1,30 +1,78 @@
-from typing import Tuple
+from typing import Literal, Optional, Tuple, Union
 
 import structlog
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, Header, HTTPException, Query, Response, status
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, ValidationError
 from sqlalchemy.exc import IntegrityError
 
-from ..db import Session, session_dependency
+from ..config import settings
+from ..db import (
+    CONSISTENCY_TOKEN_HEADER,
+    Session,
+    read_session_dependency,
+    session_dependency,
+    session_router,
+)
 from ..models.api.metadata_api_models import (
+    DATA_PRODUCT_READ_FIELDS,
+    AutocompleteResults,
+    CatalogueChange,
+    CatalogueStats,
+    ChangeFeed,
+    DataProductBatchItem,
     DataProductCreate,
     DataProductRead,
     DataProductUpdate,
+    SchemaBatchItem,
     SchemaCreate,
+    SchemaInferenceRequest,
     SchemaRead,
     SchemaReadWithDataProduct,
+    TableStatsRead,
 )
 from ..models.orm.metadata_orm_models import (
     DataProductTable,
     DataProductVersionTable,
     SchemaTable,
 )
-from ..models.orm.metadata_repositories import DataProductRepository, SchemaRepository
-from ..services.versioning_service import VersioningService
+from ..models.orm.metadata_repositories import (
+    ChangeLogRepository,
+    DataProductRepository,
+    ReadModelRepository,
+    SchemaRepository,
+    VersionMismatch,
+)
+from ..services.autocomplete_service import MAX_RESULTS, AutocompleteService
+from ..services.catalogue_snapshot import CatalogueSnapshot, catalogue_cache
+from ..services.schema_inference import (
+    BucketNotAllowed,
+    InvalidParquet,
+    ObjectNotFound,
+    UnsupportedTypes,
+    schema_inference,
+)
+from ..services.stats_buffer import TableStats, fetch_stats, total
+from ..services.versioning_service import InvalidUpdate, VersioningService
+from ..services.write_coalescer import PendingUpdate, write_coalescer
 
 v1_router = APIRouter(prefix="/v1", tags=["v1"])
 
 logger = structlog.get_logger(__name__)
 
+MAX_BATCH_SIZE = 500
+MAX_CHANGES_PAGE_SIZE = 1000
+
+expand_query = Query(
+    default=None,
+    description="Set to `schemas` to include the full schema of each table, rather than just its ID",
+)
+consistency_token_header = Header(
+    default=None,
+    alias=CONSISTENCY_TOKEN_HEADER,
+    description="A token returned by a write, to make sure the read sees that write",
+)
+
 
 def parse_data_product_id(id) -> str:
     try:
@@ -44,20 +92,259 @@ def parse_schema_id(id) -> Tuple[str, str]:
     return name, table_name
 
 
+def set_consistency_token(response: Response, session: Session):
+    """
+    Let the client read its own writes, even if reads are served by a replica
+    """
+    response.headers[CONSISTENCY_TOKEN_HEADER] = session_router.consistency_token(
+        session
+    )
+
+
+def current_snapshot(consistency_token: Optional[str]) -> Optional[CatalogueSnapshot]:
+    """
+    The in-memory snapshot of the catalogue, unless the client is reading its own
+    writes: the snapshot is updated asynchronously, so it may not include a write
+    that has just been made. Those reads go to a database that has the write.
+    """
+    if consistency_token is not None:
+        return None
+    return catalogue_cache.current()
+
+
+def with_stats(
+    response: Union[BaseModel, Response], stats: Optional[TableStats]
+) -> Union[BaseModel, Response]:
+    """
+    Add a table's or data product's stats to a response, which may be
+    pre-rendered JSON. Responses are left as they are if there are no stats.
+    """
+    if stats is None:
+        return response
+
+    if isinstance(response, Response):
+        document = response.body
+    else:
+        document = response.model_dump_json(by_alias=True).encode()
+    rendered_stats = TableStatsRead.model_validate(
+        {
+            "rowCount": stats.row_count,
+            "lastUpdated": stats.last_updated,
+            "s3Location": stats.s3_location,
+        }
+    ).model_dump_json(by_alias=True, exclude_none=True)
+
+    # Documents are JSON objects, so the stats are spliced in before the
+    # closing brace, rather than parsing the document and rendering it again
+    body = document.rstrip()[:-1].rstrip()
+    separator = b"" if body.endswith(b"{") else b","
+    return Response(
+        content=body + separator + b'"stats":' + rendered_stats.encode() + b"}",
+        media_type="application/json",
+    )
+
+
+def parse_if_match(if_match: Optional[str]) -> Optional[set[str]]:
+    """
+    Parse an If-Match header into the versions an update is conditional on.
+    Entity tags are data product versions, e.g. "v1.2".
+    """
+    if if_match is None or if_match.strip() == "*":
+        return None
+
+    versions = set()
+    for tag in if_match.split(","):
+        tag = tag.strip().removeprefix("W/").strip('"')
+        if tag:
+            versions.add(tag)
+    return versions
+
+
+def set_etag(response: Response, version: DataProductVersionTable):
+    response.headers["ETag"] = f'"{version.version}"'
+
+
+def version_mismatch(id: str, error: VersionMismatch) -> HTTPException:
+    return HTTPException(
+        status.HTTP_412_PRECONDITION_FAILED,
+        f"{id} has been updated since the version you requested. {error}",
+    )
+
+
+def concurrent_update(id: str) -> HTTPException:
+    return HTTPException(
+        status.HTTP_409_CONFLICT,
+        f"{id} is being updated concurrently by another request. Please try again.",
+    )
+
+
+async def apply_update(
+    session: Session,
+    id: str,
+    data_product_name: str,
+    update: PendingUpdate,
+    if_match: Optional[str],
+) -> Optional[DataProductVersionTable]:
+    """
+    Apply an update to a data product as a new version, merging it with other
+    updates to the same data product if write coalescing is enabled.
+    Conditional updates are never merged, as the merged update might not be
+    based on the version the caller expects.
+    """
+    repo = DataProductRepository(session)
+    if_match_versions = parse_if_match(if_match)
+
+    def apply(update: PendingUpdate) -> Optional[DataProductVersionTable]:
+        def make_version(current_metadata):
+            versioning_service = VersioningService(current_metadata)
+            return versioning_service.apply_updates(update.metadata, update.schemas)
+
+        new_version = repo.update_latest(
+            data_product_name, make_version, if_match=if_match_versions
+        )
+        if new_version is not None:
+            # Load everything needed to build the responses, as they may be
+            # built after this session has closed
+            new_version.schemas
+            new_version.data_product
+        return new_version
+
+    try:
+        if if_match_versions is None:
+            return await write_coalescer.submit(data_product_name, update, apply)
+        return apply(update)
+    except repo.VersionMismatch as error:
+        raise version_mismatch(id, error)
+    except repo.IntegrityError:
+        raise concurrent_update(id)
+
+
+def parse_fields(fields: Optional[str]) -> Optional[set[str]]:
+    if fields is None:
+        return None
+
+    requested = {field.strip() for field in fields.split(",") if field.strip()}
+    invalid = requested.difference(DATA_PRODUCT_READ_FIELDS)
+    if not requested or invalid:
+        raise HTTPException(
+            status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid fields: {', '.join(sorted(invalid)) or fields}",
+        )
+    return {DATA_PRODUCT_READ_FIELDS[field] for field in requested}
+
+
 @v1_router.get("/data-products/")
 async def list_data_products(
-    session: Session = session_dependency,
+    expand: Optional[Literal["schemas"]] = expand_query,
+    fields: Optional[str] = Query(
+        default=None,
+        description="Comma separated list of fields to return, e.g. `id,name,version,status`. Returns all fields if not set.",
+    ),
+    consistency_token: Optional[str] = consistency_token_header,
+    session: Session = read_session_dependency,
 ) -> list[DataProductRead]:
     """
     List all data products on the platform
     """
     repo = DataProductRepository(session)
-    return [DataProductRead.from_model(dp) for dp in repo.list()]
+    expand_schemas = expand == "schemas"
+    sparse_fields = parse_fields(fields)
+
+    if sparse_fields is not None:
+        return JSONResponse(
+            [
+                DataProductRead.sparse_dump_from_model(
+                    dp, sparse_fields, expand_schemas=expand_schemas
+                )
+                for dp in repo.list(fields=sparse_fields)
+            ]
+        )
+
+    snapshot = current_snapshot(consistency_token)
+    if snapshot is not None:
+        return [
+            record.to_read_model(expand_schemas=expand_schemas)
+            for record in snapshot.data_products.values()
+        ]
+
+    return [
+        DataProductRead.from_model(dp, expand_schemas=expand_schemas)
+        for dp in repo.list()
+    ]
+
+
+@v1_router.get("/data-products/batch")
+async def batch_get_data_products(
+    ids: list[str] = Query(min_length=1, max_length=MAX_BATCH_SIZE),
+    session: Session = read_session_dependency,
+) -> list[DataProductBatchItem]:
+    """
+    Fetch metadata about several data products by ID in one request.
+
+    Results are returned in the order requested, and IDs that do not exist
+    are included with `found` set to false.
+    """
+    names = {id: parse_data_product_id(id) for id in ids}
+    found = DataProductRepository(session).fetch_latest_many(set(names.values()))
+
+    return [
+        DataProductBatchItem(
+            id=id,
+            found=name in found,
+            dataProduct=DataProductRead.from_model(found[name])
+            if name in found
+            else None,
+        )
+        for id, name in names.items()
+    ]
+
+
+@v1_router.get("/autocomplete")
+async def autocomplete(
+    q: str = Query(min_length=1, max_length=128),
+    limit: int = Query(default=MAX_RESULTS, ge=1, le=MAX_RESULTS),
+    session: Session = read_session_dependency,
+) -> AutocompleteResults:
+    """
+    Suggest data products and tables whose names match a partially typed search term.
+    """
+    return AutocompleteService(session).suggest(q, limit)
+
+
+@v1_router.get("/stats")
+async def get_stats(session: Session = read_session_dependency) -> CatalogueStats:
+    """
+    Summary statistics about the data products on the platform, broken down by
+    domain and status. They are refreshed in the background, so may take a few
+    seconds to reflect changes.
+    """
+    return CatalogueStats.from_rows(DataProductRepository(session).stats())
+
+
+@v1_router.get("/changes")
+async def list_changes(
+    since: int = Query(default=0, ge=0),
+    limit: int = Query(default=100, ge=1, le=MAX_CHANGES_PAGE_SIZE),
+    session: Session = read_session_dependency,
+) -> ChangeFeed:
+    """
+    List changes to data products and schemas after the sequence number `since`,
+    oldest first.
+
+    To keep a copy of the catalogue in sync, fetch everything once, then
+    repeatedly fetch changes, passing the previous response's `nextSince`.
+    """
+    changes = ChangeLogRepository(session).list(since=since, limit=limit)
+    return ChangeFeed(
+        changes=[CatalogueChange.from_model(change) for change in changes],
+        nextSince=changes[-1].seq if changes else since,
+    )
 
 
 @v1_router.post("/data-products/")
 async def register_data_product(
     data_product: DataProductCreate,
+    response: Response,
     session: Session = session_dependency,
 ) -> DataProductRead:
     """
@@ -78,6 +365,7 @@ async def register_data_product(
             detail="A data product with this name already exists",
         )
 
+    set_consistency_token(response, session)
     return DataProductRead.from_model(data_product_internal)
 
 
@@ -85,61 +373,137 @@ async def register_data_product(
 async def update_data_product(
     id: str,
     data_product: DataProductUpdate,
+    response: Response,
+    if_match: Optional[str] = Header(default=None),
     session: Session = session_dependency,
 ) -> DataProductRead:
     """
     Update metadata directly associated with a data product.
     This will create a new minor version and return a new ID.
+
+    To avoid overwriting someone else's changes, set `If-Match` to the version
+    your update is based on, e.g. `"v1.2"`. If the data product has been
+    updated since, the request fails with 412 Precondition Failed.
     """
-    repo = DataProductRepository(session)
     data_product_name = parse_data_product_id(id)
 
-    current_metadata = repo.fetch_latest(name=data_product_name)
+    new_version = await apply_update(
+        session,
+        id,
+        data_product_name,
+        PendingUpdate(metadata=data_product.model_dump()),
+        if_match,
+    )
 
-    if current_metadata is None:
+    if new_version is None:
         logger.info("Data product does not exist")
         raise HTTPException(
             status.HTTP_404_NOT_FOUND, f"Data product does not exist with id {id}"
         )
 
-    versioning_service = VersioningService(current_metadata)
-    new_version = versioning_service.update_metadata(
-        **data_product.model_dump())
-    repo.update(current_metadata.data_product, new_version)
+    set_consistency_token(response, session)
+    set_etag(response, new_version)
     return DataProductRead.from_model(new_version)
 
 
 @v1_router.get("/data-products/{id}")
 async def get_metadata(
-    id: str, session: Session = session_dependency
+    id: str,
+    expand: Optional[Literal["schemas"]] = expand_query,
+    consistency_token: Optional[str] = consistency_token_header,
+    session: Session = read_session_dependency,
 ) -> DataProductRead:
     """
     Fetch metadata about a data product by ID.
+
+    If ingestion jobs have reported stats about its tables, their total row
+    count and when data last landed are included as `stats`.
     """
     data_product_name = parse_data_product_id(id)
+    response = read_data_product(
+        id, data_product_name, expand, consistency_token, session
+    )
+    stats = fetch_stats(session, data_product_name)
+    return with_stats(response, total(stats.values()) if stats else None)
+
+
+def read_data_product(
+    id: str,
+    data_product_name: str,
+    expand: Optional[Literal["schemas"]],
+    consistency_token: Optional[str],
+    session: Session,
+) -> Union[DataProductRead, Response]:
+    snapshot = current_snapshot(consistency_token)
+    record = snapshot and snapshot.get_data_product(data_product_name)
+    if record:
+        return record.to_read_model(expand_schemas=expand == "schemas")
+
+    if expand is None:
+        document = ReadModelRepository(session).fetch(f"dp:{data_product_name}")
+        if document is not None:
+            return Response(content=document, media_type="application/json")
 
     repo = DataProductRepository(session)
 
-    data_product_internal = repo.fetch_latest(name=data_product_name)
+    data_product_internal = repo.fetch_latest(name=data_product_name, load_schemas=True)
     if data_product_internal is None:
         logger.info("Data product does not exist")
         raise HTTPException(
             status.HTTP_404_NOT_FOUND, f"Data product does not exist with id {id}"
         )
 
-    return DataProductRead.from_model(data_product_internal)
+    return DataProductRead.from_model(
+        data_product_internal, expand_schemas=expand == "schemas"
+    )
+
+
+@v1_router.post("/schemas/infer")
+async def infer_schema(file: SchemaInferenceRequest) -> SchemaCreate:
+    """
+    Infer a schema from a Parquet file, to be described and then registered.
+    Only the file's footer is read, so this is quick however big the file is.
+    """
+    if file.upload_key is not None:
+        bucket, key = settings.landing_zone_bucket_name, file.upload_key
+    else:
+        bucket, key = file.location.removeprefix("s3://").split("/", 1)
+
+    try:
+        schema = schema_inference.infer(bucket, key)
+    except BucketNotAllowed as exception:
+        raise HTTPException(status.HTTP_400_BAD_REQUEST, str(exception))
+    except ObjectNotFound:
+        raise HTTPException(
+            status.HTTP_404_NOT_FOUND, f"File does not exist at s3://{bucket}/{key}"
+        )
+    except (InvalidParquet, UnsupportedTypes) as exception:
+        raise HTTPException(status.HTTP_422_UNPROCESSABLE_ENTITY, str(exception))
+
+    try:
+        return SchemaCreate.model_validate(schema)
+    except ValidationError as exception:
+        raise HTTPException(
+            status.HTTP_422_UNPROCESSABLE_ENTITY,
+            f"The inferred schema is not valid: {exception}",
+        )
 
 
 @v1_router.post("/schemas/{id}")
 async def create_schema(
-    id: str, schema: SchemaCreate, session: Session = session_dependency
+    id: str,
+    schema: SchemaCreate,
+    response: Response,
+    session: Session = session_dependency,
 ) -> SchemaRead:
     """
     Register a schema (blueprint of your table) for a new table in your Data Product.
     """
     data_product_name, table_name = parse_schema_id(id)
 
-    data_product_version = DataProductRepository(session).fetch_latest(
+    # Lock the data product, so that the schema can't be added to a version that
+    # a concurrent update is replacing
+    data_product_version = DataProductRepository(session).lock_latest(
         name=data_product_name
     )
     if data_product_version is None:
@@ -162,15 +526,74 @@ async def create_schema(
             status.HTTP_409_CONFLICT, f"A schema with this name already exists"
         )
 
+    set_consistency_token(response, session)
     return SchemaRead.model_validate(schema_internal.to_attributes())
 
 
+@v1_router.get("/schemas/batch")
+async def batch_get_schemas(
+    ids: list[str] = Query(min_length=1, max_length=MAX_BATCH_SIZE),
+    session: Session = read_session_dependency,
+) -> list[SchemaBatchItem]:
+    """
+    Get several schemas by ID in one request.
+
+    Results are returned in the order requested, and IDs that do not exist
+    are included with `found` set to false.
+    """
+    keys = {id: parse_schema_id(id) for id in ids}
+    found = SchemaRepository(session).fetch_latest_many(set(keys.values()))
+
+    return [
+        SchemaBatchItem(
+            id=id,
+            found=key in found,
+            schema=SchemaRead.model_validate(found[key].to_attributes())
+            if key in found
+            else None,
+        )
+        for id, key in keys.items()
+    ]
+
+
 @v1_router.get("/schemas/{id}")
-async def get_schema(id: str, session: Session = session_dependency) -> SchemaRead:
+async def get_schema(
+    id: str,
+    consistency_token: Optional[str] = consistency_token_header,
+    session: Session = read_session_dependency,
+) -> SchemaRead:
     """
     Get a schema that has been registered to a data product by ID.
+
+    If ingestion jobs have reported stats about the table, they are included
+    as `stats`.
     """
     data_product_name, table_name = parse_schema_id(id)
+    response = read_schema(
+        id, data_product_name, table_name, consistency_token, session
+    )
+    stats = fetch_stats(session, data_product_name).get(table_name)
+    return with_stats(response, stats)
+
+
+def read_schema(
+    id: str,
+    data_product_name: str,
+    table_name: str,
+    consistency_token: Optional[str],
+    session: Session,
+) -> Union[SchemaRead, Response]:
+    snapshot = current_snapshot(consistency_token)
+    record = snapshot and snapshot.get_schema(data_product_name, table_name)
+    if record:
+        return record.to_read_model()
+
+    document = ReadModelRepository(session).fetch(
+        f"dp:{data_product_name}:{table_name}"
+    )
+    if document is not None:
+        return Response(content=document, media_type="application/json")
+
     schema = SchemaRepository(session).fetch_latest(
         data_product_name=data_product_name, table_name=table_name
     )
@@ -185,29 +608,51 @@ async def get_schema(id: str, session: Session = session_dependency) -> SchemaRe
 
 @v1_router.put("/schemas/{id}")
 async def update_schema(
-    id: str, schema: SchemaCreate, session: Session = session_dependency
+    id: str,
+    schema: SchemaCreate,
+    response: Response,
+    if_match: Optional[str] = Header(default=None),
+    session: Session = session_dependency,
 ) -> SchemaReadWithDataProduct:
+    """
+    Update a schema, creating a new version of its data product.
+
+    To avoid overwriting someone else's changes, set `If-Match` to the data
+    product version your update is based on, e.g. `"v1.2"`. If the data product
+    has been updated since, the request fails with 412 Precondition Failed.
+    """
     data_product_name, table_name = parse_schema_id(id)
-    repo = SchemaRepository(session)
-    fetched_schema = repo.fetch_latest(
-        data_product_name=data_product_name, table_name=table_name
+    not_found = HTTPException(
+        status.HTTP_404_NOT_FOUND,
+        f"id {id} references a data product version that does not exist",
     )
-    if fetched_schema is None:
-        raise HTTPException(
-            status.HTTP_404_NOT_FOUND,
-            f"id {id} references a data product version that does not exist",
-        )
-    versioning_service = VersioningService(fetched_schema.data_product_version)
 
-    new_version = versioning_service.update_schema(
-        table_name,
-        columns=[column.model_dump() for column in schema.columns],
-        table_description=schema.table_description,
+    # Check the schema exists up front, so that an update to a missing schema
+    # can't cause other updates it is merged with to fail
+    if SchemaRepository(session).fetch_latest(data_product_name, table_name) is None:
+        raise not_found
+
+    update = PendingUpdate(
+        schemas={
+            table_name: {
+                "columns": [column.model_dump() for column in schema.columns],
+                "table_description": schema.table_description,
+            }
+        }
     )
+    try:
+        new_version = await apply_update(
+            session, id, data_product_name, update, if_match
+        )
+    except InvalidUpdate:
+        # The schema was removed after the check above
+        raise not_found
 
-    DataProductRepository(session).update(
-        fetched_schema.data_product_version.data_product, new_version
-    )
+    if new_version is None:
+        raise not_found
+
+    set_consistency_token(response, session)
+    set_etag(response, new_version)
 
     new_schema = [
         schema for schema in new_version.schemas if schema.name == table_name
@@ -0,0 +1,85 @@
+import structlog
+from fastapi import APIRouter, HTTPException, Response, status
+
+from ..db import Session, read_session_dependency, session_dependency
+from ..models.api.metadata_api_models import SubscriptionCreate, SubscriptionRead
+from ..models.orm.metadata_orm_models import SubscriptionTable
+from ..models.orm.metadata_repositories import (
+    DataProductRepository,
+    SubscriptionRepository,
+)
+from ..services.change_notifications import UnsafeURL, check_subscriber_url
+from .metadata_router import parse_data_product_id, set_consistency_token
+
+v1_router = APIRouter(prefix="/v1", tags=["v1"])
+
+logger = structlog.get_logger(__name__)
+
+
+@v1_router.post("/data-products/{id}/subscriptions")
+async def subscribe(
+    id: str,
+    subscription: SubscriptionCreate,
+    response: Response,
+    session: Session = session_dependency,
+) -> SubscriptionRead:
+    """
+    Subscribe a URL to notifications of new versions of a data product.
+    Subscribing a URL that is already subscribed returns the existing subscription.
+    The URL must use HTTPS, and its host must be on the public internet.
+    """
+    data_product_name = parse_data_product_id(id)
+    url = str(subscription.url)
+    try:
+        check_subscriber_url(url)
+    except UnsafeURL as error:
+        raise HTTPException(status.HTTP_422_UNPROCESSABLE_ENTITY, str(error))
+
+    if DataProductRepository(session).fetch_latest(data_product_name) is None:
+        raise HTTPException(
+            status.HTTP_404_NOT_FOUND, f"Data product does not exist with id {id}"
+        )
+
+    repo = SubscriptionRepository(session)
+    try:
+        subscription_internal = repo.create(
+            SubscriptionTable(data_product_name=data_product_name, url=url)
+        )
+    except repo.IntegrityError:
+        session.rollback()
+        subscription_internal = repo.fetch_by_url(data_product_name, url)
+
+    set_consistency_token(response, session)
+    return SubscriptionRead.from_model(subscription_internal)
+
+
+@v1_router.get("/data-products/{id}/subscriptions")
+async def list_subscriptions(
+    id: str, session: Session = read_session_dependency
+) -> list[SubscriptionRead]:
+    """
+    List the URLs subscribed to notifications of new versions of a data product
+    """
+    data_product_name = parse_data_product_id(id)
+    return [
+        SubscriptionRead.from_model(subscription)
+        for subscription in SubscriptionRepository(session).list(data_product_name)
+    ]
+
+
+@v1_router.delete(
+    "/subscriptions/{subscription_id}", status_code=status.HTTP_204_NO_CONTENT
+)
+async def unsubscribe(subscription_id: int, session: Session = session_dependency):
+    """
+    Stop sending notifications to a subscriber. Notifications already queued
+    may still be sent.
+    """
+    repo = SubscriptionRepository(session)
+    subscription = repo.fetch(subscription_id)
+    if subscription is None:
+        raise HTTPException(
+            status.HTTP_404_NOT_FOUND,
+            f"Subscription does not exist with id {subscription_id}",
+        )
+    repo.delete(subscription)
@@ -0,0 +1,64 @@
+import structlog
+from fastapi import APIRouter, HTTPException, status
+
+from ..config import settings
+from ..db import Session, session_dependency
+from ..models.api.metadata_api_models import TableStatsBatch
+from ..models.orm.metadata_repositories import SchemaRepository
+from ..services.stats_buffer import (
+    TableStats,
+    coalesce,
+    save,
+    stats_buffer,
+    stats_cache,
+)
+from .metadata_router import parse_schema_id
+
+v1_router = APIRouter(prefix="/v1", tags=["v1"])
+
+logger = structlog.get_logger(__name__)
+
+
+@v1_router.post("/table-stats", status_code=status.HTTP_202_ACCEPTED)
+async def report_table_stats(
+    batch: TableStatsBatch, session: Session = session_dependency
+):
+    """
+    Report stats about the data in several tables, such as row counts and when
+    data last landed. This doesn't create new versions of data products.
+
+    Stats are saved in the background, within a few seconds, so may not be
+    returned straight away. Stats that are left out are left as they are, and
+    stats older than those already reported are ignored.
+    """
+    if len(batch.stats) > settings.table_stats_max_batch_size:
+        raise HTTPException(
+            status.HTTP_400_BAD_REQUEST,
+            f"At most {settings.table_stats_max_batch_size} tables can be reported at a time",
+        )
+
+    keys = {item.id: parse_schema_id(item.id) for item in batch.stats}
+    found = SchemaRepository(session).fetch_latest_many(set(keys.values()))
+    missing = [id for id, key in keys.items() if key not in found]
+    if missing:
+        raise HTTPException(
+            status.HTTP_404_NOT_FOUND,
+            f"Schemas do not exist with ids {', '.join(missing)}",
+        )
+
+    stats = coalesce(
+        (
+            keys[item.id],
+            TableStats(
+                row_count=item.row_count,
+                last_updated=item.last_updated,
+                s3_location=item.s3_location,
+            ),
+        )
+        for item in batch.stats
+    )
+    if stats_buffer.running:
+        stats_buffer.add(stats)
+    else:
+        save(session, stats)
+        stats_cache.clear()
@@ -0,0 +1,188 @@
+import asyncio
+
+import structlog
+from fastapi import APIRouter, HTTPException, status
+
+from ..config import settings
+from ..db import Session, read_session_dependency
+from ..models.api.metadata_api_models import (
+    FileValidationRead,
+    FileValidationRequest,
+    UploadComplete,
+    UploadCompleted,
+    UploadCreate,
+    UploadPartsRequest,
+    UploadParts,
+    UploadRead,
+)
+from ..models.orm.metadata_orm_models import SchemaTable
+from ..models.orm.metadata_repositories import SchemaRepository
+from ..services.file_validation import file_validator
+from ..services.multipart_uploads import (
+    InvalidParts,
+    UploadNotFound,
+    multipart_uploads,
+    upload_prefix,
+)
+from .metadata_router import parse_schema_id
+
+v1_router = APIRouter(prefix="/v1", tags=["v1"])
+
+logger = structlog.get_logger(__name__)
+
+
+def parse_upload_schema_id(id: str, session: Session) -> tuple[str, str]:
+    """
+    Parse a schema id, checking the schema exists
+    """
+    data_product_name, table_name = parse_schema_id(id)
+    fetch_schema(id, session)
+    return data_product_name, table_name
+
+
+def fetch_schema(id: str, session: Session) -> SchemaTable:
+    data_product_name, table_name = parse_schema_id(id)
+    schema = SchemaRepository(session).fetch_latest(data_product_name, table_name)
+    if schema is None:
+        raise HTTPException(
+            status.HTTP_404_NOT_FOUND, f"Schema does not exist with id {id}"
+        )
+    return schema
+
+
+def check_key(id: str, key: str, session: Session):
+    """
+    Only allow an upload to be continued through the schema it was started for
+    """
+    data_product_name, table_name = parse_upload_schema_id(id, session)
+    if not key.startswith(upload_prefix(data_product_name, table_name)):
+        raise HTTPException(
+            status.HTTP_400_BAD_REQUEST, f"Key {key} is not an upload for {id}"
+        )
+
+
+@v1_router.post("/schemas/{id}/uploads")
+async def start_upload(
+    id: str, upload: UploadCreate, session: Session = read_session_dependency
+) -> UploadRead:
+    """
+    Start a multipart upload of a data file for a table to the landing zone.
+    Get URLs to upload the parts to from the parts endpoint.
+    """
+    data_product_name, table_name = parse_upload_schema_id(id, session)
+    upload_id, key = multipart_uploads.start(
+        data_product_name, table_name, upload.filename
+    )
+    logger.info(f"Started upload {upload_id} to {key}")
+    return UploadRead.model_validate({"uploadId": upload_id, "key": key})
+
+
+@v1_router.post("/schemas/{id}/uploads/{upload_id}/parts")
+async def presign_upload_parts(
+    id: str,
+    upload_id: str,
+    request: UploadPartsRequest,
+    session: Session = read_session_dependency,
+) -> UploadParts:
+    """
+    Get presigned URLs to PUT parts of a file to, which can be done in parallel.
+    Each part must be at least 5MB, except the last.
+    Keep the ETag header of each response to complete the upload.
+    """
+    if len(request.part_numbers) > settings.upload_max_part_urls:
+        raise HTTPException(
+            status.HTTP_400_BAD_REQUEST,
+            f"At most {settings.upload_max_part_urls} part URLs can be requested at a time",
+        )
+    check_key(id, request.key, session)
+
+    urls = multipart_uploads.presign_parts(request.key, upload_id, request.part_numbers)
+    return UploadParts.model_validate(
+        {
+            "parts": [
+                {"partNumber": part_number, "url": url}
+                for part_number, url in urls.items()
+            ],
+            "expiresIn": multipart_uploads.expires_in,
+        }
+    )
+
+
+@v1_router.post("/schemas/{id}/uploads/{upload_id}/complete")
+async def complete_upload(
+    id: str,
+    upload_id: str,
+    upload: UploadComplete,
+    session: Session = read_session_dependency,
+) -> UploadCompleted:
+    """
+    Finish an upload, once all of its parts have been uploaded
+    """
+    check_key(id, upload.key, session)
+
+    try:
+        etag = multipart_uploads.complete(
+            upload.key,
+            upload_id,
+            {part.part_number: part.etag for part in upload.parts},
+        )
+    except UploadNotFound:
+        raise HTTPException(
+            status.HTTP_404_NOT_FOUND, f"Upload does not exist with id {upload_id}"
+        )
+    except InvalidParts as exception:
+        raise HTTPException(status.HTTP_400_BAD_REQUEST, str(exception))
+
+    logger.info(f"Completed upload {upload_id} to {upload.key}")
+    return UploadCompleted(key=upload.key, etag=etag)
+
+
+@v1_router.delete(
+    "/schemas/{id}/uploads/{upload_id}", status_code=status.HTTP_204_NO_CONTENT
+)
+async def abort_upload(
+    id: str, upload_id: str, key: str, session: Session = read_session_dependency
+):
+    """
+    Abandon an upload, deleting the parts uploaded so far
+    """
+    check_key(id, key, session)
+
+    try:
+        multipart_uploads.abort(key, upload_id)
+    except UploadNotFound:
+        raise HTTPException(
+            status.HTTP_404_NOT_FOUND, f"Upload does not exist with id {upload_id}"
+        )
+    logger.info(f"Aborted upload {upload_id} to {key}")
+
+
+@v1_router.post("/schemas/{id}/validations")
+async def validate_files(
+    id: str,
+    request: FileValidationRequest,
+    session: Session = read_session_dependency,
+) -> list[FileValidationRead]:
+    """
+    Check that files in the landing zone match the schema of their table: that
+    they have its columns, and that their values can be read as its types.
+    """
+    if len(request.keys) > settings.file_validation_max_files:
+        raise HTTPException(
+            status.HTTP_400_BAD_REQUEST,
+            f"At most {settings.file_validation_max_files} files can be validated at a time",
+        )
+    schema = fetch_schema(id, session)
+    prefix = upload_prefix(*parse_schema_id(id))
+    for key in request.keys:
+        if not key.startswith(prefix):
+            raise HTTPException(
+                status.HTTP_400_BAD_REQUEST, f"Key {key} is not an upload for {id}"
+            )
+
+    results = await asyncio.to_thread(
+        file_validator.validate_many, request.keys, list(schema.columns)
+    )
+    for result in results:
+        logger.info(f"Validated {result.key}: {'valid' if result.valid else 'invalid'}")
+    return [FileValidationRead.from_model(result) for result in results]
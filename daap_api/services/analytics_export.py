@@ -0,0 +1,318 @@
+"""
+Exports the catalogue's history to Parquet files in the data bucket, for
+analysts to query (e.g. with Athena) without touching the API's database.
+
+Two datasets are written, both partitioned by domain, Hive style:
+
+- data_product_versions: a row per version of each data product
+- data_product_columns: a row per column of each schema of each version
+
+Versions and schemas are never changed once saved, so the export only appends.
+Each run follows the change log (see ChangeLogRepository) from a watermark, and
+exports the versions and schemas created since. A new version's schemas that
+were copied unchanged from the previous version have no changes of their own,
+so are exported with the version. The first export, when there is no watermark
+yet, exports everything as of one snapshot of the database.
+
+Each page of changes is written to one file per domain, named after the range
+of sequence numbers in it, so a page that is exported again after a failure
+replaces its files rather than duplicating rows. The watermark is only advanced
+once the files have been written.
+
+Columns with few distinct values, such as names, versions and types, are
+dictionary encoded, both in Arrow and in Parquet, which keeps the files small
+and makes grouping by them cheap.
+
+New rows are exported every analytics_export_interval_seconds. The watermark
+row is locked while exporting, so only one worker exports at a time.
+"""
+
+import io
+from typing import Callable, Sequence
+
+import boto3
+import pyarrow as pa
+import pyarrow.parquet as pq
+import structlog
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..db import engine
+from ..models.orm.metadata_orm_models import (
+    ChangeType,
+    DataProductVersionTable,
+    SchemaTable,
+    Status,
+)
+from ..models.orm.metadata_repositories import (
+    ChangeLogRepository,
+    DataProductRepository,
+    WatermarkRepository,
+)
+from .background import LazyClient, PeriodicTask
+
+logger = structlog.get_logger(__name__)
+
+ANALYTICS_PREFIX = "analytics"
+VERSIONS_DATASET = "data_product_versions"
+COLUMNS_DATASET = "data_product_columns"
+ANALYTICS_WATERMARK = "analytics"
+
+CATEGORY = pa.dictionary(pa.int32(), pa.string())
+
+# The domain is not stored in the files, as it is the partition
+VERSIONS_SCHEMA = pa.schema(
+    [
+        ("version_id", pa.int64()),
+        ("name", CATEGORY),
+        ("version", CATEGORY),
+        ("status", CATEGORY),
+        ("description", pa.string()),
+        ("data_product_owner", CATEGORY),
+        ("email", CATEGORY),
+        ("retention_period", pa.int64()),
+        ("dpia_required", pa.bool_()),
+        ("tags", pa.map_(pa.string(), pa.string())),
+    ]
+)
+COLUMNS_SCHEMA = pa.schema(
+    [
+        ("schema_id", pa.int64()),
+        ("version_id", pa.int64()),
+        ("data_product_name", CATEGORY),
+        ("version", CATEGORY),
+        ("table_name", CATEGORY),
+        ("table_description", pa.string()),
+        ("position", pa.int32()),
+        ("column_name", CATEGORY),
+        ("column_type", CATEGORY),
+        ("column_description", pa.string()),
+    ]
+)
+
+
+def version_row(version: DataProductVersionTable) -> dict:
+    return {
+        "version_id": version.id,
+        "name": version.name,
+        "version": version.version,
+        "status": Status(version.status).value,
+        "description": version.description,
+        "data_product_owner": version.data_product_owner,
+        "email": version.email,
+        "retention_period": version.retention_period,
+        "dpia_required": version.dpia_required,
+        "tags": list((version.tags or {}).items()),
+    }
+
+
+def column_rows(schema: SchemaTable) -> list[dict]:
+    version = schema.data_product_version
+    return [
+        {
+            "schema_id": schema.id,
+            "version_id": version.id,
+            "data_product_name": version.name,
+            "version": version.version,
+            "table_name": schema.name,
+            "table_description": schema.table_description,
+            "position": position,
+            "column_name": column.get("name"),
+            "column_type": column.get("type"),
+            "column_description": column.get("description"),
+        }
+        for position, column in enumerate(schema.columns)
+    ]
+
+
+def to_parquet(rows: Sequence[dict], schema: pa.Schema) -> bytes:
+    buffer = io.BytesIO()
+    pq.write_table(
+        pa.Table.from_pylist(rows, schema=schema),
+        buffer,
+        compression="zstd",
+        use_dictionary=[
+            field.name for field in schema if pa.types.is_dictionary(field.type)
+        ],
+    )
+    return buffer.getvalue()
+
+
+class AnalyticsExporter(PeriodicTask):
+    failure_message = "Analytics export failed"
+    client = LazyClient()
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        client_factory: Callable[[], object],
+        bucket: str,
+        page_size: int,
+        interval: float,
+    ):
+        super().__init__(interval)
+        self.session_factory = session_factory
+        self.client_factory = client_factory
+        self.bucket = bucket
+        self.page_size = page_size
+
+    def run_once(self):
+        self.export()
+
+    def export(self) -> tuple[int, int]:
+        """
+        Export everything saved since the last export, a page of changes at a
+        time, until there are none left. Returns the number of versions and
+        schemas exported.
+        """
+        versions = schemas = 0
+        while True:
+            page_versions, page_schemas, done = self.export_page()
+            versions += page_versions
+            schemas += page_schemas
+            if done:
+                return versions, schemas
+
+    def export_page(self) -> tuple[int, int, bool]:
+        """
+        Export the versions and schemas created in the next page of changes,
+        and advance the watermark. Returns the number of versions and schemas
+        exported, and whether there are no more changes.
+        """
+        with self.session_factory() as session:
+            watermark = WatermarkRepository(session).lock(ANALYTICS_WATERMARK)
+            if watermark is None:
+                logger.info("Analytics export is already running elsewhere")
+                return 0, 0, True
+
+            if watermark.seq is None:
+                versions, schemas = self._full_export(watermark)
+                session.commit()
+                return versions, schemas, False
+
+            changes = ChangeLogRepository(session).list(
+                since=watermark.seq, limit=self.page_size
+            )
+            if not changes:
+                session.rollback()
+                return 0, 0, True
+
+            new_versions: dict[tuple[str, str], None] = {}
+            new_tables: dict[tuple[str, str, str], None] = {}
+            for change in changes:
+                if change.change == ChangeType.deleted:
+                    continue
+                _, *names = change.entity_id.split(":")
+                if len(names) == 1:
+                    new_versions[(change.data_product_name, change.version)] = None
+                else:
+                    new_tables[
+                        (change.data_product_name, change.version, names[1])
+                    ] = None
+
+            # Versions that have since been archived are no longer exported.
+            # Their changed tables are looked up after loading them, so that
+            # any schema loaded is known to have its own change, and is only
+            # exported with that change.
+            loaded = DataProductRepository(session).fetch_many(
+                set(new_versions).union(
+                    (name, version) for name, version, _ in new_tables
+                )
+            )
+            changed_tables = ChangeLogRepository(session).changed_tables(new_versions)
+            versions = [loaded[id] for id in new_versions if id in loaded]
+            schemas = [
+                schema
+                for version in versions
+                for schema in version.schemas
+                if (version.name, version.version, schema.name) not in changed_tables
+            ] + [
+                schema
+                for name, version, table in new_tables
+                if (name, version) in loaded
+                for schema in loaded[(name, version)].schemas
+                if schema.name == table
+            ]
+            self._write_page(
+                versions,
+                schemas,
+                f"changes-{changes[0].seq:012d}-{changes[-1].seq:012d}",
+            )
+
+            watermark.seq = changes[-1].seq
+            session.commit()
+            return len(versions), len(schemas), len(changes) < self.page_size
+
+    def _full_export(self, watermark) -> tuple[int, int]:
+        # Read in a separate repeatable read transaction, so that the latest
+        # sequence number and the versions are as of the same snapshot, and
+        # the next export starts from exactly what was exported here
+        versions = schemas = 0
+        with self.session_factory() as snapshot:
+            snapshot.connection(
+                execution_options={"isolation_level": "REPEATABLE READ"}
+            )
+            latest_seq = ChangeLogRepository(snapshot).latest_seq()
+            after_id = 0
+            while True:
+                page = DataProductRepository(snapshot).list_versions_after(
+                    after_id, self.page_size
+                )
+                if not page:
+                    break
+                page_schemas = [
+                    schema for version in page for schema in version.schemas
+                ]
+                self._write_page(
+                    page, page_schemas, f"all-{page[0].id:012d}-{page[-1].id:012d}"
+                )
+                versions += len(page)
+                schemas += len(page_schemas)
+                after_id = page[-1].id
+        watermark.seq = latest_seq
+        logger.info(f"Exported all {versions} versions and {schemas} schemas")
+        return versions, schemas
+
+    def _write_page(
+        self,
+        versions: Sequence[DataProductVersionTable],
+        schemas: Sequence[SchemaTable],
+        name: str,
+    ):
+        versions_by_domain: dict[str, list[dict]] = {}
+        for version in versions:
+            versions_by_domain.setdefault(version.domain, []).append(
+                version_row(version)
+            )
+        columns_by_domain: dict[str, list[dict]] = {}
+        for schema in schemas:
+            columns_by_domain.setdefault(schema.data_product_version.domain, []).extend(
+                column_rows(schema)
+            )
+        self._write(VERSIONS_DATASET, VERSIONS_SCHEMA, versions_by_domain, name)
+        self._write(COLUMNS_DATASET, COLUMNS_SCHEMA, columns_by_domain, name)
+
+    def _write(
+        self,
+        dataset: str,
+        schema: pa.Schema,
+        rows_by_domain: dict[str, list[dict]],
+        name: str,
+    ):
+        for domain, rows in rows_by_domain.items():
+            if not rows:
+                continue
+            key = f"{ANALYTICS_PREFIX}/{dataset}/domain={domain}/{name}.parquet"
+            self.client.put_object(
+                Bucket=self.bucket, Key=key, Body=to_parquet(rows, schema)
+            )
+        logger.info(f"Exported {dataset} {name}")
+
+
+analytics_exporter = AnalyticsExporter(
+    session_factory=lambda: Session(engine),
+    client_factory=lambda: boto3.client("s3", region_name=settings.aws_region),
+    bucket=settings.data_bucket_name,
+    page_size=settings.analytics_export_page_size,
+    interval=settings.analytics_export_interval_seconds,
+)
@@ -0,0 +1,67 @@
+"""
+Service for suggesting data product and table names as a user types.
+
+Names are matched by prefix, with trigram similarity as a fallback for typos.
+Both are backed by pg_trgm GIN indexes on the name columns.
+
+Results for popular prefixes are cached in-process for a few seconds, so that
+many users typing the same thing don't each hit the database on every keystroke.
+"""
+
+from sqlalchemy.orm import Session
+
+from ..cache import TTLCache
+from ..config import settings
+from ..models.api.metadata_api_models import (
+    AutocompleteResults,
+    DataProductSuggestion,
+    SchemaSuggestion,
+)
+from ..models.orm.metadata_repositories import DataProductRepository, SchemaRepository
+
+MAX_RESULTS = 20
+MAX_CACHED_QUERIES = 1024
+
+suggestion_cache = TTLCache(
+    ttl=settings.autocomplete_cache_ttl_seconds, max_size=MAX_CACHED_QUERIES
+)
+
+
+class AutocompleteService:
+    def __init__(self, session: Session, cache: TTLCache = suggestion_cache):
+        self.session = session
+        self.cache = cache
+
+    def suggest(self, query: str, limit: int = MAX_RESULTS) -> AutocompleteResults:
+        """
+        Suggest up to `limit` data products and up to `limit` tables matching the query.
+        """
+        query = query.strip().lower()
+        limit = min(limit, MAX_RESULTS)
+
+        key = (query, limit)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+
+        data_product_names = DataProductRepository(self.session).autocomplete(
+            query, limit
+        )
+        schema_names = SchemaRepository(self.session).autocomplete(query, limit)
+
+        results = AutocompleteResults(
+            dataProducts=[
+                DataProductSuggestion(id=f"dp:{name}", name=name)
+                for name in data_product_names
+            ],
+            schemas=[
+                SchemaSuggestion(
+                    id=f"dp:{data_product_name}:{table_name}",
+                    name=table_name,
+                    dataProductId=f"dp:{data_product_name}",
+                )
+                for data_product_name, table_name in schema_names
+            ],
+        )
+        self.cache.set(key, results)
+        return results
@@ -0,0 +1,95 @@
+"""
+Shared plumbing for services that run in the background of every worker, or
+that talk to AWS.
+"""
+
+import asyncio
+import threading
+from typing import Optional
+
+import structlog
+
+# Creating boto3 clients is not thread safe
+_client_lock = threading.Lock()
+
+
+class LazyClient:
+    """
+    A client attribute, made with its owner's client_factory the first time it
+    is used rather than when the owner is, so that importing a service doesn't
+    need AWS credentials. Tests can set _client to use a client of their own.
+    """
+
+    def __set_name__(self, owner, name):
+        owner._client = None
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+        if instance._client is None:
+            with _client_lock:
+                if instance._client is None:
+                    instance._client = instance.client_factory()
+        return instance._client
+
+
+class PeriodicTask:
+    """
+    Base class for a service that does some work in a thread every interval
+    seconds, in a task on the worker's event loop, from start until stop.
+    Subclasses implement run_once.
+
+    The work is also done as soon as the task starts, and whenever wake is
+    called. If it fails, the error is logged and the work is tried again at
+    the next interval.
+    """
+
+    # Logged when run_once raises
+    failure_message = "Background task failed"
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+        self._wake = asyncio.Event()
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    def run_once(self):
+        raise NotImplementedError
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def wake(self):
+        """
+        Do the work again now, rather than waiting for the next interval
+        """
+        self._wake.set()
+
+    async def run(self):
+        logger = structlog.get_logger(type(self).__module__)
+        while True:
+            # Cleared before running, so a wake up while running isn't lost
+            self._wake.clear()
+            try:
+                await asyncio.to_thread(self.run_once)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception(self.failure_message)
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
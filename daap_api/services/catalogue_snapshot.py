@@ -0,0 +1,262 @@
+"""
+An optional in-memory snapshot of the current version of every data product
+and schema, so that reads don't need to go to the database.
+
+The catalogue is small, so each worker can hold all of it. A snapshot is never
+modified once built. When a data product changes, a new snapshot is built with
+that data product reloaded, and swapped in by replacing a single reference.
+
+Changes are picked up from Postgres notifications (see change_listener). If the
+listener is disconnected, or a change has not been applied within the staleness
+limit, the snapshot is not used and reads fall back to the database.
+"""
+
+import asyncio
+import sys
+import time
+from types import MappingProxyType
+from typing import Callable, Collection, Iterable, Mapping, Optional
+
+import structlog
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..db import engine
+from ..models.api.metadata_api_models import DataProductRead, SchemaId, SchemaRead
+from ..models.orm.metadata_orm_models import DataProductVersionTable, SchemaTable
+from ..models.orm.metadata_repositories import DataProductRepository
+from .change_listener import ChangeSubscriber
+
+logger = structlog.get_logger(__name__)
+
+
+def _intern(value: Optional[str]) -> Optional[str]:
+    return None if value is None else sys.intern(value)
+
+
+class SchemaRecord:
+    """
+    Compact, read-only copy of a schema in the current version of a data product
+    """
+
+    __slots__ = ("external_id", "name", "table_description", "columns")
+
+    def __init__(self, schema: SchemaTable, data_product_external_id: str):
+        self.name = schema.name
+        self.external_id = f"{data_product_external_id}:{schema.name}"
+        self.table_description = schema.table_description
+        # Column types and keys repeat across every table, so share one copy of each
+        self.columns = tuple(
+            {
+                _intern(key): _intern(value) if key == "type" else value
+                for key, value in column.items()
+            }
+            for column in schema.columns
+        )
+
+    def to_read_model(self) -> SchemaRead:
+        return SchemaRead.model_validate(
+            {
+                "id": self.external_id,
+                "tableDescription": self.table_description,
+                "columns": self.columns,
+            }
+        )
+
+
+class DataProductRecord:
+    """
+    Compact, read-only copy of the current version of a data product
+    """
+
+    __slots__ = (
+        "name",
+        "version",
+        "description",
+        "domain",
+        "status",
+        "data_product_owner",
+        "data_product_owner_display_name",
+        "email",
+        "retention_period",
+        "dpia_required",
+        "tags",
+        "schemas",
+    )
+
+    def __init__(self, model: DataProductVersionTable):
+        self.name = model.name
+        self.version = _intern(model.version)
+        self.description = model.description
+        self.domain = _intern(model.domain)
+        self.status = _intern(model.status.value)
+        self.data_product_owner = _intern(model.data_product_owner)
+        self.data_product_owner_display_name = _intern(
+            model.data_product_owner_display_name
+        )
+        self.email = _intern(model.email)
+        self.retention_period = model.retention_period
+        self.dpia_required = model.dpia_required
+        self.tags = MappingProxyType(dict(model.tags or {}))
+        self.schemas = tuple(
+            SchemaRecord(schema, model.external_id) for schema in model.schemas
+        )
+
+    def get_schema(self, table_name: str) -> Optional[SchemaRecord]:
+        for schema in self.schemas:
+            if schema.name == table_name:
+                return schema
+        return None
+
+    def to_read_model(self, expand_schemas=False) -> DataProductRead:
+        value = DataProductRead.model_validate(
+            {
+                "id": f"dp:{self.name}",
+                "name": self.name,
+                "version": self.version,
+                "description": self.description,
+                "status": self.status,
+                "retentionPeriod": self.retention_period,
+                "dpiaRequired": self.dpia_required,
+                "domain": self.domain,
+                "dataProductOwner": self.data_product_owner,
+                "dataProductOwnerDisplayName": self.data_product_owner_display_name,
+                "email": self.email,
+                "tags": dict(self.tags),
+            }
+        )
+        if expand_schemas:
+            value.schemas = [schema.to_read_model() for schema in self.schemas]
+        else:
+            value.schemas = [SchemaId(id=schema.external_id) for schema in self.schemas]
+        return value
+
+
+class CatalogueSnapshot:
+    """
+    An immutable view of the current version of every data product, ordered by name
+    """
+
+    __slots__ = ("data_products",)
+
+    def __init__(self, data_products: Iterable[DataProductRecord]):
+        self.data_products: Mapping[str, DataProductRecord] = MappingProxyType(
+            {record.name: record for record in sorted(data_products, key=_name)}
+        )
+
+    def get_data_product(self, name: str) -> Optional[DataProductRecord]:
+        return self.data_products.get(name)
+
+    def get_schema(self, name: str, table_name: str) -> Optional[SchemaRecord]:
+        data_product = self.data_products.get(name)
+        return None if data_product is None else data_product.get_schema(table_name)
+
+    def replace(
+        self, records: Mapping[str, Optional[DataProductRecord]]
+    ) -> "CatalogueSnapshot":
+        """
+        Return a new snapshot with some data products replaced.
+        A record of None removes the data product.
+        """
+        data_products = dict(self.data_products)
+        for name, record in records.items():
+            if record is None:
+                data_products.pop(name, None)
+            else:
+                data_products[name] = record
+        return CatalogueSnapshot(data_products.values())
+
+
+def _name(record: DataProductRecord) -> str:
+    return record.name
+
+
+class CatalogueCache(ChangeSubscriber):
+    def __init__(self, session_factory: Callable[[], Session], max_staleness: float):
+        self.session_factory = session_factory
+        self.max_staleness = max_staleness
+        self.snapshot: Optional[CatalogueSnapshot] = None
+        self.listening = False
+        self.stale_since: Optional[float] = None
+        self._changed: set[str] = set()
+        self._refresh_task: Optional[asyncio.Task] = None
+
+    def current(self) -> Optional[CatalogueSnapshot]:
+        """
+        The current snapshot, or None if it can't be trusted to be within the
+        staleness limit, in which case reads should go to the database.
+        """
+        if not self.listening:
+            return None
+        if (
+            self.stale_since is not None
+            and time.monotonic() - self.stale_since > self.max_staleness
+        ):
+            return None
+        return self.snapshot
+
+    def load(self):
+        """
+        Build a new snapshot of the whole catalogue
+        """
+        with self.session_factory() as session:
+            records = [
+                DataProductRecord(data_product)
+                for data_product in DataProductRepository(session).list()
+            ]
+        self.snapshot = CatalogueSnapshot(records)
+        logger.info(f"Loaded catalogue snapshot of {len(records)} data products")
+
+    def reload(self, names: Collection[str]):
+        """
+        Build a new snapshot with some data products reloaded from the database
+        """
+        with self.session_factory() as session:
+            found = DataProductRepository(session).fetch_latest_many(names)
+            records = {
+                name: DataProductRecord(found[name]) if name in found else None
+                for name in names
+            }
+        self.snapshot = (self.snapshot or CatalogueSnapshot([])).replace(records)
+
+    def reset(self):
+        self.snapshot = None
+        self.listening = False
+        self.stale_since = None
+        self._changed.clear()
+
+    async def on_connect(self):
+        # Anything could have changed while we weren't listening
+        self.stale_since = self.stale_since or time.monotonic()
+        await asyncio.to_thread(self.load)
+        self.stale_since = None
+        self.listening = True
+
+    async def on_disconnect(self):
+        self.listening = False
+
+    async def on_change(self, change: dict):
+        self._changed.add(change["dataProduct"])
+        self.stale_since = self.stale_since or time.monotonic()
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self._refresh())
+
+    async def _refresh(self):
+        while self._changed:
+            names, self._changed = self._changed, set()
+            try:
+                await asyncio.to_thread(self.reload, names)
+            except Exception:
+                # Leave the snapshot marked as stale so that reads fall back to
+                # the database once the staleness limit is reached
+                logger.exception(f"Failed to reload data products {sorted(names)}")
+                self._changed.update(names)
+                return
+
+        self.stale_since = None
+
+
+catalogue_cache = CatalogueCache(
+    session_factory=lambda: Session(engine),
+    max_staleness=settings.catalogue_snapshot_max_staleness_seconds,
+)
@@ -0,0 +1,139 @@
+"""
+Listens for catalogue change notifications from Postgres and passes them on
+to subscribers within this worker.
+
+Repositories emit a NOTIFY whenever they commit a new data product version.
+Each worker holds a single LISTEN connection, however many subscribers it has.
+"""
+
+import asyncio
+import json
+from typing import Optional
+
+import psycopg
+import structlog
+from sqlalchemy.engine import make_url
+
+from ..config import settings
+from ..models.orm.metadata_repositories import CATALOGUE_CHANNEL
+
+logger = structlog.get_logger(__name__)
+
+MAX_RECONNECT_DELAY = 30.0
+
+
+class ChangeSubscriber:
+    """
+    Base class for anything that wants to hear about catalogue changes.
+
+    Handlers run on the listener's event loop, so they should hand off any
+    slow work rather than blocking delivery to other subscribers.
+    """
+
+    async def on_connect(self):
+        """
+        Called whenever listening (re)starts. Changes made while the listener
+        was disconnected are not replayed, so subscribers should resynchronise here.
+        """
+
+    async def on_change(self, change: dict):
+        """
+        Called with the payload of each change notification
+        """
+
+    async def on_disconnect(self):
+        """
+        Called when the listener loses its connection
+        """
+
+
+class ChangeListener:
+    def __init__(
+        self,
+        database_url: str,
+        channel: str = CATALOGUE_CHANNEL,
+        reconnect_delay: float = 1.0,
+    ):
+        self.conninfo = (
+            make_url(database_url)
+            .set(drivername="postgresql")
+            .render_as_string(hide_password=False)
+        )
+        self.channel = channel
+        self.reconnect_delay = reconnect_delay
+        self.subscribers: list[ChangeSubscriber] = []
+        self.listening = False
+        self._task: Optional[asyncio.Task] = None
+
+    def subscribe(self, subscriber: ChangeSubscriber):
+        if subscriber not in self.subscribers:
+            self.subscribers.append(subscriber)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def run(self):
+        """
+        Listen for notifications until cancelled, reconnecting with
+        exponential backoff if the connection is lost.
+        """
+        delay = self.reconnect_delay
+        while True:
+            try:
+                await self._listen()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Catalogue change listener disconnected")
+            finally:
+                if self.listening:
+                    self.listening = False
+                    delay = self.reconnect_delay
+                    await self._dispatch("on_disconnect")
+
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, MAX_RECONNECT_DELAY)
+
+    async def _listen(self):
+        # Keepalives make sure a silently dropped connection is noticed,
+        # rather than leaving subscribers waiting for notifications forever.
+        async with await psycopg.AsyncConnection.connect(
+            self.conninfo,
+            autocommit=True,
+            keepalives=1,
+            keepalives_idle=30,
+            keepalives_interval=10,
+            keepalives_count=3,
+        ) as connection:
+            await connection.execute(f"LISTEN {self.channel}")
+            self.listening = True
+            logger.info(f"Listening for changes on {self.channel}")
+            await self._dispatch("on_connect")
+
+            async for notify in connection.notifies():
+                try:
+                    change = json.loads(notify.payload)
+                except ValueError:
+                    logger.error(f"Ignoring malformed notification: {notify.payload}")
+                    continue
+                await self._dispatch("on_change", change)
+
+    async def _dispatch(self, method: str, *args):
+        for subscriber in self.subscribers:
+            try:
+                await getattr(subscriber, method)(*args)
+            except Exception:
+                logger.exception(f"Change subscriber {subscriber} failed in {method}")
+
+
+change_listener = ChangeListener(settings.database_url)
@@ -0,0 +1,260 @@
+"""
+Notifies subscribers of data products (see SubscriptionTable) of new versions.
+
+This runs as background jobs (see job_queue), so that writes don't wait for it:
+
+- whenever a new version is saved, a version_created job works out what
+  changed, and queues a delivery to each subscriber of the data product
+- a delivery job waits for a short window before it runs, and any further
+  notifications for the same subscriber in the meantime are added to it, so a
+  burst of changes is sent as a single request
+- deliveries are sent concurrently, up to a limit per worker process.
+  Duplicate notifications are dropped, as jobs may run more than once.
+  Only failed deliveries are retried, so one subscriber being down doesn't
+  cause the others to be sent notifications again.
+
+Subscribers choose the URLs that the API sends requests to, so they could
+otherwise be used to reach services inside the platform's network (e.g. the
+instance metadata service). URLs must use HTTPS, and are only sent to if their
+host resolves to public addresses, unless the host is one of
+notification_allowed_hosts. Redirects are not followed.
+"""
+
+import ipaddress
+import json
+import socket
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from typing import Optional
+
+import httpx
+import structlog
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..models.orm.metadata_orm_models import DataProductVersionTable
+from ..models.orm.metadata_repositories import JobRepository, SubscriptionRepository
+from .job_queue import PartialFailure
+from .version_archive import version_archive
+from .versioning_service import UpdateType, schema_update_type
+
+logger = structlog.get_logger(__name__)
+
+DELIVER_NOTIFICATIONS_JOB = "deliver_notifications"
+
+# Names for services inside the network that aren't IP addresses
+INTERNAL_HOSTS = {"localhost", "metadata.google.internal"}
+
+
+class UnsafeURL(ValueError):
+    """
+    Raised when notifications can't be sent to a URL, as it could reach
+    services that aren't meant to be public
+    """
+
+
+def check_subscriber_url(url: str):
+    """
+    Check that a URL uses HTTPS, and that its host isn't an internal name or a
+    non-public IP address. Raises UnsafeURL if not. Hostnames are only resolved
+    when notifications are sent (see public_address), as what they resolve to
+    can change.
+    """
+    target = httpx.URL(url)
+    if target.host in settings.notification_allowed_hosts:
+        return
+    if target.scheme != "https":
+        raise UnsafeURL("Subscriber URLs must use https")
+    if target.host in INTERNAL_HOSTS or target.host.endswith(
+        (".localhost", ".internal")
+    ):
+        raise UnsafeURL(f"{target.host} is not a public host")
+    try:
+        address = ipaddress.ip_address(target.host)
+    except ValueError:
+        return
+    if not address.is_global:
+        raise UnsafeURL(f"{target.host} is not a public address")
+
+
+def public_address(host: str, port: int) -> str:
+    """
+    Resolve a host, and return one of its addresses, checking that all of them
+    are public. Raises UnsafeURL if not.
+    """
+    addresses = [
+        info[4][0] for info in socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+    ]
+    for address in addresses:
+        if not ipaddress.ip_address(address).is_global:
+            raise UnsafeURL(f"{host} resolves to {address}, which is not public")
+    return addresses[0]
+
+
+def describe_changes(
+    version: DataProductVersionTable,
+    previous_version: Optional[DataProductVersionTable] = None,
+    tables: Optional[list[str]] = None,
+) -> dict:
+    """
+    Describe the changes to each schema since the previous version, e.g.
+        {"dataProduct": ..., "version": ..., "previousVersion": ...,
+         "schemas": {table_name: {"change": "updated", "updateType": "MajorUpdate",
+                                  "columns": {...}, "non_column_fields": [...]}}}
+
+    If tables is set, only changes to those tables are described.
+    """
+    previous_schemas = {
+        schema.name: schema
+        for schema in (previous_version.schemas if previous_version else [])
+    }
+    schema_changes = {}
+
+    for schema in version.schemas:
+        previous_schema = previous_schemas.pop(schema.name, None)
+        if tables is not None and schema.name not in tables:
+            continue
+        if previous_schema is None:
+            schema_changes[schema.name] = {"change": "created"}
+            continue
+
+        update_type, all_schema_changes = schema_update_type(previous_schema, schema)
+        if update_type != UpdateType.Unchanged:
+            schema_changes[schema.name] = {
+                "change": "updated",
+                "updateType": update_type.name,
+                **all_schema_changes[schema.name],
+            }
+
+    for name in previous_schemas:
+        if tables is None or name in tables:
+            schema_changes[name] = {"change": "deleted"}
+
+    return {
+        "dataProduct": version.name,
+        "version": version.version,
+        "previousVersion": previous_version.version if previous_version else None,
+        "schemas": schema_changes,
+    }
+
+
+def notify_version_created(session: Session, payloads: list[dict]):
+    """
+    Job handler for version_created jobs: describe the changes in each new
+    version, and queue them for delivery to the data product's subscribers
+    """
+    ids = set()
+    for payload in payloads:
+        ids.add((payload["dataProduct"], payload["version"]))
+        if payload["previousVersion"] is not None:
+            ids.add((payload["dataProduct"], payload["previousVersion"]))
+    versions = version_archive.fetch_many(session, ids)
+    subscribers = SubscriptionRepository(session).urls_for_many(
+        {payload["dataProduct"] for payload in payloads}
+    )
+
+    for payload in payloads:
+        name = payload["dataProduct"]
+        version = versions.get((name, payload["version"]))
+        if version is None:
+            logger.warning(f"Not notifying {name} {payload['version']} - not found")
+            continue
+        previous_version = versions.get((name, payload["previousVersion"]))
+
+        notification = describe_changes(version, previous_version, payload["tables"])
+        logger.info(f"Data product changed: {notification}")
+        for url in subscribers.get(name, []):
+            queue_delivery(session, url, notification)
+
+
+def queue_delivery(session: Session, url: str, notification: dict):
+    """
+    Add a notification to the delivery waiting to be sent to a subscriber,
+    or queue a new delivery if there isn't one
+    """
+    jobs = JobRepository(session)
+    delivery = jobs.fetch_waiting(DELIVER_NOTIFICATIONS_JOB, key=url)
+    if delivery is None:
+        jobs.enqueue(
+            DELIVER_NOTIFICATIONS_JOB,
+            {"url": url, "notifications": [notification]},
+            delay=timedelta(seconds=settings.notification_window_seconds),
+            key=url,
+        )
+    elif notification not in delivery.payload["notifications"]:
+        # Replaced rather than modified in place, so the change is saved
+        delivery.payload = {
+            "url": url,
+            "notifications": [*delivery.payload["notifications"], notification],
+        }
+
+
+class NotificationDispatcher:
+    def __init__(self, max_concurrency: int, timeout: float):
+        self.client = httpx.Client(timeout=timeout, follow_redirects=False)
+        # Shared by every job worker, so limits concurrency across all of them
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_concurrency, thread_name_prefix="notifications"
+        )
+
+    def dispatch(self, session: Session, payloads: list[dict]):
+        """
+        Job handler for deliver_notifications jobs: POST each subscriber's
+        notifications, without duplicates, as {"notifications": [...]}
+        """
+        jobs_by_url: dict[str, list[int]] = {}
+        notifications_by_url: dict[str, dict[str, dict]] = {}
+        for n, payload in enumerate(payloads):
+            url = payload["url"]
+            jobs_by_url.setdefault(url, []).append(n)
+            notifications = notifications_by_url.setdefault(url, {})
+            for notification in payload["notifications"]:
+                notifications.setdefault(
+                    json.dumps(notification, sort_keys=True), notification
+                )
+
+        deliveries = {
+            url: self.executor.submit(self.deliver, url, list(notifications.values()))
+            for url, notifications in notifications_by_url.items()
+        }
+
+        failed = set()
+        errors = []
+        for url, delivery in deliveries.items():
+            try:
+                delivery.result()
+            except Exception as error:
+                failed.update(jobs_by_url[url])
+                errors.append(f"{url}: {error!r}")
+        if failed:
+            raise PartialFailure(failed, "; ".join(errors))
+
+    def deliver(self, url: str, notifications: list[dict]):
+        target = httpx.URL(url)
+        headers = {}
+        extensions = {}
+        if target.host not in settings.notification_allowed_hosts:
+            # URLs saved before they were checked are checked here too
+            check_subscriber_url(url)
+            # The address that was checked is the one connected to, rather
+            # than the host being resolved again, possibly to another address.
+            # The host is still sent, and used to verify the TLS certificate.
+            headers["Host"] = target.netloc.decode("ascii")
+            extensions["sni_hostname"] = target.host
+            target = target.copy_with(
+                host=public_address(target.host, target.port or 443)
+            )
+        response = self.client.post(
+            target,
+            json={"notifications": notifications},
+            headers=headers,
+            extensions=extensions,
+        )
+        response.raise_for_status()
+        logger.info(f"Sent {len(notifications)} notifications to {url}")
+
+
+notification_dispatcher = NotificationDispatcher(
+    max_concurrency=settings.notification_max_concurrency,
+    timeout=settings.notification_timeout_seconds,
+)
@@ -0,0 +1,170 @@
+"""
+Fans catalogue change notifications out to server-sent event streams.
+
+Each worker has one broker, fed by the worker's single LISTEN connection (see
+change_listener), and any number of subscribers. Every subscriber has a bounded
+queue. Events are rendered once and the same bytes are queued for every
+subscriber, so delivering an event costs one queue put per subscriber.
+
+A subscriber that falls so far behind that its queue fills up is evicted rather
+than allowed to hold up everyone else or buffer without limit. It is sent a
+final event telling it to reconnect, and can catch up from the change log by
+reconnecting with the Last-Event-ID header.
+"""
+
+import asyncio
+import json
+from typing import AsyncIterator, NamedTuple, Optional
+
+import structlog
+
+from ..config import settings
+from .change_listener import ChangeSubscriber
+
+logger = structlog.get_logger(__name__)
+
+
+class Event(NamedTuple):
+    """
+    A rendered server-sent event, and its position in the change log if any
+    """
+
+    seq: Optional[int]
+    data: bytes
+
+
+def render_event(event: str, data: dict, seq: Optional[int] = None) -> Event:
+    lines = []
+    if seq is not None:
+        lines.append(f"id: {seq}")
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data)}")
+    return Event(seq, ("\n".join(lines) + "\n\n").encode())
+
+
+def version_created_event(change: dict) -> Event:
+    """
+    Render a change notification from the repositories as an event
+    """
+    return render_event(
+        "version-created",
+        {"id": f"dp:{change['dataProduct']}", "version": change["version"]},
+        seq=change.get("seq"),
+    )
+
+
+# Comment sent when there are no events, so that dead connections are noticed
+KEEPALIVE = Event(None, b": keepalive\n\n")
+
+
+EVICTED_EVENT = render_event(
+    "evicted", {"reason": "Too far behind - reconnect to catch up"}
+)
+RESYNC_EVENT = render_event(
+    "resync", {"reason": "Change notifications interrupted - reconnect to catch up"}
+)
+
+
+class Subscription:
+    def __init__(self, broker: "EventBroker", queue_size: int):
+        self.broker = broker
+        self.queue: asyncio.Queue[Event] = asyncio.Queue(maxsize=queue_size)
+        self.closed = False
+
+    def publish(self, event: Event) -> bool:
+        """
+        Queue an event without waiting. Returns False if the queue is full.
+        """
+        if self.closed:
+            return True
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            return False
+        return True
+
+    def close(self, final_event: Optional[Event] = None):
+        """
+        Stop the subscription, after delivering final_event in place of
+        anything still queued
+        """
+        if self.closed:
+            return
+        self.closed = True
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        if final_event is not None:
+            self.queue.put_nowait(final_event)
+        self.broker.unsubscribe(self)
+
+    async def events(self, keepalive_interval: float) -> AsyncIterator[Event]:
+        """
+        Yield queued events, and keepalives when there are none, until closed
+        """
+        try:
+            while not (self.closed and self.queue.empty()):
+                try:
+                    yield await asyncio.wait_for(
+                        self.queue.get(), timeout=keepalive_interval
+                    )
+                except asyncio.TimeoutError:
+                    if self.closed:
+                        return
+                    yield KEEPALIVE
+        finally:
+            self.close()
+
+
+class EventBroker(ChangeSubscriber):
+    def __init__(self, queue_size: int, max_subscribers: int):
+        self.queue_size = queue_size
+        self.max_subscribers = max_subscribers
+        self.subscriptions: set[Subscription] = set()
+        self.listening = False
+
+    def subscribe(self) -> Optional[Subscription]:
+        """
+        Start a new subscription, or return None if there are too many
+        """
+        if len(self.subscriptions) >= self.max_subscribers:
+            return None
+        subscription = Subscription(self, self.queue_size)
+        self.subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        self.subscriptions.discard(subscription)
+
+    def publish(self, event: Event):
+        evicted = [
+            subscription
+            for subscription in self.subscriptions
+            if not subscription.publish(event)
+        ]
+        for subscription in evicted:
+            subscription.close(EVICTED_EVENT)
+        if evicted:
+            logger.info(f"Evicted {len(evicted)} slow event subscribers")
+
+    async def on_connect(self):
+        self.listening = True
+
+    async def on_disconnect(self):
+        # Changes made until we are listening again won't be notified, so
+        # subscribers need to reconnect and catch up from the change log
+        self.listening = False
+        for subscription in list(self.subscriptions):
+            subscription.close(RESYNC_EVENT)
+
+    async def on_change(self, change: dict):
+        self.publish(version_created_event(change))
+
+    def close(self):
+        for subscription in list(self.subscriptions):
+            subscription.close()
+
+
+event_broker = EventBroker(
+    queue_size=settings.event_queue_size,
+    max_subscribers=settings.max_event_subscribers,
+)
@@ -0,0 +1,365 @@
+"""
+Validates files in the landing zone against the registered schema of their
+table, so that files that don't match are caught when they land, rather than
+when Athena queries fail.
+
+Files are streamed from S3 a record batch at a time, so memory use depends on
+the batch size rather than the size of the file. For each batch, each column
+of the schema is cast to its registered type with Arrow's compute kernels,
+which checks every value at once rather than one at a time. Once a column has
+failed to cast it isn't cast again.
+
+CSV files are read as strings, so that anything that can be parsed as the
+registered type passes. Parquet files are read column chunk by column chunk
+with ranged GETs, and only the registered columns are read.
+
+Schemas don't record whether columns are nullable, so nulls are counted and
+reported, rather than treated as errors.
+
+Several files can be validated in parallel in a pool of processes, as casting
+is CPU bound.
+"""
+
+import csv
+import io
+import multiprocessing
+import re
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Iterator, Optional, Sequence
+
+import boto3
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from botocore.exceptions import ClientError
+from pyarrow import csv as arrow_csv
+
+from ..config import settings
+from .background import LazyClient
+
+CSV = "csv"
+PARQUET = "parquet"
+FORMATS = {".csv": CSV, ".parquet": PARQUET}
+
+SIMPLE_TYPES = {
+    "tinyint": pa.int8(),
+    "smallint": pa.int16(),
+    "int": pa.int32(),
+    "bigint": pa.int64(),
+    "utinyint": pa.uint8(),
+    "usmallint": pa.uint16(),
+    "uint": pa.uint32(),
+    "ubigint": pa.uint64(),
+    "float": pa.float32(),
+    "double": pa.float64(),
+    "boolean": pa.bool_(),
+    "date": pa.date32(),
+    "timestamp": pa.timestamp("ms"),
+    "string": pa.string(),
+    "varchar": pa.string(),
+}
+DECIMAL_TYPE = re.compile(r"^decimal\((\d+),\s?(\d+)\)$")
+STRING_TYPE = re.compile(r"^(?:char|varchar)\((\d+)\)$")
+
+
+def arrow_type(type: str) -> tuple[pa.DataType, Optional[int]]:
+    """
+    Map a registered column type to an Arrow type, along with the maximum
+    length of the values, for chars and varchars
+    """
+    if type in SIMPLE_TYPES:
+        return SIMPLE_TYPES[type], None
+    if match := DECIMAL_TYPE.match(type):
+        return pa.decimal128(int(match.group(1)), int(match.group(2))), None
+    if match := STRING_TYPE.match(type):
+        return pa.string(), int(match.group(1))
+    raise ValueError(f"Unknown column type {type}")
+
+
+def file_format(key: str) -> Optional[str]:
+    for extension, format in FORMATS.items():
+        if key.lower().endswith(extension):
+            return format
+    return None
+
+
+@dataclass
+class ColumnValidation:
+    name: str
+    type: str
+    null_count: int = 0
+    error: Optional[str] = None
+
+
+@dataclass
+class FileValidation:
+    key: str
+    rows: int = 0
+    missing_columns: list[str] = field(default_factory=list)
+    unexpected_columns: list[str] = field(default_factory=list)
+    columns: list[ColumnValidation] = field(default_factory=list)
+    error: Optional[str] = None
+
+    @property
+    def valid(self) -> bool:
+        return (
+            self.error is None
+            and not self.missing_columns
+            and not self.unexpected_columns
+            and all(column.error is None for column in self.columns)
+        )
+
+
+class ColumnCheck:
+    """
+    Checks the values of a column, batch by batch
+    """
+
+    def __init__(self, column: dict):
+        self.result = ColumnValidation(name=column["name"], type=column["type"])
+        try:
+            self.type, self.max_length = arrow_type(column["type"])
+        except ValueError as exception:
+            # The column can still be registered with a type that can't be
+            # checked, as schemas are validated more loosely
+            self.result.error = str(exception)
+            return
+        self.cast_options = pc.CastOptions(
+            self.type, allow_time_truncate=True, allow_decimal_truncate=False
+        )
+
+    def check(self, values: pa.Array, offset: int):
+        self.result.null_count += values.null_count
+        if self.result.error is not None:
+            return
+
+        try:
+            cast = pc.cast(values, options=self.cast_options)
+        except (pa.ArrowInvalid, pa.ArrowNotImplementedError) as exception:
+            self.result.error = f"From row {offset + 1}: {exception}"
+            return
+
+        if self.max_length is not None and len(cast) > cast.null_count:
+            longest = pc.max(pc.utf8_length(cast)).as_py()
+            if longest > self.max_length:
+                self.result.error = (
+                    f"From row {offset + 1}: values are up to {longest} characters, "
+                    f"longer than {self.max_length}"
+                )
+
+
+class S3File(io.RawIOBase):
+    """
+    A seekable, read-only S3 object, read with ranged GETs
+    """
+
+    def __init__(self, client, bucket: str, key: str):
+        self.client = client
+        self.bucket = bucket
+        self.key = key
+        self.size = client.head_object(Bucket=bucket, Key=key)["ContentLength"]
+        self.position = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self.position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self.position
+        elif whence == io.SEEK_END:
+            offset += self.size
+        self.position = max(0, offset)
+        return self.position
+
+    def readinto(self, buffer) -> int:
+        end = min(self.position + len(buffer), self.size)
+        if end <= self.position:
+            return 0
+        response = self.client.get_object(
+            Bucket=self.bucket, Key=self.key, Range=f"bytes={self.position}-{end - 1}"
+        )
+        data = response["Body"].read()
+        buffer[: len(data)] = data
+        self.position += len(data)
+        return len(data)
+
+
+class FileValidator:
+    client = LazyClient()
+
+    def __init__(
+        self,
+        client_factory: Callable[[], object],
+        bucket: str,
+        batch_size: int,
+        block_size: int,
+        processes: int,
+        mp_context: str = "forkserver",
+    ):
+        self.client_factory = client_factory
+        self.bucket = bucket
+        self.batch_size = batch_size
+        self.block_size = block_size
+        self.processes = processes
+        self.mp_context = mp_context
+
+    def validate_many(
+        self, keys: Sequence[str], columns: list[dict]
+    ) -> list[FileValidation]:
+        """
+        Validate several files against the same columns. If processes is more
+        than 1, files are validated in parallel in a pool of that many processes.
+        """
+        if self.processes <= 1 or len(keys) <= 1:
+            return [self.validate(key, columns) for key in keys]
+
+        with ProcessPoolExecutor(
+            max_workers=min(self.processes, len(keys)),
+            mp_context=multiprocessing.get_context(self.mp_context),
+        ) as executor:
+            return list(
+                executor.map(
+                    validate_in_process,
+                    [self.bucket] * len(keys),
+                    keys,
+                    [columns] * len(keys),
+                    [self.batch_size] * len(keys),
+                    [self.block_size] * len(keys),
+                )
+            )
+
+    def validate(self, key: str, columns: list[dict]) -> FileValidation:
+        """
+        Validate a CSV or Parquet file against a schema's columns
+        """
+        result = FileValidation(key=key)
+        format = file_format(key)
+        if format is None:
+            result.error = f"Files must be one of {', '.join(FORMATS)}"
+            return result
+
+        try:
+            if format == CSV:
+                self._validate_csv(key, columns, result)
+            else:
+                self._validate_parquet(key, columns, result)
+        except ClientError as exception:
+            code = exception.response["Error"]["Code"]
+            if code in ("NoSuchKey", "404"):
+                result.error = "File does not exist"
+            elif code == "InvalidRange":
+                result.error = "File is empty"
+            else:
+                raise
+        except (pa.ArrowInvalid, OSError) as exception:
+            result.error = f"File can't be read: {exception}"
+        return result
+
+    def _validate_csv(self, key: str, columns: list[dict], result: FileValidation):
+        names = self._read_header(key)
+        present = self._match_columns(names, columns, result)
+
+        body = self.client.get_object(Bucket=self.bucket, Key=key)["Body"]
+        with body:
+            reader = arrow_csv.open_csv(
+                body,
+                read_options=arrow_csv.ReadOptions(block_size=self.block_size),
+                convert_options=arrow_csv.ConvertOptions(
+                    include_columns=list(present.values()),
+                    column_types={name: pa.string() for name in names},
+                    strings_can_be_null=True,
+                ),
+            )
+            self._check_batches(reader, present, columns, result)
+
+    def _read_header(self, key: str) -> list[str]:
+        """
+        Read the column names from the first line of a CSV file, which must
+        fit in the first block
+        """
+        response = self.client.get_object(
+            Bucket=self.bucket, Key=key, Range=f"bytes=0-{self.block_size - 1}"
+        )
+        line = response["Body"].read().split(b"\n", 1)[0]
+        return next(csv.reader([line.decode("utf-8-sig").rstrip("\r")]), [])
+
+    def _validate_parquet(self, key: str, columns: list[dict], result: FileValidation):
+        file = pq.ParquetFile(S3File(self.client, self.bucket, key), pre_buffer=True)
+        present = self._match_columns(file.schema_arrow.names, columns, result)
+        batches = file.iter_batches(
+            batch_size=self.batch_size, columns=list(present.values())
+        )
+        self._check_batches(batches, present, columns, result)
+
+    def _match_columns(
+        self, names: list[str], columns: list[dict], result: FileValidation
+    ) -> dict[str, str]:
+        """
+        Compare a file's columns to the schema's, ignoring case as Athena does.
+        Returns the file's name for each column of the schema it has.
+        """
+        names_by_column = {name.lower(): name for name in names}
+        registered = {column["name"] for column in columns}
+        result.missing_columns = [
+            column["name"]
+            for column in columns
+            if column["name"] not in names_by_column
+        ]
+        result.unexpected_columns = [
+            name for name in names if name.lower() not in registered
+        ]
+        return {
+            column["name"]: names_by_column[column["name"]]
+            for column in columns
+            if column["name"] in names_by_column
+        }
+
+    def _check_batches(
+        self,
+        batches: Iterator[pa.RecordBatch],
+        present: dict[str, str],
+        columns: list[dict],
+        result: FileValidation,
+    ):
+        checks = {
+            column["name"]: ColumnCheck(column)
+            for column in columns
+            if column["name"] in present
+        }
+        for batch in batches:
+            for name, check in checks.items():
+                check.check(batch.column(present[name]), result.rows)
+            result.rows += batch.num_rows
+        result.columns = [check.result for check in checks.values()]
+
+
+def validate_in_process(
+    bucket: str, key: str, columns: list[dict], batch_size: int, block_size: int
+) -> FileValidation:
+    """
+    Validate a file in a worker process, with its own S3 client
+    """
+    validator = FileValidator(
+        client_factory=lambda: boto3.client("s3", region_name=settings.aws_region),
+        bucket=bucket,
+        batch_size=batch_size,
+        block_size=block_size,
+        processes=1,
+    )
+    return validator.validate(key, columns)
+
+
+file_validator = FileValidator(
+    client_factory=lambda: boto3.client("s3", region_name=settings.aws_region),
+    bucket=settings.landing_zone_bucket_name,
+    batch_size=settings.file_validation_batch_size,
+    block_size=settings.file_validation_block_size,
+    processes=settings.file_validation_processes,
+)
@@ -0,0 +1,368 @@
+"""
+Keeps the AWS Glue catalogue in step with the current version of each data
+product, so that its tables can be queried with Athena.
+
+Each data product is a Glue database, and each of its schemas a table. Rather
+than pushing every table on every change, the sync follows the change log (see
+ChangeLogRepository) from a stored watermark, and only pushes the tables that
+changed since. The first sync, when there is no watermark yet, pushes every
+table.
+
+Converting a schema to a Glue table input is cached by the schema's content, so
+a table that is pushed again unchanged (e.g. after a failed sync) is not
+converted again. Tables are pushed in parallel, deletions are batched, and calls
+that Glue throttles are retried with exponential backoff. The watermark is only
+advanced once every change up to it has been pushed.
+
+Catalogue change notifications wake the sync, as well as it running every
+glue_sync_interval_seconds. The watermark row is locked while syncing, so
+only one worker syncs at a time.
+"""
+
+import hashlib
+import json
+import random
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+
+import boto3
+import structlog
+from botocore.exceptions import ClientError
+from mojap_metadata import Metadata
+from mojap_metadata.converters.glue_converter import GlueConverter
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..db import engine
+from ..models.orm.metadata_orm_models import ChangeType, SchemaTable
+from ..models.orm.metadata_repositories import (
+    ChangeLogRepository,
+    DataProductRepository,
+    SchemaRepository,
+    WatermarkRepository,
+)
+from .background import LazyClient, PeriodicTask
+from .change_listener import ChangeSubscriber
+
+logger = structlog.get_logger(__name__)
+
+GLUE_WATERMARK = "glue"
+
+# Errors that mean "slow down" rather than that the call is invalid
+THROTTLING_ERRORS = {
+    "ThrottlingException",
+    "TooManyRequestsException",
+    "RequestLimitExceeded",
+    "ConcurrentModificationException",
+}
+
+# Most tables that can be deleted with one BatchDeleteTable call
+MAX_BATCH_DELETE = 100
+
+
+class SyncFailed(Exception):
+    """
+    Raised when some tables could not be pushed to Glue
+    """
+
+
+class TableInputCache:
+    """
+    Glue table inputs, keyed by the content of the schema they were converted
+    from, keeping the most recently used
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._inputs: OrderedDict[str, dict] = OrderedDict()
+        self.conversions = 0
+
+    def get(self, database_name: str, schema: SchemaTable, location: str) -> dict:
+        key = hashlib.sha256(
+            json.dumps(
+                [
+                    database_name,
+                    schema.name,
+                    schema.table_description,
+                    schema.columns,
+                    location,
+                ],
+                sort_keys=True,
+            ).encode()
+        ).hexdigest()
+
+        table_input = self._inputs.get(key)
+        if table_input is None:
+            table_input = to_table_input(database_name, schema, location)
+            self.conversions += 1
+            self._inputs[key] = table_input
+            if len(self._inputs) > self.max_size:
+                self._inputs.popitem(last=False)
+        else:
+            self._inputs.move_to_end(key)
+        return table_input
+
+
+def to_table_input(database_name: str, schema: SchemaTable, location: str) -> dict:
+    """
+    Convert a schema to a Glue table input for Parquet files at location
+    """
+    metadata = Metadata.from_dict(
+        {
+            "name": schema.name,
+            "description": schema.table_description or "",
+            "file_format": "parquet",
+            "columns": [],
+        }
+    )
+    table_input = GlueConverter().generate_from_meta(
+        metadata, database_name=database_name, table_location=location
+    )["TableInput"]
+    # Column types are validated as Athena types already, so are copied as they
+    # are, rather than going through mojap's own types, which would lose the
+    # lengths of varchars and the precision of decimals
+    table_input["StorageDescriptor"]["Columns"] = [
+        {
+            "Name": column["name"],
+            "Type": column["type"],
+            "Comment": column.get("description") or "",
+        }
+        for column in schema.columns
+    ]
+    return table_input
+
+
+def table_location(database_name: str, table_name: str) -> str:
+    return f"s3://{settings.data_bucket_name}/curated/{database_name}/{table_name}/"
+
+
+def call_with_backoff(
+    call: Callable, max_attempts: int, backoff: float, **kwargs
+) -> dict:
+    """
+    Make a Glue API call, retrying with exponential backoff and jitter if
+    it's throttled
+    """
+    for attempt in range(1, max_attempts + 1):
+        try:
+            return call(**kwargs)
+        except ClientError as error:
+            code = error.response["Error"]["Code"]
+            if code not in THROTTLING_ERRORS or attempt == max_attempts:
+                raise
+            delay = backoff * 2 ** (attempt - 1) * random.uniform(0.5, 1.0)
+            logger.info(f"Glue call throttled ({code}), retrying in {delay:.2f}s")
+            time.sleep(delay)
+
+
+class GlueSync(PeriodicTask, ChangeSubscriber):
+    failure_message = "Glue sync failed"
+    client = LazyClient()
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        client_factory: Callable[[], object],
+        concurrency: int,
+        page_size: int,
+        interval: float,
+        max_attempts: int,
+        retry_backoff: float,
+        cache_size: int = 10000,
+    ):
+        super().__init__(interval)
+        self.session_factory = session_factory
+        self.client_factory = client_factory
+        self.page_size = page_size
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+        self.cache = TableInputCache(cache_size)
+        self.executor = ThreadPoolExecutor(
+            max_workers=concurrency, thread_name_prefix="glue-sync"
+        )
+        self._databases: set[str] = set()
+
+    async def on_change(self, change: dict):
+        self.wake()
+
+    def run_once(self):
+        self.sync()
+
+    def sync(self) -> int:
+        """
+        Push the tables changed since the watermark to Glue, a page of changes
+        at a time, until there are none left. Returns the number of tables
+        pushed or deleted.
+        """
+        pushed = 0
+        while True:
+            count, done = self.sync_page()
+            pushed += count
+            if done:
+                return pushed
+
+    def sync_page(self) -> tuple[int, bool]:
+        """
+        Push the tables changed in the next page of changes, and advance the
+        watermark. Returns the number of tables pushed or deleted, and whether
+        there are no more changes.
+        """
+        with self.session_factory() as session:
+            watermark = WatermarkRepository(session).lock(GLUE_WATERMARK)
+            if watermark is None:
+                logger.info("Glue sync is already running elsewhere")
+                return 0, True
+
+            if watermark.seq is None:
+                pushed = self._full_sync(session, watermark)
+                session.commit()
+                return pushed, False
+
+            changes = ChangeLogRepository(session).list(
+                since=watermark.seq, limit=self.page_size
+            )
+            if not changes:
+                session.rollback()
+                return 0, True
+
+            # Only the latest change to each table matters
+            latest: dict[tuple[str, str], ChangeType] = {}
+            for change in changes:
+                _, *names = change.entity_id.split(":")
+                if len(names) == 2:
+                    latest[tuple(names)] = change.change
+
+            deleted = [
+                key for key, change in latest.items() if change == ChangeType.deleted
+            ]
+            schemas = SchemaRepository(session).fetch_latest_many(
+                [key for key in latest if key not in deleted]
+            )
+            self.push(schemas.values(), deleted)
+
+            watermark.seq = changes[-1].seq
+            session.commit()
+            logger.info(
+                f"Synced {len(schemas)} tables and {len(deleted)} deletions to Glue, "
+                f"up to change {watermark.seq}"
+            )
+            return len(schemas) + len(deleted), len(changes) < self.page_size
+
+    def _full_sync(self, session: Session, watermark) -> int:
+        # Read before the schemas, so anything committed in between is
+        # synced again next time rather than skipped
+        latest_seq = ChangeLogRepository(session).latest_seq()
+        schemas = [
+            schema
+            for data_product in DataProductRepository(session).list()
+            for schema in data_product.schemas
+        ]
+        self.push(schemas, [])
+        watermark.seq = latest_seq
+        logger.info(f"Synced all {len(schemas)} tables to Glue")
+        return len(schemas)
+
+    def push(self, schemas, deleted: list[tuple[str, str]]):
+        """
+        Create or update tables for schemas, and delete tables by
+        (data product name, table name). Raises SyncFailed if any fail.
+        """
+        schemas = list(schemas)
+        for database_name in {
+            schema.data_product_version.name for schema in schemas
+        }.difference(self._databases):
+            self._ensure_database(database_name)
+
+        # Converted up front, as the cache is not thread safe
+        puts = [
+            (
+                schema.data_product_version.name,
+                self.cache.get(
+                    schema.data_product_version.name,
+                    schema,
+                    table_location(schema.data_product_version.name, schema.name),
+                ),
+            )
+            for schema in schemas
+        ]
+        pushes = [
+            self.executor.submit(self._put_table, database_name, table_input)
+            for database_name, table_input in puts
+        ]
+
+        deletions_by_database: dict[str, list[str]] = {}
+        for database_name, table_name in deleted:
+            deletions_by_database.setdefault(database_name, []).append(table_name)
+        deletions = [
+            self.executor.submit(
+                self._delete_tables,
+                database_name,
+                table_names[n : n + MAX_BATCH_DELETE],
+            )
+            for database_name, table_names in deletions_by_database.items()
+            for n in range(0, len(table_names), MAX_BATCH_DELETE)
+        ]
+
+        errors = []
+        for future in pushes + deletions:
+            try:
+                future.result()
+            except Exception as error:
+                errors.append(repr(error))
+        if errors:
+            raise SyncFailed(f"{len(errors)} Glue calls failed: {'; '.join(errors)}")
+
+    def _call(self, method: str, **kwargs) -> dict:
+        return call_with_backoff(
+            getattr(self.client, method),
+            self.max_attempts,
+            self.retry_backoff,
+            **kwargs,
+        )
+
+    def _ensure_database(self, database_name: str):
+        try:
+            self._call("create_database", DatabaseInput={"Name": database_name})
+        except self.client.exceptions.AlreadyExistsException:
+            pass
+        self._databases.add(database_name)
+
+    def _put_table(self, database_name: str, table_input: dict):
+        try:
+            self._call(
+                "update_table", DatabaseName=database_name, TableInput=table_input
+            )
+        except self.client.exceptions.EntityNotFoundException:
+            self._call(
+                "create_table", DatabaseName=database_name, TableInput=table_input
+            )
+
+    def _delete_tables(self, database_name: str, table_names: list[str]):
+        try:
+            response = self._call(
+                "batch_delete_table",
+                DatabaseName=database_name,
+                TablesToDelete=table_names,
+            )
+        except self.client.exceptions.EntityNotFoundException:
+            return
+        errors = [
+            error
+            for error in response.get("Errors", [])
+            if error["ErrorDetail"]["ErrorCode"] != "EntityNotFoundException"
+        ]
+        if errors:
+            raise SyncFailed(f"Failed to delete tables from {database_name}: {errors}")
+
+
+glue_sync = GlueSync(
+    session_factory=lambda: Session(engine),
+    client_factory=lambda: boto3.client("glue", region_name=settings.aws_region),
+    concurrency=settings.glue_sync_concurrency,
+    page_size=settings.glue_sync_page_size,
+    interval=settings.glue_sync_interval_seconds,
+    max_attempts=settings.glue_max_attempts,
+    retry_backoff=settings.glue_retry_backoff_seconds,
+)
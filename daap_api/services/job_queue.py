@@ -0,0 +1,229 @@
+"""
+Runs queued background jobs (see JobTable) in a pool of asyncio workers.
+
+Side effects of a write, such as notifying consumers, are enqueued in the same
+transaction as the write and run here, so that requests don't wait for them,
+and a side effect is neither lost if the process dies nor run for a write that
+rolled back.
+
+Each worker claims a batch of ready jobs, passes the jobs of each kind to that
+kind's handler in one call, and deletes them once the handler returns. Claims
+skip jobs already claimed by other workers, so workers in any number of
+processes can share the queue. Jobs run at least once: a job whose worker died
+is run again once its lease expires, so handlers must be idempotent.
+
+If a handler raises, its jobs are retried with exponential backoff, until they
+run out of attempts and are marked as failed. A handler that can tell which
+jobs in a batch failed raises PartialFailure, so only those are retried.
+"""
+
+import asyncio
+import random
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import timedelta
+from statistics import quantiles
+from typing import Callable, Collection, Optional, Sequence
+
+import structlog
+from sqlalchemy import Row
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..db import engine
+from ..models.orm.metadata_repositories import JobRepository
+from .change_listener import ChangeSubscriber
+
+logger = structlog.get_logger(__name__)
+
+# A handler is called with a session and the payloads of a batch of jobs
+JobHandler = Callable[[Session, list[dict]], None]
+
+# Number of recent latencies kept for percentiles
+LATENCY_SAMPLES = 1000
+
+
+class PartialFailure(Exception):
+    """
+    Raised by a handler when only some jobs in a batch failed, given by their
+    positions in the list of payloads. The other jobs are completed.
+    """
+
+    def __init__(self, failed: Collection[int], error: str):
+        super().__init__(error)
+        self.failed = set(failed)
+
+
+def retry_delay(attempts: int, backoff: float, max_backoff: float) -> float:
+    """
+    Seconds to wait before retrying a job that has failed attempts times:
+    exponential backoff, with jitter so that jobs that failed together don't
+    all retry at the same moment
+    """
+    delay = min(max_backoff, backoff * 2 ** (attempts - 1))
+    return delay * random.uniform(0.5, 1.0)
+
+
+@dataclass
+class JobKindMetrics:
+    completed: int = 0
+    retried: int = 0
+    # Seconds from enqueue to completion of recently completed jobs
+    latencies: deque[float] = field(
+        default_factory=lambda: deque(maxlen=LATENCY_SAMPLES)
+    )
+
+    def latency_percentiles(self) -> tuple[Optional[float], Optional[float]]:
+        """
+        The median and 95th percentile of recent latencies
+        """
+        if not self.latencies:
+            return None, None
+        if len(self.latencies) == 1:
+            return self.latencies[0], self.latencies[0]
+        percentiles = quantiles(self.latencies, n=20, method="inclusive")
+        return percentiles[9], percentiles[18]
+
+
+class JobWorkerPool(ChangeSubscriber):
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        concurrency: int,
+        batch_size: int,
+        poll_interval: float,
+        max_attempts: int,
+        retry_backoff: float,
+        max_retry_backoff: float,
+        lease: float,
+    ):
+        self.session_factory = session_factory
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+        self.max_retry_backoff = max_retry_backoff
+        self.lease = timedelta(seconds=lease)
+        self.handlers: dict[str, JobHandler] = {}
+        self.metrics: dict[str, JobKindMetrics] = {}
+        self._tasks: list[asyncio.Task] = []
+        self._wake = asyncio.Event()
+
+    def register(self, kind: str, handler: JobHandler):
+        self.handlers[kind] = handler
+        self.metrics.setdefault(kind, JobKindMetrics())
+
+    def start(self):
+        if not self._tasks:
+            self._tasks = [
+                asyncio.create_task(self._work()) for _ in range(self.concurrency)
+            ]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def on_change(self, change: dict):
+        # Jobs are committed along with the change, so there is probably one
+        # ready now - no need to wait for the next poll
+        self._wake.set()
+
+    async def run_once(self) -> int:
+        """
+        Claim and run one batch of ready jobs. Returns the number of jobs claimed.
+        """
+        jobs = await asyncio.to_thread(self._claim)
+        by_kind: dict[str, list[Row]] = {}
+        for job in jobs:
+            by_kind.setdefault(job.kind, []).append(job)
+        for kind, batch in by_kind.items():
+            await asyncio.to_thread(self._run, kind, batch)
+        return len(jobs)
+
+    async def _work(self):
+        while True:
+            # Cleared before claiming, so a wake up during the claim isn't lost
+            self._wake.clear()
+            try:
+                claimed = await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Job worker failed to claim jobs")
+                claimed = 0
+
+            if claimed < self.batch_size:
+                try:
+                    await asyncio.wait_for(self._wake.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+
+    def _claim(self) -> Sequence[Row]:
+        if not self.handlers:
+            return []
+        with self.session_factory() as session:
+            return JobRepository(session).claim(
+                self.handlers.keys(), self.batch_size, self.lease
+            )
+
+    def _run(self, kind: str, jobs: Sequence[Row]):
+        metrics = self.metrics[kind]
+        started = time.monotonic()
+
+        with self.session_factory() as session:
+            try:
+                self.handlers[kind](session, [job.payload for job in jobs])
+            except PartialFailure as failure:
+                failed = [job for n, job in enumerate(jobs) if n in failure.failed]
+                jobs = [job for n, job in enumerate(jobs) if n not in failure.failed]
+                JobRepository(session).complete([job.id for job in jobs])
+                self._retry_or_fail(session, kind, failed, str(failure))
+            except Exception as error:
+                session.rollback()
+                self._retry_or_fail(session, kind, jobs, repr(error))
+                return
+            else:
+                JobRepository(session).complete([job.id for job in jobs])
+
+        elapsed = time.monotonic() - started
+        metrics.completed += len(jobs)
+        metrics.latencies.extend(float(job.queued_seconds) + elapsed for job in jobs)
+
+    def _retry_or_fail(self, session: Session, kind: str, jobs: Sequence[Row], error):
+        metrics = self.metrics[kind]
+        repository = JobRepository(session)
+
+        exhausted = [job.id for job in jobs if job.attempts >= self.max_attempts]
+        if exhausted:
+            logger.error(f"{len(exhausted)} {kind} jobs failed for good: {error}")
+            repository.fail(exhausted, error)
+
+        # Jobs in a batch are retried together, so the delay is based on the
+        # job that has been tried the most
+        retrying = [job for job in jobs if job.attempts < self.max_attempts]
+        if retrying:
+            attempts = max(job.attempts for job in retrying)
+            delay = retry_delay(attempts, self.retry_backoff, self.max_retry_backoff)
+            logger.warning(
+                f"{len(retrying)} {kind} jobs failed, retrying in {delay:.1f}s: {error}"
+            )
+            repository.retry(
+                [job.id for job in retrying], error, timedelta(seconds=delay)
+            )
+            metrics.retried += len(retrying)
+
+
+job_workers = JobWorkerPool(
+    session_factory=lambda: Session(engine),
+    concurrency=settings.job_worker_concurrency,
+    batch_size=settings.job_batch_size,
+    poll_interval=settings.job_poll_interval_seconds,
+    max_attempts=settings.job_max_attempts,
+    retry_backoff=settings.job_retry_backoff_seconds,
+    max_retry_backoff=settings.job_max_retry_backoff_seconds,
+    lease=settings.job_lease_seconds,
+)
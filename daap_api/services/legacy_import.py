@@ -0,0 +1,351 @@
+"""
+Imports data products from the legacy metadata store: JSON documents in the
+metadata S3 bucket, laid out as
+
+    {data product name}/{version}/metadata.json
+    {data product name}/{version}/{table name}/schema.json
+
+Every version of each data product is imported, and the latest becomes its
+current version. Documents are validated as if they had been sent to the API.
+
+Objects are listed, then fetched by a bounded pool of threads, one batch of
+data products ahead of the batch being written, so that fetching overlaps with
+writing. Each batch is written in a single transaction, and then recorded in a
+checkpoint file, so an interrupted import can be run again and carries on where
+it left off. Data products that already exist are skipped, so running it again
+without the checkpoint is also safe.
+
+Data products with invalid documents are reported and skipped, rather than
+stopping the import.
+
+Run with:
+
+    python -m daap_api.services.legacy_import [--bucket BUCKET] [--checkpoint FILE]
+"""
+
+import argparse
+import json
+import os
+import re
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from itertools import islice
+from typing import Callable, Iterable, Iterator, Optional
+
+import boto3
+import structlog
+from pydantic import ValidationError
+from sqlalchemy.orm import Session
+
+from ..config import settings, setup_logging
+from ..db import engine
+from ..models.api.metadata_api_models import DataProductCreate, SchemaCreate
+from ..models.orm.metadata_orm_models import DataProductVersionTable, SchemaTable
+from ..models.orm.metadata_repositories import DataProductRepository
+from ..models.version import Version
+
+logger = structlog.get_logger(__name__)
+
+METADATA_KEY = re.compile(
+    r"^(?P<name>[a-z0-9_]+)/(?P<version>v\d+\.\d+)/metadata\.json$"
+)
+SCHEMA_KEY = re.compile(
+    r"^(?P<name>[a-z0-9_]+)/(?P<version>v\d+\.\d+)/(?P<table>[a-z0-9_]+)/schema\.json$"
+)
+
+# Fields of legacy metadata that the platform generated, rather than the owner
+GENERATED_METADATA_FIELDS = {
+    "id",
+    "version",
+    "schemas",
+    "lastUpdated",
+    "creationDate",
+    "s3Location",
+    "rowCount",
+}
+GENERATED_SCHEMA_FIELDS = {"$schema"}
+
+
+class InvalidDataProduct(Exception):
+    """
+    Raised when a data product's documents are missing or invalid
+    """
+
+
+@dataclass
+class LegacyDataProduct:
+    """
+    The keys of a data product's documents, by version
+    """
+
+    name: str
+    metadata_keys: dict[str, str] = field(default_factory=dict)
+    # Keyed by version, then table name
+    schema_keys: dict[str, dict[str, str]] = field(default_factory=dict)
+
+    @property
+    def keys(self) -> list[str]:
+        return [
+            *self.metadata_keys.values(),
+            *(key for keys in self.schema_keys.values() for key in keys.values()),
+        ]
+
+
+@dataclass
+class ImportReport:
+    imported: int = 0
+    skipped: int = 0
+    objects: int = 0
+    failed: dict[str, str] = field(default_factory=dict)
+    elapsed: float = 0.0
+
+    @property
+    def throughput(self) -> float:
+        """
+        Data products imported per second
+        """
+        return self.imported / self.elapsed if self.elapsed else 0.0
+
+
+class Checkpoint:
+    """
+    The names of the data products imported so far, saved to a JSON file
+    """
+
+    def __init__(self, path: Optional[str]):
+        self.path = path
+        self.imported: set[str] = set()
+        if path is not None and os.path.exists(path):
+            with open(path) as file:
+                self.imported = set(json.load(file)["imported"])
+
+    def save(self, names: Iterable[str]):
+        self.imported.update(names)
+        if self.path is None:
+            return
+        # Written to a temporary file first, so an interruption can't leave
+        # a partly written checkpoint behind
+        temporary_path = f"{self.path}.tmp"
+        with open(temporary_path, "w") as file:
+            json.dump({"imported": sorted(self.imported)}, file)
+        os.replace(temporary_path, self.path)
+
+
+def group_keys(keys: Iterable[str]) -> dict[str, LegacyDataProduct]:
+    """
+    Group the keys of documents by data product, ignoring any other objects
+    """
+    data_products: dict[str, LegacyDataProduct] = {}
+    for key in keys:
+        if match := METADATA_KEY.match(key):
+            data_product = data_products.setdefault(
+                match["name"], LegacyDataProduct(match["name"])
+            )
+            data_product.metadata_keys[match["version"]] = key
+        elif match := SCHEMA_KEY.match(key):
+            data_product = data_products.setdefault(
+                match["name"], LegacyDataProduct(match["name"])
+            )
+            data_product.schema_keys.setdefault(match["version"], {})[
+                match["table"]
+            ] = key
+        else:
+            logger.info(f"Ignoring {key}")
+    return data_products
+
+
+def to_versions(
+    data_product: LegacyDataProduct, documents: dict[str, dict]
+) -> list[DataProductVersionTable]:
+    """
+    Validate a data product's documents, and convert them to its versions,
+    oldest first. Raises InvalidDataProduct if any are invalid.
+    """
+    missing = set(data_product.schema_keys).difference(data_product.metadata_keys)
+    if missing:
+        raise InvalidDataProduct(
+            f"Schemas without metadata for versions {sorted(missing)}"
+        )
+
+    versions = []
+    for version in sorted(data_product.metadata_keys, key=Version.parse):
+        key = data_product.metadata_keys[version]
+        metadata = {
+            name: value
+            for name, value in documents[key].items()
+            if name not in GENERATED_METADATA_FIELDS
+        }
+        try:
+            data_product_create = DataProductCreate.model_validate(metadata)
+        except ValidationError as error:
+            raise InvalidDataProduct(f"{key}: {error}")
+        if data_product_create.name != data_product.name:
+            raise InvalidDataProduct(f"{key}: name is {data_product_create.name}")
+
+        data_product_version = DataProductVersionTable(
+            version=version, **data_product_create.model_dump()
+        )
+        for table_name, key in data_product.schema_keys.get(version, {}).items():
+            schema = {
+                name: value
+                for name, value in documents[key].items()
+                if name not in GENERATED_SCHEMA_FIELDS
+            }
+            try:
+                schema_create = SchemaCreate.model_validate(schema)
+            except ValidationError as error:
+                raise InvalidDataProduct(f"{key}: {error}")
+            data_product_version.schemas.append(
+                SchemaTable(name=table_name, **schema_create.model_dump())
+            )
+        versions.append(data_product_version)
+    return versions
+
+
+def batched(iterable: Iterable, size: int) -> Iterator[list]:
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+class LegacyImporter:
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        client,
+        bucket: str,
+        checkpoint: Checkpoint,
+        concurrency: int,
+        batch_size: int,
+    ):
+        self.session_factory = session_factory
+        self.client = client
+        self.bucket = bucket
+        self.checkpoint = checkpoint
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+
+    def list_keys(self) -> Iterator[str]:
+        paginator = self.client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket):
+            for item in page.get("Contents", []):
+                yield item["Key"]
+
+    def fetch(self, key: str) -> dict:
+        response = self.client.get_object(Bucket=self.bucket, Key=key)
+        return json.loads(response["Body"].read())
+
+    def run(self) -> ImportReport:
+        started = time.monotonic()
+        report = ImportReport()
+
+        data_products = group_keys(self.list_keys())
+        pending = [
+            data_product
+            for name, data_product in sorted(data_products.items())
+            if name not in self.checkpoint.imported
+        ]
+        report.skipped = len(data_products) - len(pending)
+        logger.info(
+            f"Importing {len(pending)} data products from {self.bucket}, "
+            f"skipping {report.skipped} already imported"
+        )
+
+        with ThreadPoolExecutor(
+            max_workers=self.concurrency, thread_name_prefix="legacy-import"
+        ) as executor:
+
+            def fetch_batch(batch: list[LegacyDataProduct]):
+                return [
+                    (
+                        data_product,
+                        {
+                            key: executor.submit(self.fetch, key)
+                            for key in data_product.keys
+                        },
+                    )
+                    for data_product in batch
+                ]
+
+            batches = batched(pending, self.batch_size)
+            fetching = fetch_batch(next(batches, []))
+            while fetching:
+                # Start fetching the next batch before writing this one
+                fetched, fetching = fetching, fetch_batch(next(batches, []))
+                self._write_batch(fetched, report)
+                report.elapsed = time.monotonic() - started
+                logger.info(
+                    f"Imported {report.imported} of {len(pending)} data products "
+                    f"({report.objects} objects) in {report.elapsed:.1f}s, "
+                    f"{report.throughput:.1f} data products/s"
+                )
+
+        report.elapsed = time.monotonic() - started
+        for name, error in report.failed.items():
+            logger.error(f"Failed to import {name}: {error}")
+        return report
+
+    def _write_batch(
+        self,
+        fetched: list[tuple[LegacyDataProduct, dict[str, Future]]],
+        report: ImportReport,
+    ):
+        data_products = {}
+        for data_product, futures in fetched:
+            try:
+                documents = {key: future.result() for key, future in futures.items()}
+                data_products[data_product.name] = to_versions(data_product, documents)
+            except Exception as error:
+                report.failed[data_product.name] = str(error)
+            report.objects += len(futures)
+
+        with self.session_factory() as session:
+            repository = DataProductRepository(session)
+            existing = repository.existing_names(data_products.keys())
+            new_data_products = [
+                versions
+                for name, versions in data_products.items()
+                if name not in existing
+            ]
+            if new_data_products:
+                repository.import_many(new_data_products)
+
+        report.imported += len(data_products) - len(existing)
+        report.skipped += len(existing)
+        self.checkpoint.save(data_products.keys())
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Import data products from the legacy S3 metadata store"
+    )
+    parser.add_argument("--bucket", default=settings.metadata_bucket_name)
+    parser.add_argument(
+        "--checkpoint",
+        default="legacy_import_checkpoint.json",
+        help="File recording progress, so an interrupted import can be resumed",
+    )
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--batch-size", type=int, default=100)
+    args = parser.parse_args()
+
+    setup_logging()
+    importer = LegacyImporter(
+        session_factory=lambda: Session(engine),
+        client=boto3.client("s3", region_name=settings.aws_region),
+        bucket=args.bucket,
+        checkpoint=Checkpoint(args.checkpoint),
+        concurrency=args.concurrency,
+        batch_size=args.batch_size,
+    )
+    report = importer.run()
+    print(
+        f"Imported {report.imported} data products ({report.objects} objects) "
+        f"in {report.elapsed:.1f}s ({report.throughput:.1f} data products/s). "
+        f"Skipped {report.skipped}, failed {len(report.failed)}."
+    )
+
+
+if __name__ == "__main__":
+    main()
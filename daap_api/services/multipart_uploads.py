@@ -0,0 +1,126 @@
+"""
+Multipart uploads of data files to the landing zone, via presigned URLs.
+
+A single presigned PUT is limited to 5GB and has to be sent in one go.
+A multipart upload is split into up to 10,000 parts, which clients upload in
+parallel, each to its own presigned URL, and retry individually if they fail.
+
+The API doesn't keep track of uploads: S3 does. Each upload is identified by
+the upload ID S3 gives it and the key it is being uploaded to, which clients
+pass back with each call.
+"""
+
+import uuid
+from typing import Callable, Sequence
+
+import boto3
+from botocore.exceptions import ClientError
+
+from ..config import settings
+from .background import LazyClient
+
+
+class UploadNotFound(Exception):
+    pass
+
+
+class InvalidParts(Exception):
+    pass
+
+
+def upload_prefix(data_product_name: str, table_name: str) -> str:
+    return f"{data_product_name}/{table_name}/"
+
+
+class MultipartUploads:
+    client = LazyClient()
+
+    def __init__(
+        self,
+        client_factory: Callable[[], object],
+        bucket: str,
+        expires_in: int,
+    ):
+        self.client_factory = client_factory
+        self.bucket = bucket
+        self.expires_in = expires_in
+
+    def start(
+        self, data_product_name: str, table_name: str, filename: str
+    ) -> tuple[str, str]:
+        """
+        Start uploading a file for a table. Each upload gets its own prefix, so
+        uploads of files with the same name don't overwrite each other.
+        Returns the upload ID and the key the file will be uploaded to.
+        """
+        key = f"{upload_prefix(data_product_name, table_name)}{uuid.uuid4()}/{filename}"
+        response = self.client.create_multipart_upload(Bucket=self.bucket, Key=key)
+        return response["UploadId"], key
+
+    def presign_parts(
+        self, key: str, upload_id: str, part_numbers: Sequence[int]
+    ) -> dict[int, str]:
+        """
+        Create a URL to PUT each part to. Presigning is done locally, so
+        this doesn't check the upload exists.
+        """
+        return {
+            part_number: self.client.generate_presigned_url(
+                "upload_part",
+                Params={
+                    "Bucket": self.bucket,
+                    "Key": key,
+                    "UploadId": upload_id,
+                    "PartNumber": part_number,
+                },
+                ExpiresIn=self.expires_in,
+            )
+            for part_number in part_numbers
+        }
+
+    def complete(self, key: str, upload_id: str, parts: dict[int, str]) -> str:
+        """
+        Put the uploaded parts together, given the ETag of each part by number.
+        Returns the ETag of the uploaded file.
+        """
+        try:
+            response = self.client.complete_multipart_upload(
+                Bucket=self.bucket,
+                Key=key,
+                UploadId=upload_id,
+                MultipartUpload={
+                    "Parts": [
+                        {"PartNumber": part_number, "ETag": etag}
+                        for part_number, etag in sorted(parts.items())
+                    ]
+                },
+            )
+        except ClientError as exception:
+            self._raise_for(exception)
+        return response["ETag"]
+
+    def abort(self, key: str, upload_id: str):
+        """
+        Stop an upload and delete the parts uploaded so far
+        """
+        try:
+            self.client.abort_multipart_upload(
+                Bucket=self.bucket, Key=key, UploadId=upload_id
+            )
+        except ClientError as exception:
+            self._raise_for(exception)
+
+    def _raise_for(self, exception: ClientError):
+        code = exception.response["Error"]["Code"]
+        if code == "NoSuchUpload":
+            raise UploadNotFound() from exception
+        if code in ("InvalidPart", "InvalidPartOrder", "EntityTooSmall"):
+            raise InvalidParts(exception.response["Error"]["Message"]) from exception
+        raise exception
+
+
+multipart_uploads = MultipartUploads(
+    client_factory=lambda: boto3.client("s3", region_name=settings.aws_region),
+    bucket=settings.landing_zone_bucket_name,
+    expires_in=settings.upload_part_url_expiry_seconds,
+)
@@ -0,0 +1,178 @@
+"""
+Infers the schema of a table from a Parquet file in S3, so producers don't have
+to write out the columns of wide tables by hand.
+
+A Parquet file ends with its metadata, which includes the schema, followed by
+the length of the metadata and the magic bytes "PAR1". Only this footer is read,
+with ranged GETs, never the data pages: usually a single request for the last
+FOOTER_READ_SIZE bytes, and another for the rest if the metadata is bigger.
+That makes inference as quick for a multi-GB file as for a small one.
+"""
+
+import re
+from typing import Callable, Collection
+
+import boto3
+import pyarrow as pa
+import pyarrow.parquet as pq
+from botocore.exceptions import ClientError
+
+from ..config import settings
+from .background import LazyClient
+
+MAGIC = b"PAR1"
+FOOTER_READ_SIZE = 64 * 1024
+MAX_DECIMAL_PRECISION = 38
+
+CONTENT_RANGE = re.compile(r"^bytes \d+-\d+/(\d+)$")
+
+
+class BucketNotAllowed(Exception):
+    pass
+
+
+class ObjectNotFound(Exception):
+    pass
+
+
+class InvalidParquet(Exception):
+    pass
+
+
+class UnsupportedTypes(Exception):
+    def __init__(self, columns: dict[str, pa.DataType]):
+        self.columns = columns
+        super().__init__(
+            "Columns have types with no Athena equivalent: "
+            + ", ".join(f"{name} ({type})" for name, type in columns.items())
+        )
+
+
+def athena_type(type: pa.DataType) -> str:
+    """
+    Map an Arrow type onto the Athena types allowed for a Column.
+    Unsigned integers are widened, as Athena has none. Raises TypeError for
+    types that can't be mapped.
+    """
+    if pa.types.is_dictionary(type):
+        return athena_type(type.value_type)
+    if pa.types.is_boolean(type):
+        return "boolean"
+    if pa.types.is_int8(type):
+        return "tinyint"
+    if pa.types.is_int16(type) or pa.types.is_uint8(type):
+        return "smallint"
+    if pa.types.is_int32(type) or pa.types.is_uint16(type):
+        return "int"
+    if pa.types.is_int64(type) or pa.types.is_uint32(type):
+        return "bigint"
+    if pa.types.is_uint64(type):
+        return "decimal(20,0)"
+    if pa.types.is_float16(type) or pa.types.is_float32(type):
+        return "float"
+    if pa.types.is_float64(type):
+        return "double"
+    if pa.types.is_decimal(type) and type.precision <= MAX_DECIMAL_PRECISION:
+        return f"decimal({type.precision},{type.scale})"
+    if pa.types.is_string(type) or pa.types.is_large_string(type):
+        return "string"
+    if pa.types.is_date(type):
+        return "date"
+    if pa.types.is_timestamp(type):
+        return "timestamp"
+    raise TypeError(f"No Athena type for {type}")
+
+
+def to_schema(schema: pa.Schema) -> dict:
+    """
+    Convert an Arrow schema to the fields of a SchemaCreate. Athena column names
+    are case insensitive, so names are lower cased.
+    """
+    columns = []
+    unsupported = {}
+    for field in schema:
+        try:
+            type = athena_type(field.type)
+        except TypeError:
+            unsupported[field.name] = field.type
+            continue
+        columns.append({"name": field.name.lower(), "type": type, "description": ""})
+
+    if unsupported:
+        raise UnsupportedTypes(unsupported)
+    return {"tableDescription": "", "columns": columns}
+
+
+class SchemaInference:
+    client = LazyClient()
+
+    def __init__(
+        self,
+        client_factory: Callable[[], object],
+        buckets: Collection[str],
+        footer_read_size: int = FOOTER_READ_SIZE,
+    ):
+        self.client_factory = client_factory
+        self.buckets = buckets
+        self.footer_read_size = footer_read_size
+
+    def infer(self, bucket: str, key: str) -> dict:
+        """
+        Infer the fields of a SchemaCreate from a Parquet file
+        """
+        if bucket not in self.buckets:
+            raise BucketNotAllowed(f"Schemas can't be inferred from files in {bucket}")
+        return to_schema(self.read_schema(bucket, key))
+
+    def read_schema(self, bucket: str, key: str) -> pa.Schema:
+        footer = self.read_footer(bucket, key)
+        try:
+            # The metadata doesn't refer to anything before it, so the footer
+            # alone, after the leading magic bytes, reads as a file with no data
+            return pq.read_schema(pa.BufferReader(MAGIC + footer))
+        except (pa.ArrowException, OSError) as exception:
+            raise InvalidParquet(str(exception)) from exception
+
+    def read_footer(self, bucket: str, key: str) -> bytes:
+        """
+        Read the metadata at the end of a Parquet file, along with its length
+        and the trailing magic bytes
+        """
+        tail, size = self._read_range(bucket, key, f"bytes=-{self.footer_read_size}")
+        if len(tail) < len(MAGIC) + 4 or tail[-len(MAGIC) :] != MAGIC:
+            raise InvalidParquet(f"{key} is not a Parquet file")
+
+        footer_size = int.from_bytes(tail[-8:-4], "little") + 8
+        if footer_size + len(MAGIC) > size:
+            raise InvalidParquet(f"{key} has a corrupt footer")
+        if footer_size > len(tail):
+            start = size - footer_size
+            rest, _ = self._read_range(
+                bucket, key, f"bytes={start}-{size - len(tail) - 1}"
+            )
+            tail = rest + tail
+        return tail[-footer_size:]
+
+    def _read_range(self, bucket: str, key: str, range: str) -> tuple[bytes, int]:
+        """
+        Read a range of bytes of an object. Returns them and the object's size.
+        """
+        try:
+            response = self.client.get_object(Bucket=bucket, Key=key, Range=range)
+        except ClientError as exception:
+            code = exception.response["Error"]["Code"]
+            if code in ("NoSuchKey", "NoSuchBucket"):
+                raise ObjectNotFound() from exception
+            if code == "InvalidRange":
+                raise InvalidParquet(f"{key} is empty") from exception
+            raise
+
+        body = response["Body"].read()
+        match = CONTENT_RANGE.match(response.get("ContentRange", ""))
+        return body, int(match.group(1)) if match else len(body)
+
+
+schema_inference = SchemaInference(
+    client_factory=lambda: boto3.client("s3", region_name=settings.aws_region),
+    buckets=[settings.landing_zone_bucket_name, settings.data_bucket_name],
+)
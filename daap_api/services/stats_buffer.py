@@ -0,0 +1,172 @@
+"""
+Buffers operational stats about tables (row counts and when data last landed)
+reported by ingestion jobs, and saves them in bulk.
+
+Stats are reported every time data lands, which can be many times a day per
+table. Rather than writing each report to the database as it arrives, reports
+are merged in memory, keyed by table, and every table_stats_flush_interval_seconds
+the latest stats for each table are saved in a single INSERT ... ON CONFLICT.
+If saving fails, the stats are kept and saved with the next flush.
+
+Each worker has its own buffer, and flushes it on shutdown. Stats that are
+older than those already saved are ignored, so it doesn't matter which worker
+flushes first.
+
+Stats are merged into data product and schema responses. As they are up to a
+flush interval out of date anyway, they are cached for as long when read. The
+cache has room for every data product in the catalogue (see
+table_stats_cache_size), so that reads of any of them don't usually go to the
+database for stats.
+"""
+
+import asyncio
+import threading
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from typing import Callable, Iterable, Optional
+
+import structlog
+from sqlalchemy.orm import Session
+
+from ..cache import TTLCache
+from ..config import settings
+from ..db import engine
+from ..models.orm.metadata_repositories import TableStatsRepository
+from .background import PeriodicTask
+
+logger = structlog.get_logger(__name__)
+
+stats_cache = TTLCache(
+    ttl=settings.table_stats_flush_interval_seconds,
+    max_size=settings.table_stats_cache_size,
+)
+
+
+@dataclass
+class TableStats:
+    row_count: Optional[int] = None
+    last_updated: Optional[datetime] = None
+    s3_location: Optional[str] = None
+
+    def merge(self, other: "TableStats"):
+        """
+        Merge in later stats. Stats that are None are left as they are, and
+        stats that are older than these are ignored.
+        """
+        if (
+            other.last_updated is not None
+            and self.last_updated is not None
+            and other.last_updated < self.last_updated
+        ):
+            return
+        for name, value in asdict(other).items():
+            if value is not None:
+                setattr(self, name, value)
+
+
+def coalesce(
+    stats: Iterable[tuple[tuple[str, str], TableStats]]
+) -> dict[tuple[str, str], TableStats]:
+    """
+    Merge stats for the same table, in the order they were reported
+    """
+    merged: dict[tuple[str, str], TableStats] = {}
+    for key, table_stats in stats:
+        if key in merged:
+            merged[key].merge(table_stats)
+        else:
+            merged[key] = TableStats(**asdict(table_stats))
+    return merged
+
+
+def total(stats: Iterable[TableStats]) -> TableStats:
+    """
+    Add up the stats of a data product's tables
+    """
+    stats = list(stats)
+    row_counts = [table.row_count for table in stats if table.row_count is not None]
+    last_updated = [
+        table.last_updated for table in stats if table.last_updated is not None
+    ]
+    return TableStats(
+        row_count=sum(row_counts) if row_counts else None,
+        last_updated=max(last_updated, default=None),
+    )
+
+
+def fetch_stats(
+    session: Session, data_product_name: str, cache: TTLCache = stats_cache
+) -> dict[str, TableStats]:
+    """
+    Load the stats of each table of a data product, keyed by table name
+    """
+    stats = cache.get(data_product_name)
+    if stats is None:
+        stats = {
+            row.table_name: TableStats(
+                row_count=row.row_count,
+                last_updated=row.last_updated,
+                s3_location=row.s3_location,
+            )
+            for row in TableStatsRepository(session).list(data_product_name)
+        }
+        cache.set(data_product_name, stats)
+    return stats
+
+
+def save(session: Session, stats: dict[tuple[str, str], TableStats]):
+    TableStatsRepository(session).upsert_many(
+        {key: asdict(table_stats) for key, table_stats in stats.items()}
+    )
+    session.commit()
+
+
+class StatsBuffer(PeriodicTask):
+    failure_message = "Saving table stats failed"
+
+    def __init__(self, session_factory: Callable[[], Session], interval: float):
+        super().__init__(interval)
+        self.session_factory = session_factory
+        self._pending: dict[tuple[str, str], TableStats] = {}
+        self._lock = threading.Lock()
+
+    def add(self, stats: dict[tuple[str, str], TableStats]):
+        """
+        Buffer stats to be saved with the next flush
+        """
+        with self._lock:
+            self._pending = coalesce([*self._pending.items(), *stats.items()])
+
+    def flush(self) -> int:
+        """
+        Save the buffered stats. Returns the number of tables saved.
+        """
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+
+        try:
+            with self.session_factory() as session:
+                save(session, pending)
+        except Exception:
+            # Keep the stats, behind any reported since
+            with self._lock:
+                self._pending = coalesce([*pending.items(), *self._pending.items()])
+            raise
+
+        logger.info(f"Saved stats for {len(pending)} tables")
+        return len(pending)
+
+    def run_once(self):
+        self.flush()
+
+    async def stop(self):
+        await super().stop()
+        await asyncio.to_thread(self.flush)
+
+
+stats_buffer = StatsBuffer(
+    session_factory=lambda: Session(engine),
+    interval=settings.table_stats_flush_interval_seconds,
+)
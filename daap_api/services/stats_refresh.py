@@ -0,0 +1,78 @@
+"""
+Keeps the catalogue stats (see DataProductRepository.stats) up to date.
+
+The stats are a materialised view, which can only be refreshed as a whole, so
+rather than refreshing it after every write, on the request path, it is
+refreshed in the background whenever the catalogue has changed since the last
+refresh: as soon as a change notification arrives, or otherwise every
+stats_refresh_interval_seconds. Notifications that arrive during a refresh
+cause one more, so a burst of writes only causes a couple of refreshes.
+
+Whether anything has changed is known from the change log (see
+ChangeLogRepository), whose latest sequence number at the last refresh is kept
+as a watermark. The watermark row is locked while refreshing, so only one
+worker refreshes at a time.
+"""
+
+from typing import Callable
+
+import structlog
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..db import engine
+from ..models.orm.metadata_repositories import (
+    ChangeLogRepository,
+    DataProductRepository,
+    WatermarkRepository,
+)
+from .background import PeriodicTask
+from .change_listener import ChangeSubscriber
+
+logger = structlog.get_logger(__name__)
+
+STATS_WATERMARK = "data_product_stats"
+
+
+class StatsRefresher(PeriodicTask, ChangeSubscriber):
+    failure_message = "Refreshing catalogue stats failed"
+
+    def __init__(self, session_factory: Callable[[], Session], interval: float):
+        super().__init__(interval)
+        self.session_factory = session_factory
+
+    async def on_change(self, change: dict):
+        self.wake()
+
+    def run_once(self):
+        self.refresh()
+
+    def refresh(self) -> bool:
+        """
+        Refresh the stats if the catalogue has changed since they last were.
+        Returns whether they were refreshed.
+        """
+        with self.session_factory() as session:
+            watermark = WatermarkRepository(session).lock(STATS_WATERMARK)
+            if watermark is None:
+                logger.info("Catalogue stats are already being refreshed elsewhere")
+                return False
+
+            # Read before refreshing, so anything committed in between is
+            # refreshed again next time rather than missed
+            latest_seq = ChangeLogRepository(session).latest_seq()
+            if latest_seq == watermark.seq:
+                session.rollback()
+                return False
+
+            DataProductRepository(session).refresh_stats()
+            watermark.seq = latest_seq
+            session.commit()
+            logger.info(f"Refreshed catalogue stats up to change {latest_seq}")
+            return True
+
+
+stats_refresher = StatsRefresher(
+    session_factory=lambda: Session(engine),
+    interval=settings.stats_refresh_interval_seconds,
+)
@@ -0,0 +1,212 @@
+"""
+Cold storage for superseded versions of data products.
+
+Old versions are rarely read, but each one is a full copy of the data product
+and its schemas, so left in Postgres they grow its tables and indexes without
+bound. Instead, they are archived (see version_archiver) to Parquet files in
+the data bucket, one file per data product per archive run, with a row per
+version and its schemas as a nested column. ArchivedVersionTable records which
+file each archived version is in.
+
+Reading an archived version fetches and decodes its whole file, so recently
+read files are cached, and reading neighbouring versions is then free.
+
+Repositories only load versions from the database. To load versions that may
+have been archived, use VersionArchive.fetch and fetch_many, which fall back to
+the archive for versions that aren't in the database.
+"""
+
+import io
+import threading
+import uuid
+from collections import OrderedDict
+from typing import Callable, Collection, Optional, Sequence
+
+import boto3
+import pyarrow as pa
+import pyarrow.parquet as pq
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..models.orm.metadata_orm_models import (
+    DataProductVersionTable,
+    SchemaTable,
+    Status,
+)
+from ..models.orm.metadata_repositories import ArchiveRepository, DataProductRepository
+from .background import LazyClient
+
+ARCHIVE_PREFIX = "archive/data_product_versions"
+
+COLUMN = pa.struct(
+    [("name", pa.string()), ("type", pa.string()), ("description", pa.string())]
+)
+SCHEMA = pa.struct(
+    [
+        ("name", pa.string()),
+        ("table_description", pa.string()),
+        ("columns", pa.list_(COLUMN)),
+    ]
+)
+ARCHIVE_SCHEMA = pa.schema(
+    [
+        ("name", pa.string()),
+        ("version", pa.string()),
+        ("description", pa.string()),
+        ("domain", pa.string()),
+        ("data_product_owner", pa.string()),
+        ("data_product_owner_display_name", pa.string()),
+        ("data_product_maintainer", pa.string()),
+        ("data_product_maintainer_display_name", pa.string()),
+        ("status", pa.string()),
+        ("email", pa.string()),
+        ("retention_period", pa.int64()),
+        ("dpia_required", pa.bool_()),
+        ("dpia_location", pa.string()),
+        ("last_updated", pa.timestamp("us")),
+        ("creation_date", pa.timestamp("us")),
+        ("s3_location", pa.string()),
+        ("row_count", pa.int64()),
+        ("superseded_at", pa.timestamp("us")),
+        ("tags", pa.map_(pa.string(), pa.string())),
+        ("schemas", pa.list_(SCHEMA)),
+    ]
+)
+VERSION_FIELDS = [
+    name for name in ARCHIVE_SCHEMA.names if name not in ("status", "tags", "schemas")
+]
+
+
+def to_parquet(versions: Sequence[DataProductVersionTable]) -> bytes:
+    """
+    Encode versions of a data product, with their schemas, as a Parquet file
+    """
+    rows = [
+        {
+            **{name: getattr(version, name) for name in VERSION_FIELDS},
+            "status": Status(version.status).value,
+            "tags": list((version.tags or {}).items()),
+            "schemas": [
+                {
+                    "name": schema.name,
+                    "table_description": schema.table_description,
+                    "columns": schema.columns,
+                }
+                for schema in version.schemas
+            ],
+        }
+        for version in versions
+    ]
+    buffer = io.BytesIO()
+    pq.write_table(
+        pa.Table.from_pylist(rows, schema=ARCHIVE_SCHEMA),
+        buffer,
+        compression="zstd",
+    )
+    return buffer.getvalue()
+
+
+def from_parquet(data: bytes) -> dict[str, dict]:
+    """
+    Decode a Parquet file written by to_parquet, as rows keyed by version
+    """
+    rows = pq.read_table(pa.BufferReader(data), schema=ARCHIVE_SCHEMA).to_pylist()
+    return {row["version"]: row for row in rows}
+
+
+def to_version(row: dict) -> DataProductVersionTable:
+    """
+    Make a (transient) version from a decoded row
+    """
+    version = DataProductVersionTable(
+        **{name: row[name] for name in VERSION_FIELDS},
+        status=Status(row["status"]),
+        tags=dict(row["tags"]),
+    )
+    version.schemas = [
+        SchemaTable(
+            name=schema["name"],
+            table_description=schema["table_description"],
+            columns=schema["columns"],
+        )
+        for schema in row["schemas"]
+    ]
+    return version
+
+
+class VersionArchive:
+    client = LazyClient()
+
+    def __init__(
+        self, client_factory: Callable[[], object], bucket: str, cache_size: int
+    ):
+        self.client_factory = client_factory
+        self.bucket = bucket
+        self.cache_size = cache_size
+        self._files: OrderedDict[str, dict[str, dict]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def write(self, name: str, versions: Sequence[DataProductVersionTable]) -> str:
+        """
+        Archive versions of a data product to a new file. Returns its location.
+        """
+        key = f"{ARCHIVE_PREFIX}/{name}/{uuid.uuid4().hex}.parquet"
+        self.client.put_object(Bucket=self.bucket, Key=key, Body=to_parquet(versions))
+        return key
+
+    def read(self, location: str, version: str) -> Optional[DataProductVersionTable]:
+        """
+        Read back an archived version from the file at location
+        """
+        with self._lock:
+            rows = self._files.get(location)
+            if rows is not None:
+                self._files.move_to_end(location)
+
+        if rows is None:
+            response = self.client.get_object(Bucket=self.bucket, Key=location)
+            rows = from_parquet(response["Body"].read())
+            with self._lock:
+                self._files[location] = rows
+                if len(self._files) > self.cache_size:
+                    self._files.popitem(last=False)
+
+        row = rows.get(version)
+        return to_version(row) if row is not None else None
+
+    def fetch(
+        self, session: Session, name: str, version: str
+    ) -> Optional[DataProductVersionTable]:
+        """
+        Load a data product by name and version, from the database or, if it
+        has been archived, from the archive, detached from the session
+        """
+        return self.fetch_many(session, [(name, version)]).get((name, version))
+
+    def fetch_many(
+        self, session: Session, ids: Collection[tuple[str, str]]
+    ) -> dict[tuple[str, str], DataProductVersionTable]:
+        """
+        Load several data product versions, with their schemas, by (name, version),
+        keyed by the same pair, from the database or the archive. Versions that
+        don't exist are omitted from the result.
+        """
+        versions = DataProductRepository(session).fetch_many(ids)
+        archived = set(ids).difference(versions)
+        if archived:
+            for id, location in ArchiveRepository(session).locations(archived).items():
+                version = self.read(location, id[1])
+                if version is not None:
+                    versions[id] = version
+        return versions
+
+    def clear(self):
+        with self._lock:
+            self._files.clear()
+
+
+version_archive = VersionArchive(
+    client_factory=lambda: boto3.client("s3", region_name=settings.aws_region),
+    bucket=settings.data_bucket_name,
+    cache_size=settings.version_archive_cache_size,
+)
@@ -0,0 +1,97 @@
+"""
+Moves versions of data products that were superseded long ago out of Postgres
+and into Parquet files (see version_archive), so that the data_product_versions
+and schemas tables, and their indexes, only grow with the number of recent
+versions rather than every version ever made.
+
+Current versions are never archived. Archived versions can still be read with
+VersionArchive.fetch and fetch_many, which fall back to the archive.
+
+Archiving is repeated every version_archive_interval_seconds. Versions are
+locked while they are archived, so archivers in different workers archive
+different versions. Each batch is
+written to the archive before it is deleted from the database, so a failure
+part way through leaves, at worst, an unreferenced archive file.
+"""
+
+from datetime import timedelta
+from typing import Callable
+
+import structlog
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..db import engine
+from ..models.orm.metadata_orm_models import DataProductVersionTable
+from ..models.orm.metadata_repositories import ArchiveRepository
+from .background import PeriodicTask
+from .version_archive import VersionArchive, version_archive
+
+logger = structlog.get_logger(__name__)
+
+
+class VersionArchiver(PeriodicTask):
+    failure_message = "Archiving superseded versions failed"
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        archive: VersionArchive,
+        archive_after: timedelta,
+        batch_size: int,
+        interval: float,
+    ):
+        super().__init__(interval)
+        self.session_factory = session_factory
+        self.archive = archive
+        self.archive_after = archive_after
+        self.batch_size = batch_size
+
+    def run_once(self):
+        self.archive_all()
+
+    def archive_all(self) -> int:
+        """
+        Archive batches of versions until there are none left to archive.
+        Returns the number of versions archived.
+        """
+        archived = 0
+        while count := self.archive_batch():
+            archived += count
+            if count < self.batch_size:
+                break
+        return archived
+
+    def archive_batch(self) -> int:
+        """
+        Archive one batch of versions. Returns the number archived.
+        """
+        with self.session_factory() as session:
+            repository = ArchiveRepository(session)
+            versions = repository.claim_superseded(self.archive_after, self.batch_size)
+            if not versions:
+                session.rollback()
+                return 0
+
+            by_name: dict[str, list[DataProductVersionTable]] = {}
+            for version in versions:
+                by_name.setdefault(version.name, []).append(version)
+            locations = {
+                name: self.archive.write(name, versions)
+                for name, versions in by_name.items()
+            }
+
+            repository.archive(versions, locations)
+            logger.info(
+                f"Archived {len(versions)} versions of {len(by_name)} data products"
+            )
+            return len(versions)
+
+
+version_archiver = VersionArchiver(
+    session_factory=lambda: Session(engine),
+    archive=version_archive,
+    archive_after=timedelta(days=settings.version_archive_after_days),
+    batch_size=settings.version_archive_batch_size,
+    interval=settings.version_archive_interval_seconds,
+)
@@ -13,6 +13,7 @@ E.g. renaming descriptions, adding tables, adding columns
 
 import logging
 from enum import Enum
+from typing import Optional
 
 from ..models.orm.metadata_orm_models import DataProductVersionTable, SchemaTable
 
@@ -92,62 +93,80 @@ class VersioningService:
         return new_version
 
     def update_metadata(self, **kwargs):
-        updated_fields = set(kwargs.keys())
-        invalid_fields = updated_fields.difference(UPDATABLE_METADATA_FIELDS)
+        return self.apply_updates(metadata=kwargs)
 
-        if invalid_fields:
-            num_fields = len(invalid_fields)
-            msg = f"Non-updatable metadata field{('s'[:num_fields!=1])} changed:"
-            for f in sorted(invalid_fields):
-                msg += f"{f}: {getattr(self.current_metadata, f)} -> {kwargs[f]}; "
-            logger.error(msg)
-            raise InvalidUpdate(msg)
+    def update_schema(self, table_name, **kwargs):
+        return self.apply_updates(schemas={table_name: kwargs})
 
-        with_changes = self.current_metadata.copy(**kwargs)
-        if not with_changes.changed_fields(self.current_metadata):
-            logging.info("Nothing changed in metadata update - not bumping version")
-            return self.current_metadata
+    def apply_updates(
+        self,
+        metadata: Optional[dict] = None,
+        schemas: Optional[dict[str, dict]] = None,
+    ) -> DataProductVersionTable:
+        """
+        Apply an update to the data product's metadata, and updates to any number
+        of its schemas (keyed by table name), as a single new version.
 
-        new_version = self.current_metadata.next_minor_version(**kwargs)
+        The version is a major update if any schema update is, and a minor
+        update otherwise. If nothing has changed, the current version is returned.
+        """
+        metadata = metadata or {}
+        schemas = schemas or {}
+        self._validate_metadata_fields(metadata)
 
-        new_version.schemas.extend(
-            [schema.copy() for schema in self.current_metadata.schemas]
-        )
-        return new_version
+        current_schemas = {schema.name for schema in self.current_metadata.schemas}
+        unknown_schemas = set(schemas).difference(current_schemas)
+        if unknown_schemas:
+            raise InvalidUpdate(f"Schemas not found: {sorted(unknown_schemas)}")
 
-    def update_schema(self, table_name, **kwargs):
-        new_schemas = []
+        with_changes = self.current_metadata.copy(**metadata)
+        is_changed = bool(with_changes.changed_fields(self.current_metadata))
         is_major_update = False
+        new_schemas = []
 
         for schema in self.current_metadata.schemas:
-            if schema.name == table_name:
+            if schema.name in schemas:
                 # Copy the schema with the updated attributes
-                new_schema = schema.copy(**kwargs)
+                new_schema = schema.copy(**schemas[schema.name])
                 update_type, changes = schema_update_type(schema, new_schema)
 
                 if update_type == UpdateType.Unchanged:
-                    logger.error(
-                        f"{schema.name} is unchanged - not increasing version number"
-                    )
-                    return self.current_metadata
-
-                logger.info(f"{schema.name} {update_type}: {changes}")
-                is_major_update = update_type == UpdateType.MajorUpdate
+                    logger.info(f"{schema.name} is unchanged")
+                else:
+                    logger.info(f"{schema.name} {update_type}: {changes}")
+                    is_changed = True
+                is_major_update |= update_type == UpdateType.MajorUpdate
 
                 new_schemas.append(new_schema)
             else:
                 # Copy any other schemas as they are
                 new_schemas.append(schema.copy())
 
+        if not is_changed:
+            logger.info("Nothing changed in update - not bumping version")
+            return self.current_metadata
+
         if is_major_update:
-            new_version = self.current_metadata.next_major_version()
+            new_version = self.current_metadata.next_major_version(**metadata)
         else:
-            new_version = self.current_metadata.next_minor_version()
+            new_version = self.current_metadata.next_minor_version(**metadata)
 
         new_version.schemas.extend(new_schemas)
 
         return new_version
 
+    def _validate_metadata_fields(self, metadata: dict):
+        updated_fields = set(metadata.keys())
+        invalid_fields = updated_fields.difference(UPDATABLE_METADATA_FIELDS)
+
+        if invalid_fields:
+            num_fields = len(invalid_fields)
+            msg = f"Non-updatable metadata field{('s'[:num_fields!=1])} changed:"
+            for f in sorted(invalid_fields):
+                msg += f"{f}: {getattr(self.current_metadata, f)} -> {metadata[f]}; "
+            logger.error(msg)
+            raise InvalidUpdate(msg)
+
 
 def detect_column_differences_in_new_version(
     old_schema: SchemaTable, new_schema: SchemaTable
@@ -0,0 +1,115 @@
+"""
+Optional coalescing of bursts of updates to the same data product.
+
+CI pipelines often push several metadata and schema updates to one data product
+within a few seconds. Applied one at a time, each creates a new version with a
+full copy of every schema. When coalescing is enabled, the first update to a
+data product waits for a short window, and any further updates to it that arrive
+in the meantime are merged in. The merged update is applied once, as a single
+new version, and every caller gets the result.
+
+Coalescing happens within a single worker process. Updates that reach different
+workers are still applied separately, one after another.
+"""
+
+import asyncio
+from dataclasses import dataclass, field
+from typing import Callable, TypeVar
+
+import structlog
+
+from ..config import settings
+
+logger = structlog.get_logger(__name__)
+
+T = TypeVar("T")
+
+
+@dataclass
+class PendingUpdate:
+    """
+    Changes to be applied to a data product: new metadata, and new attributes
+    for schemas, keyed by table name
+    """
+
+    metadata: dict = field(default_factory=dict)
+    schemas: dict[str, dict] = field(default_factory=dict)
+
+    def merge(self, other: "PendingUpdate"):
+        """
+        Merge in a later update. Where both update the same thing, the later wins.
+        """
+        self.metadata.update(other.metadata)
+        for table_name, attributes in other.schemas.items():
+            self.schemas.setdefault(table_name, {}).update(attributes)
+
+
+@dataclass
+class Batch:
+    update: PendingUpdate
+    result: asyncio.Future
+    size: int = 1
+
+
+class WriteCoalescer:
+    def __init__(self, window: float):
+        self.window = window
+        self._batches: dict[str, Batch] = {}
+
+    async def submit(
+        self,
+        name: str,
+        update: PendingUpdate,
+        apply: Callable[[PendingUpdate], T],
+    ) -> T:
+        """
+        Apply an update to a data product, merged with any other updates to it
+        submitted within the coalescing window.
+
+        The first caller in a window applies the merged update using its own
+        apply function, and the result (or exception) is shared with the rest.
+        """
+        if not self.window:
+            return apply(update)
+
+        batch = self._batches.get(name)
+        if batch is not None:
+            batch.update.merge(update)
+            batch.size += 1
+            return await asyncio.shield(batch.result)
+
+        batch = Batch(
+            update=PendingUpdate(
+                metadata=dict(update.metadata),
+                schemas={
+                    table_name: dict(attributes)
+                    for table_name, attributes in update.schemas.items()
+                },
+            ),
+            result=asyncio.get_running_loop().create_future(),
+        )
+        self._batches[name] = batch
+        try:
+            await asyncio.sleep(self.window)
+        except asyncio.CancelledError:
+            batch.result.cancel()
+            raise
+        finally:
+            # No more updates can join once the batch starts to be applied
+            del self._batches[name]
+
+        try:
+            result = apply(batch.update)
+        except Exception as error:
+            batch.result.set_exception(error)
+            # Only followers need to see the exception - the leader raises it below
+            batch.result.exception()
+            raise
+
+        if batch.size > 1:
+            logger.info(f"Coalesced {batch.size} updates to {name}")
+        batch.result.set_result(result)
+        return result
+
+
+write_coalescer = WriteCoalescer(settings.write_coalescing_window_seconds)
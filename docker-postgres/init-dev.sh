@@ -4,4 +4,5 @@ set -e
 psql -v ON_ERROR_STOP=1 --username "$POSTGRES_USER" --dbname "$POSTGRES_DB" <<-EOSQL
 	CREATE DATABASE daap_api_dev;
     CREATE DATABASE daap_api_test;
+    CREATE DATABASE daap_api_test_replica;
 EOSQL
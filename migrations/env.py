@@ -5,6 +5,11 @@ from sqlalchemy import engine_from_config, pool
 
 from daap_api.db import Base
 from daap_api.models.orm.metadata_orm_models import *
+from migrations.helpers import (
+    DEFAULT_LOCK_TIMEOUT,
+    DEFAULT_STATEMENT_TIMEOUT,
+    set_timeouts,
+)
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
@@ -57,6 +62,11 @@ def run_migrations_online() -> None:
     In this scenario we need to create an Engine
     and associate a connection with the context.
 
+    Each migration runs in its own transaction, so that a migration can
+    step outside of it (see migrations/helpers.py) without committing
+    half of another migration. Lock and statement timeouts guard against
+    a migration stalling the API while it waits for, or holds, a lock.
+
     """
     url = config.get_main_option("sqlalchemy.url")
     alembic_config = config.get_section(config.config_ini_section)
@@ -69,8 +79,22 @@ def run_migrations_online() -> None:
         poolclass=pool.NullPool,
     )
 
+    x_arguments = context.get_x_argument(as_dictionary=True)
+
     with connectable.connect() as connection:
-        context.configure(connection=connection, target_metadata=target_metadata)
+        set_timeouts(
+            connection,
+            lock_timeout=x_arguments.get("lock_timeout", DEFAULT_LOCK_TIMEOUT),
+            statement_timeout=x_arguments.get(
+                "statement_timeout", DEFAULT_STATEMENT_TIMEOUT
+            ),
+        )
+        connection.commit()
+        context.configure(
+            connection=connection,
+            target_metadata=target_metadata,
+            transaction_per_migration=True,
+        )
 
         with context.begin_transaction():
             context.run_migrations()
@@ -0,0 +1,185 @@
+"""
+Helpers for migrations that run against a live database without downtime.
+
+Plain DDL inside the migration transaction holds its locks until the whole
+migration commits, which stalls the API while, for example, an index is built
+over a large table. These helpers instead:
+
+- build and drop indexes concurrently, outside of the migration transaction
+- bound how long a migration waits for locks, so that a migration queued behind
+  a long-running query fails fast, rather than blocking every query queued
+  behind the migration
+- backfill existing rows in small batches, each committed separately
+
+Usage, inside a migration's upgrade or downgrade:
+
+    from migrations.helpers import backfill, create_index_concurrently
+
+    create_index_concurrently("ix_schemas_columns", "schemas", ["columns"])
+    backfill("schemas", "columns_jsonb = columns::jsonb", "columns_jsonb IS NULL")
+"""
+import logging
+import time
+from contextlib import contextmanager
+from typing import Iterator, Optional, Sequence
+
+import sqlalchemy as sa
+from alembic import op
+
+logger = logging.getLogger("alembic.helpers")
+
+# Defaults for the guards set by env.py. Override with, for example:
+#   alembic -x lock_timeout=10s -x statement_timeout=5min upgrade head
+DEFAULT_LOCK_TIMEOUT = "5s"
+DEFAULT_STATEMENT_TIMEOUT = "15min"
+
+
+def set_timeouts(
+    connection: sa.Connection,
+    lock_timeout: Optional[str] = None,
+    statement_timeout: Optional[str] = None,
+):
+    """
+    Set the lock and statement timeouts for the rest of the connection's session
+    """
+    if lock_timeout is not None:
+        connection.execute(
+            sa.text("SELECT set_config('lock_timeout', :value, false)"),
+            {"value": lock_timeout},
+        )
+    if statement_timeout is not None:
+        connection.execute(
+            sa.text("SELECT set_config('statement_timeout', :value, false)"),
+            {"value": statement_timeout},
+        )
+
+
+@contextmanager
+def timeouts(
+    lock_timeout: Optional[str] = None, statement_timeout: Optional[str] = None
+) -> Iterator[None]:
+    """
+    Temporarily override the lock and statement timeouts, e.g. to allow a
+    longer lock wait for one operation. "0" disables a timeout.
+    """
+    connection = op.get_bind()
+    previous = connection.execute(
+        sa.text(
+            "SELECT current_setting('lock_timeout'), "
+            "current_setting('statement_timeout')"
+        )
+    ).one()
+    set_timeouts(connection, lock_timeout, statement_timeout)
+    try:
+        yield
+    finally:
+        set_timeouts(connection, *previous)
+
+
+def create_index_concurrently(
+    index_name: str, table_name: str, columns: Sequence[str], **kwargs
+):
+    """
+    Build an index without blocking writes to the table.
+
+    A concurrent build that fails leaves an invalid index behind, so any
+    invalid index with the same name is dropped first, to allow the migration
+    to be retried. Builds are not subject to the statement timeout, as they can
+    take a long time on a large table without holding up other queries. Nor are
+    they subject to the lock timeout: a concurrent build waits for every older
+    transaction to finish, which on a busy database can take longer than the
+    lock timeout, but doesn't block other queries while it waits.
+    """
+    with op.get_context().autocommit_block(), timeouts(
+        lock_timeout="0", statement_timeout="0"
+    ):
+        if _index_is_invalid(index_name):
+            logger.info(f"Dropping invalid index {index_name} left by a failed build")
+            op.drop_index(
+                index_name, table_name=table_name, postgresql_concurrently=True
+            )
+        op.create_index(
+            index_name,
+            table_name,
+            columns,
+            postgresql_concurrently=True,
+            if_not_exists=True,
+            **kwargs,
+        )
+
+
+def drop_index_concurrently(index_name: str, table_name: str):
+    """
+    Drop an index without blocking reads or writes to the table. Like a
+    concurrent build, this waits for older transactions without a lock timeout.
+    """
+    with op.get_context().autocommit_block(), timeouts(lock_timeout="0"):
+        op.drop_index(
+            index_name,
+            table_name=table_name,
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
+
+
+def _index_is_invalid(index_name: str) -> bool:
+    return bool(
+        op.get_bind()
+        .execute(
+            sa.text(
+                "SELECT NOT indisvalid FROM pg_index "
+                "WHERE indexrelid = to_regclass(:index_name)"
+            ),
+            {"index_name": index_name},
+        )
+        .scalar()
+    )
+
+
+def backfill(
+    table_name: str,
+    set_clause: str,
+    where_clause: str = "true",
+    batch_size: int = 1000,
+    pause: float = 0.0,
+    key: str = "id",
+) -> int:
+    """
+    Run UPDATE table_name SET set_clause WHERE where_clause in batches of
+    batch_size rows by key, committing each batch, so that no rows are locked
+    for longer than one batch takes. Progress is logged after each batch, and
+    pause seconds are slept between batches to leave headroom for the API.
+
+    The update must be idempotent, as a failed backfill is retried from the
+    start. Returns the number of rows updated.
+    """
+    connection = op.get_bind()
+    updated = 0
+
+    with op.get_context().autocommit_block():
+        first, last = connection.execute(
+            sa.text(f"SELECT min({key}), max({key}) FROM {table_name}")
+        ).one()
+        if first is None:
+            return updated
+
+        update = sa.text(
+            f"UPDATE {table_name} SET {set_clause} "
+            f"WHERE {key} >= :start AND {key} < :end AND ({where_clause})"
+        )
+        for start in range(first, last + 1, batch_size):
+            result = connection.execute(
+                update, {"start": start, "end": start + batch_size}
+            )
+            updated += result.rowcount
+
+            done = min(start + batch_size, last + 1) - first
+            total = last + 1 - first
+            logger.info(
+                f"Backfilled {updated} rows of {table_name} "
+                f"({done / total:.0%} of {key} range)"
+            )
+            if pause:
+                time.sleep(pause)
+
+    return updated
@@ -0,0 +1,33 @@
+"""Add sync watermarks table
+
+Revision ID: 3a801bb61cf9
+Revises: d810ccc1a640
+Create Date: 2026-10-19 06:36:25.796820
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "3a801bb61cf9"  # pragma: allowlist secret
+down_revision: Union[str, None] = "d810ccc1a640"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "sync_watermarks",
+        sa.Column("name", sa.String(), nullable=False),
+        sa.Column("seq", sa.BigInteger(), nullable=True),
+        sa.Column(
+            "updated_at", sa.DateTime(), server_default=sa.text("now()"), nullable=False
+        ),
+        sa.PrimaryKeyConstraint("name"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("sync_watermarks")
@@ -0,0 +1,42 @@
+"""Add trigram indexes for name autocomplete
+
+Revision ID: 3f1c9a7d2e48
+Revises: 65817df3e2f0
+Create Date: 2026-10-19 09:12:41.204113
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "3f1c9a7d2e48"  # pragma: allowlist secret
+down_revision: Union[str, None] = "65817df3e2f0"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.create_index(
+        "ix_data_products_name_trgm",
+        "data_products",
+        ["name"],
+        unique=False,
+        postgresql_using="gin",
+        postgresql_ops={"name": "gin_trgm_ops"},
+    )
+    op.create_index(
+        "ix_schemas_name_trgm",
+        "schemas",
+        ["name"],
+        unique=False,
+        postgresql_using="gin",
+        postgresql_ops={"name": "gin_trgm_ops"},
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_schemas_name_trgm", table_name="schemas")
+    op.drop_index("ix_data_products_name_trgm", table_name="data_products")
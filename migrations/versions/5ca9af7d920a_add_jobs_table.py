@@ -0,0 +1,53 @@
+"""Add jobs table
+
+Revision ID: 5ca9af7d920a
+Revises: e4a7c9d2b6f1
+Create Date: 2026-10-19 06:29:35.298128
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = "5ca9af7d920a"  # pragma: allowlist secret
+down_revision: Union[str, None] = "e4a7c9d2b6f1"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "jobs",
+        sa.Column("id", sa.BigInteger(), nullable=False),
+        sa.Column("kind", sa.String(), nullable=False),
+        sa.Column("payload", sa.JSON(), nullable=False),
+        sa.Column(
+            "status", sa.Enum("pending", "failed", name="jobstatus"), nullable=False
+        ),
+        sa.Column("attempts", sa.Integer(), nullable=False),
+        sa.Column("last_error", sa.String(), nullable=True),
+        sa.Column(
+            "created_at", sa.DateTime(), server_default=sa.text("now()"), nullable=False
+        ),
+        sa.Column(
+            "run_after", sa.DateTime(), server_default=sa.text("now()"), nullable=False
+        ),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    # Only pending jobs are claimed, so failed jobs are left out of the index
+    op.create_index(
+        "ix_jobs_ready",
+        "jobs",
+        ["run_after"],
+        unique=False,
+        postgresql_where=sa.text("status = 'pending'"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_jobs_ready", table_name="jobs")
+    op.drop_table("jobs")
+    postgresql.ENUM(name="jobstatus").drop(op.get_bind())
@@ -0,0 +1,51 @@
+"""Add data product stats materialised view
+
+Revision ID: 7a4e2b9c1d05
+Revises: 3f1c9a7d2e48
+Create Date: 2026-10-19 10:03:17.552901
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "7a4e2b9c1d05"  # pragma: allowlist secret
+down_revision: Union[str, None] = "3f1c9a7d2e48"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute(
+        """
+        CREATE MATERIALIZED VIEW data_product_stats AS
+        SELECT
+            data_product_versions.domain,
+            data_product_versions.status,
+            data_product_versions.dpia_required,
+            count(DISTINCT data_product_versions.id) AS data_products,
+            count(schemas.id) AS tables,
+            coalesce(sum(json_array_length(schemas.columns)), 0) AS columns
+        FROM data_products
+        JOIN data_product_versions
+            ON data_product_versions.id = data_products.current_version_id
+        LEFT JOIN schemas ON schemas.data_product_id = data_product_versions.id
+        GROUP BY
+            data_product_versions.domain,
+            data_product_versions.status,
+            data_product_versions.dpia_required
+        """
+    )
+    # A unique index is required to refresh the view concurrently
+    op.create_index(
+        "ix_data_product_stats_domain_status_dpia",
+        "data_product_stats",
+        ["domain", "status", "dpia_required"],
+        unique=True,
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP MATERIALIZED VIEW data_product_stats")
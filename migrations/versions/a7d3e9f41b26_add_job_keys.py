@@ -0,0 +1,44 @@
+"""Add job keys
+
+Revision ID: a7d3e9f41b26
+Revises: f2c81d5e7a93
+Create Date: 2026-10-19 19:05:22.640187
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+from migrations.helpers import (
+    backfill,
+    create_index_concurrently,
+    drop_index_concurrently,
+)
+
+# revision identifiers, used by Alembic.
+revision: str = "a7d3e9f41b26"  # pragma: allowlist secret
+down_revision: Union[str, None] = "f2c81d5e7a93"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("jobs", sa.Column("key", sa.String(), nullable=True))
+    # Deliveries waiting to be sent are found by their subscriber's URL
+    backfill(
+        "jobs",
+        "key = payload->>'url'",
+        "kind = 'deliver_notifications' AND status = 'pending' AND key IS NULL",
+    )
+    create_index_concurrently(
+        "ix_jobs_kind_key",
+        "jobs",
+        ["kind", "key"],
+        postgresql_where=sa.text("status = 'pending' AND key IS NOT NULL"),
+    )
+
+
+def downgrade() -> None:
+    drop_index_concurrently("ix_jobs_kind_key", "jobs")
+    op.drop_column("jobs", "key")
@@ -0,0 +1,40 @@
+"""Add read models table
+
+Revision ID: c52d8e1f4a90
+Revises: 7a4e2b9c1d05
+Create Date: 2026-10-19 11:26:05.718334
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "c52d8e1f4a90"  # pragma: allowlist secret
+down_revision: Union[str, None] = "7a4e2b9c1d05"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Documents are written as data products change; until then reads fall
+    # back to rendering from the metadata tables
+    op.create_table(
+        "read_models",
+        sa.Column("id", sa.String(), nullable=False),
+        sa.Column("data_product_name", sa.String(), nullable=False),
+        sa.Column("document", sa.LargeBinary(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(
+        op.f("ix_read_models_data_product_name"),
+        "read_models",
+        ["data_product_name"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(op.f("ix_read_models_data_product_name"), table_name="read_models")
+    op.drop_table("read_models")
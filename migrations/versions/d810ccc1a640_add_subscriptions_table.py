@@ -0,0 +1,41 @@
+"""Add subscriptions table
+
+Revision ID: d810ccc1a640
+Revises: 5ca9af7d920a
+Create Date: 2026-10-19 06:32:50.913405
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "d810ccc1a640"  # pragma: allowlist secret
+down_revision: Union[str, None] = "5ca9af7d920a"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "subscriptions",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("data_product_name", sa.String(), nullable=False),
+        sa.Column("url", sa.String(), nullable=False),
+        sa.Column(
+            "created_at", sa.DateTime(), server_default=sa.text("now()"), nullable=False
+        ),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(
+        "ix_subscriptions_data_product_name_url",
+        "subscriptions",
+        ["data_product_name", "url"],
+        unique=True,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_subscriptions_data_product_name_url", table_name="subscriptions")
+    op.drop_table("subscriptions")
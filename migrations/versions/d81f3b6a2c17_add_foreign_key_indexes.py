@@ -0,0 +1,37 @@
+"""Add indexes on foreign keys
+
+Revision ID: d81f3b6a2c17
+Revises: c52d8e1f4a90
+Create Date: 2026-10-19 14:03:27.518342
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+from migrations.helpers import create_index_concurrently, drop_index_concurrently
+
+# revision identifiers, used by Alembic.
+revision: str = "d81f3b6a2c17"  # pragma: allowlist secret
+down_revision: Union[str, None] = "c52d8e1f4a90"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    create_index_concurrently(
+        op.f("ix_data_products_current_version_id"),
+        "data_products",
+        ["current_version_id"],
+    )
+    create_index_concurrently(
+        op.f("ix_schemas_data_product_id"), "schemas", ["data_product_id"]
+    )
+
+
+def downgrade() -> None:
+    drop_index_concurrently(op.f("ix_schemas_data_product_id"), "schemas")
+    drop_index_concurrently(
+        op.f("ix_data_products_current_version_id"), "data_products"
+    )
@@ -0,0 +1,44 @@
+"""Add catalogue changes table
+
+Revision ID: e4a7c9d2b6f1
+Revises: d81f3b6a2c17
+Create Date: 2026-10-19 16:41:52.093815
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = "e4a7c9d2b6f1"  # pragma: allowlist secret
+down_revision: Union[str, None] = "d81f3b6a2c17"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # The log starts empty: clients sync by listing the catalogue once, then
+    # following changes from there
+    op.create_table(
+        "catalogue_changes",
+        sa.Column("seq", sa.BigInteger(), nullable=False),
+        sa.Column("entity_id", sa.String(), nullable=False),
+        sa.Column("data_product_name", sa.String(), nullable=False),
+        sa.Column("version", sa.String(), nullable=False),
+        sa.Column(
+            "change",
+            sa.Enum("created", "updated", "deleted", name="changetype"),
+            nullable=False,
+        ),
+        sa.Column(
+            "changed_at", sa.DateTime(), server_default=sa.text("now()"), nullable=False
+        ),
+        sa.PrimaryKeyConstraint("seq"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("catalogue_changes")
+    postgresql.ENUM(name="changetype").drop(op.get_bind())
@@ -0,0 +1,64 @@
+"""Add archived versions table
+
+Revision ID: ec5142bd33a2
+Revises: 3a801bb61cf9
+Create Date: 2026-10-19 06:45:14.961573
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+from migrations.helpers import (
+    backfill,
+    create_index_concurrently,
+    drop_index_concurrently,
+)
+
+# revision identifiers, used by Alembic.
+revision: str = "ec5142bd33a2"  # pragma: allowlist secret
+down_revision: Union[str, None] = "3a801bb61cf9"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "archived_versions",
+        sa.Column("name", sa.String(), nullable=False),
+        sa.Column("version", sa.String(), nullable=False),
+        sa.Column("location", sa.String(), nullable=False),
+        sa.Column(
+            "archived_at",
+            sa.DateTime(),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+        sa.PrimaryKeyConstraint("name", "version"),
+    )
+    op.add_column(
+        "data_product_versions",
+        sa.Column("superseded_at", sa.DateTime(), nullable=True),
+    )
+    # When existing versions were superseded isn't known, so they count from now
+    backfill(
+        "data_product_versions",
+        "superseded_at = now()",
+        "superseded_at IS NULL AND id NOT IN "
+        "(SELECT current_version_id FROM data_products)",
+    )
+    create_index_concurrently(
+        "ix_data_product_versions_superseded_at",
+        "data_product_versions",
+        ["superseded_at"],
+        postgresql_where=sa.text("superseded_at IS NOT NULL"),
+    )
+
+
+def downgrade() -> None:
+    drop_index_concurrently(
+        "ix_data_product_versions_superseded_at", "data_product_versions"
+    )
+    op.drop_column("data_product_versions", "superseded_at")
+    op.drop_table("archived_versions")
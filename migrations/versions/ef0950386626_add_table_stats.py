@@ -0,0 +1,39 @@
+"""Add table stats
+
+Revision ID: ef0950386626
+Revises: ec5142bd33a2
+Create Date: 2026-10-19 07:01:14.558314
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "ef0950386626"  # pragma: allowlist secret
+down_revision: Union[str, None] = "ec5142bd33a2"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "table_stats",
+        sa.Column("data_product_name", sa.String(), nullable=False),
+        sa.Column("table_name", sa.String(), nullable=False),
+        sa.Column("row_count", sa.BigInteger(), nullable=True),
+        sa.Column("last_updated", sa.DateTime(), nullable=True),
+        sa.Column("s3_location", sa.String(), nullable=True),
+        sa.Column(
+            "updated_at",
+            sa.DateTime(),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+        sa.PrimaryKeyConstraint("data_product_name", "table_name"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("table_stats")
@@ -0,0 +1,30 @@
+"""Index catalogue changes by version
+
+Revision ID: f2c81d5e7a93
+Revises: ef0950386626
+Create Date: 2026-10-19 18:12:40.318204
+
+"""
+from typing import Sequence, Union
+
+from migrations.helpers import create_index_concurrently, drop_index_concurrently
+
+# revision identifiers, used by Alembic.
+revision: str = "f2c81d5e7a93"  # pragma: allowlist secret
+down_revision: Union[str, None] = "ef0950386626"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    create_index_concurrently(
+        "ix_catalogue_changes_data_product_name_version",
+        "catalogue_changes",
+        ["data_product_name", "version"],
+    )
+
+
+def downgrade() -> None:
+    drop_index_concurrently(
+        "ix_catalogue_changes_data_product_name_version", "catalogue_changes"
+    )
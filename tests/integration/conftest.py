@@ -1,12 +1,20 @@
+import boto3
 import pytest
 from factory import SubFactory
 from factory.alchemy import SQLAlchemyModelFactory
+from fastapi import status
 from fastapi.testclient import TestClient
-from sqlalchemy import StaticPool, create_engine
+from moto import mock_s3
+from sqlalchemy import StaticPool
 from sqlalchemy.orm import Session
 
 from daap_api.config import settings
-from daap_api.db import Base, get_session
+from daap_api.db import (
+    Base,
+    create_database_engine,
+    get_read_session,
+    get_session,
+)
 from daap_api.main import app
 from daap_api.main import backend as cache_backend
 from daap_api.models.orm.metadata_orm_models import (
@@ -14,6 +22,9 @@ from daap_api.models.orm.metadata_orm_models import (
     DataProductVersionTable,
     SchemaTable,
 )
+from daap_api.services.autocomplete_service import suggestion_cache
+from daap_api.services.catalogue_snapshot import catalogue_cache
+from daap_api.services.stats_buffer import stats_cache
 
 
 @pytest.fixture()
@@ -22,6 +33,7 @@ def client(session: Session):
         return session
 
     app.dependency_overrides[get_session] = get_session_override
+    app.dependency_overrides[get_read_session] = get_session_override
 
     client = TestClient(app)
     yield client
@@ -30,7 +42,7 @@ def client(session: Session):
 
 @pytest.fixture()
 def session():
-    engine = create_engine(settings.database_url_test, poolclass=StaticPool)
+    engine = create_database_engine(settings.database_url_test, poolclass=StaticPool)
     Base.metadata.drop_all(engine)
     Base.metadata.create_all(engine)
     with Session(engine) as session:
@@ -38,6 +50,86 @@ def session():
         Base.metadata.drop_all(engine)
         cache_backend.response_store.clear()
         cache_backend.keys.clear()
+        suggestion_cache.clear()
+        stats_cache.clear()
+        catalogue_cache.reset()
+
+
+@pytest.fixture
+def engine(session):
+    """
+    A second engine on the test database, for background services that open
+    their own sessions rather than sharing the test's
+    """
+    engine = create_database_engine(settings.database_url_test)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def s3(monkeypatch):
+    """
+    A mocked S3 client, with the landing zone and data buckets created
+    """
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    with mock_s3():
+        client = boto3.client("s3", region_name="eu-west-2")
+        for bucket in (settings.landing_zone_bucket_name, settings.data_bucket_name):
+            client.create_bucket(
+                Bucket=bucket,
+                CreateBucketConfiguration={"LocationConstraint": "eu-west-2"},
+            )
+        yield client
+
+
+@pytest.fixture
+def data_product_metadata():
+    """
+    The fields of a data product that are sent both to register and to
+    update it
+    """
+    return {
+        "description": "Data product for hmpps_use_of_force dev data",
+        "domain": "HMPPS",
+        "dataProductOwner": "dataplatformlabs@digital.justice.gov.uk",
+        "dataProductOwnerDisplayName": "Data Platform Labs",
+        "email": "dataplatformlabs@digital.justice.gov.uk",
+        "status": "draft",
+        "retentionPeriod": 3000,
+        "dpiaRequired": False,
+    }
+
+
+@pytest.fixture
+def create_data_product(client, data_product_metadata):
+    """
+    Register a data product through the API, with any fields overridden
+    """
+
+    def create(name="hmpps_use_of_force", **fields):
+        response = client.post(
+            "/v1/data-products/",
+            json={**data_product_metadata, "name": name, **fields},
+        )
+        assert response.status_code == status.HTTP_200_OK, response.text
+        return response.json()
+
+    return create
+
+
+@pytest.fixture
+def update_data_product(client, data_product_metadata):
+    """
+    Update a data product's metadata through the API, with any fields overridden
+    """
+
+    def update(name="hmpps_use_of_force", **fields):
+        return client.put(
+            f"/v1/data-products/dp:{name}", json={**data_product_metadata, **fields}
+        )
+
+    return update
 
 
 @pytest.fixture
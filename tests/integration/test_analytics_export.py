@@ -0,0 +1,163 @@
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+from sqlalchemy.orm import Session
+
+from daap_api.config import settings
+from daap_api.services.analytics_export import (
+    COLUMNS_DATASET,
+    VERSIONS_DATASET,
+    AnalyticsExporter,
+)
+
+schema = {
+    "tableDescription": "abcd",
+    "columns": [
+        {"name": "id", "type": "bigint", "description": "identifier"},
+        {"name": "amount", "type": "decimal(10,2)", "description": ""},
+    ],
+}
+
+
+@pytest.fixture
+def exporter(engine, s3):
+    return AnalyticsExporter(
+        session_factory=lambda: Session(engine),
+        client_factory=lambda: s3,
+        bucket=settings.data_bucket_name,
+        page_size=2,
+        interval=3600,
+    )
+
+
+def read_dataset(s3, dataset) -> dict[str, pa.Table]:
+    """
+    Read every file of a dataset, keyed by domain, ordered by key
+    """
+    tables = {}
+    keys = sorted(
+        item["Key"]
+        for item in s3.list_objects_v2(
+            Bucket=settings.data_bucket_name, Prefix=f"analytics/{dataset}/"
+        ).get("Contents", [])
+    )
+    for key in keys:
+        domain = key.split("/")[2].removeprefix("domain=")
+        body = s3.get_object(Bucket=settings.data_bucket_name, Key=key)["Body"]
+        table = pq.read_table(pa.BufferReader(body.read()))
+        tables[domain] = (
+            pa.concat_tables([tables[domain], table]) if domain in tables else table
+        )
+    return tables
+
+
+def test_exports_versions_and_columns_by_domain(
+    client, create_data_product, exporter, s3
+):
+    create_data_product("data_product_1")
+    create_data_product("data_product_2", domain="OPG")
+    client.post("/v1/schemas/dp:data_product_1:table_1", json=schema)
+    client.put(
+        "/v1/schemas/dp:data_product_1:table_1",
+        json={**schema, "tableDescription": "efgh"},
+    )
+
+    assert exporter.export() == (3, 2)
+
+    versions = read_dataset(s3, VERSIONS_DATASET)
+    assert set(versions) == {"HMPPS", "OPG"}
+    assert versions["HMPPS"].column("version").to_pylist() == ["v1.0", "v1.1"]
+    assert versions["OPG"].column("name").to_pylist() == ["data_product_2"]
+
+    columns = read_dataset(s3, COLUMNS_DATASET)["HMPPS"].to_pylist()
+    assert [
+        (
+            row["version"],
+            row["table_description"],
+            row["position"],
+            row["column_name"],
+            row["column_type"],
+        )
+        for row in columns
+    ] == [
+        ("v1.0", "abcd", 0, "id", "bigint"),
+        ("v1.0", "abcd", 1, "amount", "decimal(10,2)"),
+        ("v1.1", "efgh", 0, "id", "bigint"),
+        ("v1.1", "efgh", 1, "amount", "decimal(10,2)"),
+    ]
+
+
+def test_low_cardinality_columns_are_dictionary_encoded(
+    client, create_data_product, exporter, s3
+):
+    create_data_product("data_product_1")
+    client.post("/v1/schemas/dp:data_product_1:table_1", json=schema)
+    exporter.export()
+
+    columns = read_dataset(s3, COLUMNS_DATASET)["HMPPS"]
+    assert pa.types.is_dictionary(columns.schema.field("column_type").type)
+    assert pa.types.is_string(columns.schema.field("column_description").type)
+
+
+def test_only_new_rows_are_exported(client, create_data_product, exporter, s3):
+    create_data_product("data_product_1")
+    client.post("/v1/schemas/dp:data_product_1:table_1", json=schema)
+    assert exporter.export() == (1, 1)
+
+    create_data_product("data_product_2")
+    client.post("/v1/schemas/dp:data_product_2:table_1", json=schema)
+    assert exporter.export() == (1, 1)
+    assert exporter.export() == (0, 0)
+
+    versions = read_dataset(s3, VERSIONS_DATASET)["HMPPS"]
+    assert versions.column("name").to_pylist() == ["data_product_1", "data_product_2"]
+
+
+def test_unchanged_schemas_are_exported_with_new_versions(
+    client, create_data_product, update_data_product, exporter, s3
+):
+    create_data_product("data_product_1")
+    client.post("/v1/schemas/dp:data_product_1:table_1", json=schema)
+    client.post("/v1/schemas/dp:data_product_1:table_2", json=schema)
+    assert exporter.export() == (1, 2)
+
+    update_data_product("data_product_1", description="Updated")
+    client.put(
+        "/v1/schemas/dp:data_product_1:table_1",
+        json={**schema, "tableDescription": "efgh"},
+    )
+    assert exporter.export() == (2, 4)
+
+    columns = read_dataset(s3, COLUMNS_DATASET)["HMPPS"].to_pylist()
+    assert sorted(
+        {
+            (row["version"], row["table_name"], row["table_description"])
+            for row in columns
+        }
+    ) == [
+        ("v1.0", "table_1", "abcd"),
+        ("v1.0", "table_2", "abcd"),
+        ("v1.1", "table_1", "abcd"),
+        ("v1.1", "table_2", "abcd"),
+        ("v1.2", "table_1", "efgh"),
+        ("v1.2", "table_2", "abcd"),
+    ]
+    assert len(columns) == 12
+
+
+def test_failed_page_is_exported_again(
+    client, create_data_product, exporter, s3, monkeypatch
+):
+    create_data_product("data_product_1")
+    put_object = s3.put_object
+
+    def fail(**kwargs):
+        raise RuntimeError("S3 is down")
+
+    monkeypatch.setattr(s3, "put_object", fail)
+    with pytest.raises(RuntimeError):
+        exporter.export()
+    monkeypatch.setattr(s3, "put_object", put_object)
+
+    assert exporter.export() == (1, 0)
+    assert read_dataset(s3, VERSIONS_DATASET)["HMPPS"].num_rows == 1
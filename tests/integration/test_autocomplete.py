@@ -0,0 +1,95 @@
+import pytest
+from fastapi import status
+
+from daap_api.services.autocomplete_service import MAX_RESULTS
+
+
+@pytest.fixture
+def data_products(data_product_factory, data_product_version_factory):
+    return [
+        data_product_factory.create(
+            name=name, current_version=data_product_version_factory(name=name)
+        )
+        for name in ["hmpps_use_of_force", "hmpps_prisons", "court_data"]
+    ]
+
+
+@pytest.fixture
+def schema(schema_factory, data_products):
+    return schema_factory.create(
+        data_product_version=data_products[0].current_version, name="statement"
+    )
+
+
+def test_autocomplete_prefix(client, data_products):
+    response = client.get("/v1/autocomplete", params={"q": "hmpps"})
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == {
+        "dataProducts": [
+            {"id": "dp:hmpps_prisons", "name": "hmpps_prisons"},
+            {"id": "dp:hmpps_use_of_force", "name": "hmpps_use_of_force"},
+        ],
+        "schemas": [],
+    }
+
+
+def test_autocomplete_ranks_prefix_matches_first(client, data_products):
+    response = client.get("/v1/autocomplete", params={"q": "hmpps_u"})
+
+    assert response.status_code == status.HTTP_200_OK
+    assert [dp["name"] for dp in response.json()["dataProducts"]] == [
+        "hmpps_use_of_force",
+        "hmpps_prisons",
+    ]
+
+
+def test_autocomplete_fuzzy_match(client, data_products):
+    response = client.get("/v1/autocomplete", params={"q": "cort_data"})
+
+    assert response.status_code == status.HTTP_200_OK
+    assert [dp["name"] for dp in response.json()["dataProducts"]] == ["court_data"]
+
+
+def test_autocomplete_schemas(client, schema):
+    response = client.get("/v1/autocomplete", params={"q": "state"})
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["schemas"] == [
+        {
+            "id": "dp:hmpps_use_of_force:statement",
+            "name": "statement",
+            "dataProductId": "dp:hmpps_use_of_force",
+        }
+    ]
+
+
+def test_autocomplete_only_suggests_current_schemas(
+    client, schema, data_products, data_product_version_factory
+):
+    data_product = data_products[0]
+    data_product.current_version = data_product_version_factory(
+        name=data_product.name, version="v2.0"
+    )
+
+    response = client.get("/v1/autocomplete", params={"q": "state"})
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["schemas"] == []
+
+
+def test_autocomplete_is_cached(client, session, data_products, data_product_factory):
+    client.get("/v1/autocomplete", params={"q": "court"})
+    data_product_factory.create(name="court_data_2")
+
+    response = client.get("/v1/autocomplete", params={"q": "court"})
+
+    assert [dp["name"] for dp in response.json()["dataProducts"]] == ["court_data"]
+
+
+def test_autocomplete_limit_is_capped(client):
+    response = client.get(
+        "/v1/autocomplete", params={"q": "hmpps", "limit": MAX_RESULTS + 1}
+    )
+
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
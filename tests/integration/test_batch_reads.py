@@ -0,0 +1,82 @@
+import pytest
+from fastapi import status
+
+
+@pytest.fixture
+def data_product(data_product_factory):
+    return data_product_factory.create()
+
+
+@pytest.fixture
+def schemas(schema_factory, data_product):
+    return [
+        schema_factory.create(
+            data_product_version=data_product.current_version, name=name
+        )
+        for name in ["statement", "report"]
+    ]
+
+
+def test_batch_get_data_products(client, schemas):
+    response = client.get(
+        "/v1/data-products/batch",
+        params={"ids": ["dp:hmpps_use_of_force", "dp:does_not_exist"]},
+    )
+
+    assert response.status_code == status.HTTP_200_OK
+    found, not_found = response.json()
+    assert found["id"] == "dp:hmpps_use_of_force"
+    assert found["found"] is True
+    assert found["dataProduct"]["id"] == "dp:hmpps_use_of_force"
+    assert found["dataProduct"]["version"] == "v1.0"
+    assert sorted(schema["id"] for schema in found["dataProduct"]["schemas"]) == [
+        "dp:hmpps_use_of_force:v1.0:report",
+        "dp:hmpps_use_of_force:v1.0:statement",
+    ]
+    assert not_found == {
+        "id": "dp:does_not_exist",
+        "found": False,
+        "dataProduct": None,
+    }
+
+
+def test_batch_get_schemas(client, schemas):
+    response = client.get(
+        "/v1/schemas/batch",
+        params={
+            "ids": [
+                "dp:hmpps_use_of_force:report",
+                "dp:hmpps_use_of_force:missing",
+                "dp:hmpps_use_of_force:statement",
+            ]
+        },
+    )
+
+    assert response.status_code == status.HTTP_200_OK
+    assert [(item["id"], item["found"]) for item in response.json()] == [
+        ("dp:hmpps_use_of_force:report", True),
+        ("dp:hmpps_use_of_force:missing", False),
+        ("dp:hmpps_use_of_force:statement", True),
+    ]
+    assert response.json()[0]["schema"] == {
+        "id": "dp:hmpps_use_of_force:v1.0:report",
+        "tableDescription": "desc",
+        "columns": schemas[1].columns,
+    }
+    assert response.json()[1]["schema"] is None
+
+
+def test_batch_get_invalid_id(client):
+    response = client.get("/v1/schemas/batch", params={"ids": ["hmpps_use_of_force"]})
+
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert response.json() == {"detail": "Invalid id: hmpps_use_of_force"}
+
+
+def test_batch_get_too_many_ids(client):
+    response = client.get(
+        "/v1/data-products/batch",
+        params={"ids": [f"dp:data_product_{i}" for i in range(501)]},
+    )
+
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
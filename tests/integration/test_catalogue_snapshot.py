@@ -0,0 +1,114 @@
+import pytest
+from fastapi import status
+
+from daap_api.services.catalogue_snapshot import (
+    CatalogueSnapshot,
+    DataProductRecord,
+    catalogue_cache,
+)
+
+
+@pytest.fixture
+def data_product(data_product_factory):
+    return data_product_factory.create()
+
+
+@pytest.fixture
+def schema(schema_factory, data_product):
+    return schema_factory.create(data_product_version=data_product.current_version)
+
+
+@pytest.fixture
+def snapshot(session, schema, data_product):
+    session.commit()
+    session.refresh(data_product.current_version)
+    catalogue_cache.snapshot = CatalogueSnapshot(
+        [DataProductRecord(data_product.current_version)]
+    )
+    catalogue_cache.listening = True
+    return catalogue_cache.snapshot
+
+
+def test_read_from_snapshot(client, session, data_product, snapshot):
+    data_product.current_version.description = "Changed without notifying"
+    session.commit()
+
+    response = client.get("/v1/data-products/dp:hmpps_use_of_force")
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["description"] == (
+        "Data product for hmpps_use_of_force dev data"
+    )
+    assert response.json()["schemas"] == [
+        {"id": "dp:hmpps_use_of_force:v1.0:statement"}
+    ]
+
+
+def test_list_from_snapshot(client, snapshot):
+    response = client.get("/v1/data-products", params={"expand": "schemas"})
+
+    assert response.status_code == status.HTTP_200_OK
+    assert [dp["id"] for dp in response.json()] == ["dp:hmpps_use_of_force"]
+    assert [schema["id"] for schema in response.json()[0]["schemas"]] == [
+        "dp:hmpps_use_of_force:v1.0:statement"
+    ]
+
+
+def test_read_schema_from_snapshot(client, schema, snapshot):
+    response = client.get("/v1/schemas/dp:hmpps_use_of_force:statement")
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == {
+        "tableDescription": "desc",
+        "columns": schema.columns,
+        "id": "dp:hmpps_use_of_force:v1.0:statement",
+    }
+
+
+def test_falls_back_to_database_when_not_in_snapshot(
+    client, snapshot, data_product_factory, data_product_version_factory
+):
+    data_product_factory.create(
+        name="court_data",
+        current_version=data_product_version_factory(name="court_data"),
+    )
+
+    response = client.get("/v1/data-products/dp:court_data")
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["id"] == "dp:court_data"
+
+
+def test_falls_back_to_database_when_not_listening(
+    client, session, data_product, snapshot
+):
+    catalogue_cache.listening = False
+    data_product.current_version.description = "Changed without notifying"
+    session.commit()
+
+    response = client.get("/v1/data-products/dp:hmpps_use_of_force")
+
+    assert response.json()["description"] == "Changed without notifying"
+
+
+def test_reads_with_consistency_token_skip_snapshot(
+    client, snapshot, update_data_product
+):
+    response = update_data_product(description="Updated description")
+    assert response.status_code == status.HTTP_200_OK
+    headers = {"X-Consistency-Token": response.headers["X-Consistency-Token"]}
+
+    # The snapshot hasn't been told about the update
+    response = client.get("/v1/data-products/dp:hmpps_use_of_force")
+    assert response.json()["description"] != "Updated description"
+
+    response = client.get("/v1/data-products/dp:hmpps_use_of_force", headers=headers)
+    assert response.json()["description"] == "Updated description"
+
+    response = client.get("/v1/data-products", headers=headers)
+    assert response.json()[0]["description"] == "Updated description"
+
+    response = client.get(
+        "/v1/schemas/dp:hmpps_use_of_force:statement", headers=headers
+    )
+    assert response.json()["id"] == "dp:hmpps_use_of_force:v1.1:statement"
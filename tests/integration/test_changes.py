@@ -0,0 +1,67 @@
+from fastapi import status
+
+
+def changes(response):
+    return [
+        (change["seq"], change["id"], change["version"], change["change"])
+        for change in response.json()["changes"]
+    ]
+
+
+def test_no_changes(client):
+    response = client.get("/v1/changes")
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == {"changes": [], "nextSince": 0}
+
+
+def test_changes_are_listed_in_order(client, create_data_product):
+    create_data_product("hmpps_use_of_force")
+    schema = {
+        "tableDescription": "abcd",
+        "columns": [{"name": "id", "type": "bigint", "description": ""}],
+    }
+    client.post("/v1/schemas/dp:hmpps_use_of_force:statement", json=schema)
+    client.post("/v1/schemas/dp:hmpps_use_of_force:incident", json=schema)
+    client.put(
+        "/v1/schemas/dp:hmpps_use_of_force:statement",
+        json={**schema, "tableDescription": "efgh"},
+    )
+
+    response = client.get("/v1/changes")
+
+    assert response.status_code == status.HTTP_200_OK
+    assert changes(response) == [
+        (1, "dp:hmpps_use_of_force", "v1.0", "created"),
+        (2, "dp:hmpps_use_of_force:statement", "v1.0", "created"),
+        (3, "dp:hmpps_use_of_force:incident", "v1.0", "created"),
+        (4, "dp:hmpps_use_of_force", "v1.1", "updated"),
+        (5, "dp:hmpps_use_of_force:statement", "v1.1", "updated"),
+    ]
+    assert response.json()["nextSince"] == 5
+
+
+def test_changes_are_paginated(client, create_data_product):
+    for name in ["data_product_1", "data_product_2", "data_product_3"]:
+        create_data_product(name)
+
+    first_page = client.get("/v1/changes", params={"limit": 2})
+    second_page = client.get(
+        "/v1/changes", params={"since": first_page.json()["nextSince"], "limit": 2}
+    )
+    last_page = client.get(
+        "/v1/changes", params={"since": second_page.json()["nextSince"], "limit": 2}
+    )
+
+    assert [change[1] for change in changes(first_page)] == [
+        "dp:data_product_1",
+        "dp:data_product_2",
+    ]
+    assert [change[1] for change in changes(second_page)] == ["dp:data_product_3"]
+    assert last_page.json() == {"changes": [], "nextSince": 3}
+
+
+def test_invalid_limit(client):
+    response = client.get("/v1/changes", params={"limit": 5000})
+
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
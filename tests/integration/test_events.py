@@ -0,0 +1,86 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException, status
+from sqlalchemy import NullPool, create_engine
+
+from daap_api.config import settings
+from daap_api.db import SessionRouter
+from daap_api.routers import events_router
+from daap_api.services.event_broker import event_broker
+
+
+@pytest.fixture
+def listening(session, monkeypatch):
+    # The replica has no tables, so replaying from it would fail
+    replica = create_engine(settings.database_url_test_replica, poolclass=NullPool)
+    monkeypatch.setattr(
+        events_router, "session_router", SessionRouter(session.get_bind(), [replica])
+    )
+    monkeypatch.setattr(event_broker, "listening", True)
+    yield
+    event_broker.close()
+
+
+def read_events(last_event_id=None, changes=(), count=1):
+    async def stream():
+        response = await events_router.stream_events(last_event_id=last_event_id)
+        for change in changes:
+            await event_broker.on_change(change)
+        events = [await anext(response.body_iterator) for _ in range(count)]
+        await response.body_iterator.aclose()
+        return events
+
+    return asyncio.run(stream())
+
+
+def test_events_unavailable_when_not_listening(client):
+    response = client.get("/v1/events")
+
+    assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+
+
+def test_stream_events(listening):
+    events = read_events(
+        changes=[{"dataProduct": "hmpps_use_of_force", "version": "v1.1", "seq": 7}]
+    )
+
+    assert events == [
+        b"id: 7\n"
+        b"event: version-created\n"
+        b'data: {"id": "dp:hmpps_use_of_force", "version": "v1.1"}\n\n'
+    ]
+    assert not event_broker.subscriptions
+
+
+def test_missed_events_are_replayed(client, create_data_product, listening):
+    for name in ["data_product_1", "data_product_2", "data_product_3"]:
+        create_data_product(name)
+
+    events = read_events(
+        last_event_id=1,
+        changes=[
+            # Committed while the replay was being read, so already replayed
+            {"dataProduct": "data_product_3", "version": "v1.0", "seq": 3},
+            {"dataProduct": "data_product_4", "version": "v1.0", "seq": 4},
+        ],
+        count=3,
+    )
+
+    assert [event.split(b"\n")[0] for event in events] == [
+        b"id: 2",
+        b"id: 3",
+        b"id: 4",
+    ]
+
+
+def test_too_many_missed_events(client, create_data_product, listening, monkeypatch):
+    monkeypatch.setattr(events_router, "MAX_REPLAYED_CHANGES", 1)
+    for name in ["data_product_1", "data_product_2", "data_product_3"]:
+        create_data_product(name)
+
+    with pytest.raises(HTTPException) as error:
+        read_events(last_event_id=1)
+
+    assert error.value.status_code == status.HTTP_410_GONE
+    assert not event_broker.subscriptions
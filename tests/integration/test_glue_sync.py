@@ -0,0 +1,151 @@
+import boto3
+import pytest
+from moto import mock_glue
+from sqlalchemy.orm import Session
+
+from daap_api.config import settings
+from daap_api.models.orm.metadata_repositories import (
+    DataProductRepository,
+    WatermarkRepository,
+)
+from daap_api.services.glue_sync import GLUE_WATERMARK, GlueSync, SyncFailed
+from daap_api.services.versioning_service import VersioningService
+
+schema = {
+    "tableDescription": "abcd",
+    "columns": [
+        {"name": "id", "type": "bigint", "description": "identifier"},
+        {"name": "amount", "type": "decimal(10,2)", "description": ""},
+    ],
+}
+
+
+@pytest.fixture
+def glue(monkeypatch):
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    with mock_glue():
+        yield boto3.client("glue", region_name="eu-west-2")
+
+
+@pytest.fixture
+def glue_sync(engine, glue):
+    return GlueSync(
+        session_factory=lambda: Session(engine),
+        client_factory=lambda: glue,
+        concurrency=4,
+        page_size=2,
+        interval=60,
+        max_attempts=3,
+        retry_backoff=0,
+    )
+
+
+def tables(glue, database_name):
+    return {
+        table["Name"]: table
+        for table in glue.get_tables(DatabaseName=database_name)["TableList"]
+    }
+
+
+def test_first_sync_pushes_every_table(client, create_data_product, glue, glue_sync):
+    create_data_product("data_product_1")
+    create_data_product("data_product_2")
+    client.post("/v1/schemas/dp:data_product_1:table_1", json=schema)
+    client.post("/v1/schemas/dp:data_product_1:table_2", json=schema)
+    client.post("/v1/schemas/dp:data_product_2:table_1", json=schema)
+
+    assert glue_sync.sync() == 3
+
+    table = tables(glue, "data_product_1")["table_1"]
+    assert table["Description"] == "abcd"
+    assert table["StorageDescriptor"]["Columns"] == [
+        {"Name": "id", "Type": "bigint", "Comment": "identifier"},
+        {"Name": "amount", "Type": "decimal(10,2)", "Comment": ""},
+    ]
+    assert table["StorageDescriptor"]["Location"] == (
+        f"s3://{settings.data_bucket_name}/curated/data_product_1/table_1/"
+    )
+    assert set(tables(glue, "data_product_2")) == {"table_1"}
+    # Nothing has changed since
+    assert glue_sync.sync() == 0
+
+
+def test_only_changed_tables_are_pushed(client, create_data_product, glue, glue_sync):
+    create_data_product("data_product_1")
+    client.post("/v1/schemas/dp:data_product_1:table_1", json=schema)
+    client.post("/v1/schemas/dp:data_product_1:table_2", json=schema)
+    glue_sync.sync()
+
+    client.put(
+        "/v1/schemas/dp:data_product_1:table_2",
+        json={**schema, "tableDescription": "efgh"},
+    )
+    client.post("/v1/schemas/dp:data_product_1:table_3", json=schema)
+
+    assert glue_sync.sync() == 2
+    assert glue_sync.cache.conversions == 4
+    assert tables(glue, "data_product_1")["table_2"]["Description"] == "efgh"
+    assert set(tables(glue, "data_product_1")) == {"table_1", "table_2", "table_3"}
+
+
+def test_removed_tables_are_deleted(
+    client, create_data_product, session, glue, glue_sync
+):
+    create_data_product("data_product_1")
+    client.post("/v1/schemas/dp:data_product_1:table_1", json=schema)
+    client.post("/v1/schemas/dp:data_product_1:table_2", json=schema)
+    glue_sync.sync()
+
+    DataProductRepository(session).update_latest(
+        "data_product_1",
+        lambda current: VersioningService(current).remove_schemas("table_2"),
+    )
+
+    assert glue_sync.sync() == 1
+    assert set(tables(glue, "data_product_1")) == {"table_1"}
+
+
+def test_unchanged_tables_are_not_converted_again(
+    client, create_data_product, glue_sync, engine
+):
+    create_data_product("data_product_1")
+    client.post("/v1/schemas/dp:data_product_1:table_1", json=schema)
+    glue_sync.sync()
+
+    # A failed sync that has to be repeated pushes the same tables again
+    with Session(engine) as session:
+        WatermarkRepository(session).lock(GLUE_WATERMARK).seq = 0
+        session.commit()
+    glue_sync.sync()
+
+    assert glue_sync.cache.conversions == 1
+
+
+def test_watermark_is_not_advanced_if_a_push_fails(
+    client, create_data_product, glue_sync, monkeypatch
+):
+    create_data_product("data_product_1")
+    glue_sync.sync()
+    client.post("/v1/schemas/dp:data_product_1:table_1", json=schema)
+
+    def fail(*args, **kwargs):
+        raise RuntimeError("Glue is down")
+
+    monkeypatch.setattr(glue_sync, "_put_table", fail)
+    with pytest.raises(SyncFailed):
+        glue_sync.sync()
+    monkeypatch.undo()
+
+    assert glue_sync.sync() == 1
+
+
+def test_only_one_sync_runs_at_once(client, create_data_product, glue_sync, engine):
+    create_data_product("data_product_1")
+    glue_sync.sync()
+    client.post("/v1/schemas/dp:data_product_1:table_1", json=schema)
+
+    with Session(engine) as session:
+        WatermarkRepository(session).lock(GLUE_WATERMARK)
+
+        assert glue_sync.sync() == 0
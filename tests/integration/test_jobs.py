@@ -0,0 +1,133 @@
+import asyncio
+
+import pytest
+from fastapi import status
+from sqlalchemy.orm import Session
+from structlog.testing import capture_logs
+
+from daap_api.models.orm.metadata_orm_models import JobStatus, JobTable
+from daap_api.models.orm.metadata_repositories import (
+    VERSION_CREATED_JOB,
+    JobRepository,
+)
+from daap_api.services.change_notifications import notify_version_created
+from daap_api.services.job_queue import JobWorkerPool
+
+
+@pytest.fixture
+def workers(engine):
+    return JobWorkerPool(
+        session_factory=lambda: Session(engine),
+        concurrency=4,
+        batch_size=10,
+        poll_interval=0.05,
+        max_attempts=2,
+        retry_backoff=0,
+        max_retry_backoff=0,
+        lease=60,
+    )
+
+
+def enqueue(session, count, kind="example"):
+    repo = JobRepository(session)
+    for n in range(count):
+        repo.enqueue(kind, {"n": n})
+    session.commit()
+
+
+def test_version_created_notifies_schema_changes(
+    client, create_data_product, session, workers
+):
+    create_data_product("hmpps_use_of_force")
+    schema = {
+        "tableDescription": "abcd",
+        "columns": [{"name": "id", "type": "bigint", "description": ""}],
+    }
+    client.post("/v1/schemas/dp:hmpps_use_of_force:statement", json=schema)
+    client.put(
+        "/v1/schemas/dp:hmpps_use_of_force:statement",
+        json={**schema, "columns": [{"name": "id", "type": "int", "description": ""}]},
+    )
+    workers.register(VERSION_CREATED_JOB, notify_version_created)
+
+    with capture_logs() as logs:
+        assert asyncio.run(workers.run_once()) == 3
+
+    notifications = [log["event"] for log in logs if log["log_level"] == "info"]
+    assert len(notifications) == 3
+    assert "'version': 'v2.0', 'previousVersion': 'v1.0'" in notifications[2]
+    assert "'types_changed': ['id']" in notifications[2]
+    assert session.query(JobTable).count() == 0
+    assert workers.metrics[VERSION_CREATED_JOB].completed == 3
+
+
+def test_jobs_are_handled_in_batches(session, workers):
+    enqueue(session, 15)
+    batches = []
+    workers.register("example", lambda session, payloads: batches.append(payloads))
+
+    asyncio.run(workers.run_once())
+    asyncio.run(workers.run_once())
+
+    assert batches == [
+        [{"n": n} for n in range(10)],
+        [{"n": n} for n in range(10, 15)],
+    ]
+
+
+def test_failed_jobs_are_retried_then_given_up_on(session, workers):
+    enqueue(session, 1)
+    attempts = []
+
+    def handler(session, payloads):
+        attempts.append(payloads)
+        raise ValueError("Consumer unavailable")
+
+    workers.register("example", handler)
+
+    for _ in range(3):
+        asyncio.run(workers.run_once())
+
+    assert len(attempts) == 2
+    job = session.query(JobTable).one()
+    assert job.status == JobStatus.failed
+    assert job.last_error == "ValueError('Consumer unavailable')"
+    assert workers.metrics["example"].retried == 1
+
+
+def test_concurrent_workers_run_each_job_once(session, workers):
+    enqueue(session, 100)
+    handled = []
+    workers.register(
+        "example", lambda session, payloads: handled.extend(p["n"] for p in payloads)
+    )
+
+    async def drain():
+        workers.start()
+        for _ in range(100):
+            if len(handled) == 100:
+                break
+            await asyncio.sleep(0.05)
+        await workers.stop()
+
+    asyncio.run(drain())
+
+    assert sorted(handled) == list(range(100))
+    assert session.query(JobTable).count() == 0
+
+
+def test_job_stats(client, create_data_product, session, workers, monkeypatch):
+    enqueue(session, 2, kind="other")
+    create_data_product("hmpps_use_of_force")
+    workers.register("other", lambda session, payloads: None)
+    asyncio.run(workers.run_once())
+    monkeypatch.setattr("daap_api.routers.jobs_router.job_workers", workers)
+
+    response = client.get("/v1/jobs/stats")
+
+    assert response.status_code == status.HTTP_200_OK
+    stats = response.json()
+    assert (stats["ready"], stats["waiting"], stats["failed"]) == (1, 0, 0)
+    assert stats["byKind"][VERSION_CREATED_JOB]["ready"] == 1
+    assert stats["byKind"]["other"]["completed"] == 2
+    assert stats["byKind"]["other"]["latencyP50Seconds"] >= 0
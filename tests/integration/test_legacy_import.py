@@ -0,0 +1,163 @@
+import json
+
+import pytest
+from sqlalchemy.orm import Session
+
+from daap_api.models.orm.metadata_repositories import DataProductRepository
+from daap_api.services.legacy_import import Checkpoint, LegacyImporter
+
+BUCKET = "legacy-metadata"
+
+
+schema = {
+    "$schema": "https://example.com/schema.json",
+    "tableDescription": "abcd",
+    "columns": [{"name": "id", "type": "bigint", "description": "identifier"}],
+}
+
+
+@pytest.fixture
+def s3(s3):
+    s3.create_bucket(
+        Bucket=BUCKET, CreateBucketConfiguration={"LocationConstraint": "eu-west-2"}
+    )
+    return s3
+
+
+@pytest.fixture
+def metadata(data_product_metadata):
+    """
+    The content of a data product's metadata.json in the legacy store
+    """
+
+    def make_metadata(name, description=data_product_metadata["description"]):
+        return {**data_product_metadata, "name": name, "description": description}
+
+    return make_metadata
+
+
+@pytest.fixture
+def importer(engine, s3, tmp_path):
+    def make_importer():
+        return LegacyImporter(
+            session_factory=lambda: Session(engine),
+            client=s3,
+            bucket=BUCKET,
+            checkpoint=Checkpoint(str(tmp_path / "checkpoint.json")),
+            concurrency=4,
+            batch_size=2,
+        )
+
+    return make_importer
+
+
+def put(s3, key, document):
+    s3.put_object(Bucket=BUCKET, Key=key, Body=json.dumps(document).encode())
+
+
+def test_imports_every_version(s3, importer, session, metadata):
+    put(
+        s3,
+        "data_product_1/v1.0/metadata.json",
+        {**metadata("data_product_1"), "version": "v1.0"},
+    )
+    put(s3, "data_product_1/v1.0/table_1/schema.json", schema)
+    put(s3, "data_product_1/v1.1/metadata.json", metadata("data_product_1", "updated"))
+    put(s3, "data_product_1/v1.1/table_1/schema.json", schema)
+    put(s3, "data_product_1/v1.1/table_2/schema.json", schema)
+    put(s3, "data_product_2/v1.0/metadata.json", metadata("data_product_2"))
+    put(s3, "data_product_3/v1.0/metadata.json", metadata("data_product_3"))
+    put(s3, "README.txt", {})
+
+    report = importer().run()
+
+    assert report.imported == 3
+    assert report.objects == 7
+    assert report.failed == {}
+
+    repository = DataProductRepository(session)
+    current = repository.fetch_latest("data_product_1")
+    assert current.version == "v1.1"
+    assert current.description == "updated"
+    assert sorted(schema.name for schema in current.schemas) == ["table_1", "table_2"]
+    first = repository.fetch_many([("data_product_1", "v1.0")])[
+        ("data_product_1", "v1.0")
+    ]
+    assert [schema.name for schema in first.schemas] == ["table_1"]
+    assert set(repository.fetch_latest_many(["data_product_2", "data_product_3"])) == {
+        "data_product_2",
+        "data_product_3",
+    }
+
+
+def test_read_models_are_saved(s3, importer, client, metadata):
+    put(s3, "data_product_1/v1.0/metadata.json", metadata("data_product_1"))
+    put(s3, "data_product_1/v1.0/table_1/schema.json", schema)
+
+    importer().run()
+
+    response = client.get("/v1/schemas/dp:data_product_1:table_1")
+    assert response.status_code == 200
+    assert response.json()["tableDescription"] == "abcd"
+
+
+def test_invalid_data_products_are_skipped(s3, importer, session, metadata):
+    put(s3, "data_product_1/v1.0/metadata.json", metadata("data_product_1"))
+    put(s3, "data_product_2/v1.0/metadata.json", {"name": "data_product_2"})
+    put(s3, "data_product_3/v1.0/table_1/schema.json", schema)
+
+    report = importer().run()
+
+    assert report.imported == 1
+    assert set(report.failed) == {"data_product_2", "data_product_3"}
+    assert "dataProductOwner" in report.failed["data_product_2"]
+    assert DataProductRepository(session).existing_names(
+        ["data_product_1", "data_product_2", "data_product_3"]
+    ) == {"data_product_1"}
+
+
+def test_resumes_from_checkpoint(s3, importer, session, monkeypatch, metadata):
+    for n in range(1, 4):
+        put(s3, f"data_product_{n}/v1.0/metadata.json", metadata(f"data_product_{n}"))
+
+    # Interrupted while writing the second batch
+    import_many = DataProductRepository.import_many
+    calls = []
+
+    def interrupted_import_many(self, data_products):
+        calls.append([versions[-1].name for versions in data_products])
+        if len(calls) == 2:
+            raise KeyboardInterrupt
+        import_many(self, data_products)
+
+    monkeypatch.setattr(DataProductRepository, "import_many", interrupted_import_many)
+    with pytest.raises(KeyboardInterrupt):
+        importer().run()
+
+    fetched = []
+    monkeypatch.setattr(
+        LegacyImporter,
+        "fetch",
+        lambda self, key: fetched.append(key) or metadata(key.split("/")[0]),
+    )
+    report = importer().run()
+
+    assert report.imported == 1
+    assert report.skipped == 2
+    assert fetched == ["data_product_3/v1.0/metadata.json"]
+    assert calls == [
+        ["data_product_1", "data_product_2"],
+        ["data_product_3"],
+        ["data_product_3"],
+    ]
+
+
+def test_existing_data_products_are_skipped(s3, importer, engine, tmp_path, metadata):
+    put(s3, "data_product_1/v1.0/metadata.json", metadata("data_product_1"))
+    importer().run()
+    (tmp_path / "checkpoint.json").unlink()
+
+    report = importer().run()
+
+    assert report.imported == 0
+    assert report.skipped == 1
@@ -395,3 +395,145 @@ def test_idempotent_request(client):
     )
 
     assert response.headers["idempotent-replayed"] == "true"
+
+
+def test_read_data_product_with_expanded_schemas(client, schema):
+    response = client.get(
+        "/v1/data-products/dp:hmpps_use_of_force", params={"expand": "schemas"}
+    )
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["schemas"] == [
+        {
+            "id": "dp:hmpps_use_of_force:v1.0:statement",
+            "tableDescription": "desc",
+            "columns": schema.columns,
+        }
+    ]
+
+
+def test_list_data_products_with_expanded_schemas(client, schema):
+    response = client.get("/v1/data-products", params={"expand": "schemas"})
+
+    assert response.status_code == status.HTTP_200_OK
+    assert [dp["schemas"] for dp in response.json()] == [
+        [
+            {
+                "id": "dp:hmpps_use_of_force:v1.0:statement",
+                "tableDescription": "desc",
+                "columns": schema.columns,
+            }
+        ]
+    ]
+
+
+def test_invalid_expand(client, data_product_current_version):
+    response = client.get(
+        "/v1/data-products/dp:hmpps_use_of_force", params={"expand": "columns"}
+    )
+
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
+def test_list_data_products_with_sparse_fields(client, data_product_current_version):
+    response = client.get(
+        "/v1/data-products", params={"fields": "id,name,version,status"}
+    )
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == [
+        {
+            "id": "dp:hmpps_use_of_force",
+            "name": "hmpps_use_of_force",
+            "version": "v1.0",
+            "status": "draft",
+        }
+    ]
+
+
+def test_list_data_products_with_sparse_fields_and_schemas(client, schema):
+    response = client.get(
+        "/v1/data-products", params={"fields": "name,schemas", "expand": "schemas"}
+    )
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == [
+        {
+            "name": "hmpps_use_of_force",
+            "schemas": [
+                {
+                    "id": "dp:hmpps_use_of_force:v1.0:statement",
+                    "tableDescription": "desc",
+                    "columns": schema.columns,
+                }
+            ],
+        }
+    ]
+
+
+def test_list_data_products_with_invalid_fields(client):
+    response = client.get("/v1/data-products", params={"fields": "id,colour"})
+
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert response.json() == {"detail": "Invalid fields: colour"}
+
+
+def test_conditional_update_data_product(client, data_product_current_version):
+    update = {
+        "description": "Updated description",
+        "domain": "HMPPS",
+        "dataProductOwner": "dataplatformlabs@digital.justice.gov.uk",
+        "dataProductOwnerDisplayName": "Data Platform Labs",
+        "email": "dataplatformlabs@digital.justice.gov.uk",
+        "status": "draft",
+        "retentionPeriod": 3000,
+        "dpiaRequired": False,
+    }
+
+    response = client.put(
+        "/v1/data-products/dp:hmpps_use_of_force",
+        json=update,
+        headers={"If-Match": '"v1.0"'},
+    )
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["ETag"] == '"v1.1"'
+
+    response = client.put(
+        "/v1/data-products/dp:hmpps_use_of_force",
+        json={**update, "description": "Overwritten description"},
+        headers={"If-Match": '"v1.0"'},
+    )
+
+    assert response.status_code == status.HTTP_412_PRECONDITION_FAILED
+    assert response.json() == {
+        "detail": "dp:hmpps_use_of_force has been updated since the version you requested. The current version is v1.1"
+    }
+
+
+def test_conditional_update_schema(client, schema):
+    response = client.put(
+        "/v1/schemas/dp:hmpps_use_of_force:statement",
+        json={
+            "tableDescription": "abcd",
+            "columns": [{"name": "id", "type": "bigint", "description": ""}],
+        },
+        headers={"If-Match": '"v1.1", "v1.2"'},
+    )
+
+    assert response.status_code == status.HTTP_412_PRECONDITION_FAILED
+
+
+def test_update_missing_schema(client, data_product_current_version):
+    response = client.put(
+        "/v1/schemas/dp:hmpps_use_of_force:statement",
+        json={
+            "tableDescription": "abcd",
+            "columns": [{"name": "id", "type": "bigint", "description": ""}],
+        },
+    )
+
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+    assert response.json() == {
+        "detail": "id dp:hmpps_use_of_force:statement references a data product version that does not exist"
+    }
@@ -0,0 +1,164 @@
+"""
+Query plan regression tests.
+
+Each repository query is run against a database seeded with enough rows that
+the planner prefers an index where one is usable, and the plan of every SELECT
+it sends is checked for sequential scans of the large tables.
+"""
+from typing import Callable
+
+import pytest
+from sqlalchemy import StaticPool, event, text
+from sqlalchemy.orm import Session
+
+from daap_api.config import settings
+from daap_api.db import Base, create_database_engine
+from daap_api.models.orm.metadata_repositories import (
+    DataProductRepository,
+    JobRepository,
+    ReadModelRepository,
+    SchemaRepository,
+)
+
+# Tables that grow with the catalogue, and must not be scanned in full
+LARGE_TABLES = {
+    "data_products",
+    "data_product_versions",
+    "schemas",
+    "read_models",
+    "jobs",
+}
+
+DATA_PRODUCTS = 2000
+SCHEMAS_PER_DATA_PRODUCT = 3
+
+
+SEED = """
+INSERT INTO data_product_versions (
+    name, version, description, domain, data_product_owner,
+    data_product_owner_display_name, status, email, retention_period,
+    dpia_required, tags
+)
+SELECT
+    'data_product_' || n, version, '', 'HMPPS', 'owner@justice.gov.uk',
+    'Owner', 'draft', 'owner@justice.gov.uk', 365, false, '{}'
+FROM generate_series(1, :data_products) AS n,
+    unnest(ARRAY['v1.0', 'v1.1']) AS version;
+
+INSERT INTO data_products (name, current_version_id)
+SELECT name, id FROM data_product_versions WHERE version = 'v1.1';
+
+INSERT INTO schemas (data_product_id, name, table_description, columns)
+SELECT data_product_versions.id, 'table_' || n, '', '[]'
+FROM data_product_versions, generate_series(1, :schemas) AS n;
+
+INSERT INTO read_models (id, data_product_name, document)
+SELECT 'dp:' || name, name, '{}' FROM data_products;
+
+INSERT INTO jobs (kind, key, payload, status, attempts, run_after)
+SELECT 'deliver_notifications', 'https://example.com/' || n, '{}', 'pending', 0,
+    now() + interval '1 minute'
+FROM generate_series(1, :data_products) AS n;
+
+ANALYZE;
+"""
+
+
+@pytest.fixture(scope="module")
+def engine():
+    engine = create_database_engine(settings.database_url_test, poolclass=StaticPool)
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    with engine.begin() as connection:
+        for statement in SEED.split(";"):
+            if statement.strip():
+                connection.execute(
+                    text(statement),
+                    {
+                        "data_products": DATA_PRODUCTS,
+                        "schemas": SCHEMAS_PER_DATA_PRODUCT,
+                    },
+                )
+    yield engine
+    Base.metadata.drop_all(engine)
+
+
+def explain(engine, query: Callable[[Session], object]) -> list[dict]:
+    """
+    Run a repository query, and return the plans of the SELECTs it sent
+    """
+    statements = []
+
+    def capture(connection, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            statements.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        with Session(engine) as session:
+            query(session)
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+
+    with engine.connect() as connection:
+        return [
+            connection.exec_driver_sql(
+                f"EXPLAIN (FORMAT JSON) {statement}", parameters
+            ).scalar()[0]["Plan"]
+            for statement, parameters in statements
+        ]
+
+
+def sequential_scans(plan: dict) -> list[str]:
+    scans = []
+    if plan["Node Type"] == "Seq Scan" and plan["Relation Name"] in LARGE_TABLES:
+        scans.append(plan["Relation Name"])
+    for subplan in plan.get("Plans", []):
+        scans.extend(sequential_scans(subplan))
+    return scans
+
+
+# DataProductRepository.list and stats are left out: list reads the whole
+# catalogue by design, and stats reads the materialised view. Autocomplete is
+# also left out, as whether the trigram indexes are used depends on pg_trgm's
+# similarity estimates for the particular query rather than on our indexes.
+QUERIES = {
+    "DataProductRepository.fetch": lambda session: DataProductRepository(session).fetch(
+        "data_product_1000", "v1.0"
+    ),
+    "DataProductRepository.fetch_latest": lambda session: DataProductRepository(
+        session
+    ).fetch_latest("data_product_1000"),
+    "DataProductRepository.fetch_latest with schemas": lambda session: (
+        DataProductRepository(session).fetch_latest(
+            "data_product_1000", load_schemas=True
+        )
+    ),
+    "DataProductRepository.lock_latest": lambda session: DataProductRepository(
+        session
+    ).lock_latest("data_product_1000"),
+    "DataProductRepository.fetch_latest_many": lambda session: DataProductRepository(
+        session
+    ).fetch_latest_many(["data_product_1", "data_product_2"]),
+    "SchemaRepository.fetch_latest": lambda session: SchemaRepository(
+        session
+    ).fetch_latest("data_product_1000", "table_1"),
+    "SchemaRepository.fetch_latest_many": lambda session: SchemaRepository(
+        session
+    ).fetch_latest_many([("data_product_1", "table_1"), ("data_product_2", "table_2")]),
+    "ReadModelRepository.fetch": lambda session: ReadModelRepository(session).fetch(
+        "dp:data_product_1000"
+    ),
+    "JobRepository.fetch_waiting": lambda session: JobRepository(session).fetch_waiting(
+        "deliver_notifications", "https://example.com/1000"
+    ),
+}
+
+
+@pytest.mark.parametrize("query", QUERIES.values(), ids=QUERIES.keys())
+def test_query_does_not_scan_large_tables(engine, query):
+    plans = explain(engine, query)
+
+    assert plans
+    for plan in plans:
+        assert sequential_scans(plan) == [], plan
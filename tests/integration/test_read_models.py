@@ -0,0 +1,63 @@
+from fastapi import status
+
+from daap_api.models.orm.metadata_orm_models import ReadModelTable
+
+COLUMNS = [{"name": "id", "type": "bigint", "description": ""}]
+
+
+def test_documents_are_written_with_each_version(
+    client, session, data_product_metadata, create_data_product, update_data_product
+):
+    create_data_product()
+    client.post(
+        "/v1/schemas/dp:hmpps_use_of_force:statement",
+        json={"tableDescription": "statement desc", "columns": COLUMNS},
+    )
+    update_data_product(description="Updated description")
+    update_data_product(description="Updated again")
+
+    documents = {
+        read_model.id: read_model.document
+        for read_model in session.query(ReadModelTable)
+    }
+    assert sorted(documents) == [
+        "dp:hmpps_use_of_force",
+        "dp:hmpps_use_of_force:statement",
+    ]
+
+    response = client.get("/v1/data-products/dp:hmpps_use_of_force")
+    assert response.status_code == status.HTTP_200_OK
+    assert response.content == documents["dp:hmpps_use_of_force"]
+    assert response.json() == data_product_metadata | {
+        "name": "hmpps_use_of_force",
+        "description": "Updated again",
+        "id": "dp:hmpps_use_of_force",
+        "version": "v1.2",
+        "tags": {},
+        "schemas": [{"id": "dp:hmpps_use_of_force:v1.2:statement"}],
+    }
+
+    response = client.get("/v1/schemas/dp:hmpps_use_of_force:statement")
+    assert response.status_code == status.HTTP_200_OK
+    assert response.content == documents["dp:hmpps_use_of_force:statement"]
+    assert response.json() == {
+        "id": "dp:hmpps_use_of_force:v1.2:statement",
+        "tableDescription": "statement desc",
+        "columns": COLUMNS,
+    }
+
+
+def test_schema_documents_follow_major_versions(client, session, create_data_product):
+    create_data_product()
+    client.post(
+        "/v1/schemas/dp:hmpps_use_of_force:statement",
+        json={"tableDescription": "statement desc", "columns": COLUMNS},
+    )
+    client.put(
+        "/v1/schemas/dp:hmpps_use_of_force:statement",
+        json={"tableDescription": "statement desc", "columns": []},
+    )
+
+    response = client.get("/v1/schemas/dp:hmpps_use_of_force:statement")
+
+    assert response.json()["id"] == "dp:hmpps_use_of_force:v2.0:statement"
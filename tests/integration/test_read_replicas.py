@@ -0,0 +1,74 @@
+import pytest
+from fastapi import status
+from fastapi.testclient import TestClient
+from sqlalchemy import StaticPool, create_engine
+
+from daap_api import db
+from daap_api.config import settings
+from daap_api.db import CONSISTENCY_TOKEN_HEADER, Base, SessionRouter, get_session
+from daap_api.main import app
+
+
+@pytest.fixture
+def replica_engine():
+    engine = create_engine(settings.database_url_test_replica, poolclass=StaticPool)
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    yield engine
+    Base.metadata.drop_all(engine)
+
+
+@pytest.fixture
+def session_router(session, replica_engine, monkeypatch):
+    """
+    Route reads to a separate, unreplicated database, so that reads
+    which go to the replica can be told apart from reads from the primary
+    """
+    router = SessionRouter(session.get_bind(), [replica_engine], wait_timeout=0.05)
+    monkeypatch.setattr(db, "session_router", router)
+    return router
+
+
+@pytest.fixture
+def replica_client(session, session_router):
+    app.dependency_overrides[get_session] = lambda: session
+    yield TestClient(app)
+    app.dependency_overrides.clear()
+
+
+@pytest.fixture
+def consistency_token(replica_client, data_product_metadata):
+    response = replica_client.post(
+        "/v1/data-products/",
+        json={**data_product_metadata, "name": "hmpps_use_of_force"},
+    )
+    assert response.status_code == status.HTTP_200_OK
+    return response.headers[CONSISTENCY_TOKEN_HEADER]
+
+
+def test_reads_go_to_replica(replica_client, consistency_token):
+    response = replica_client.get("/v1/data-products/dp:hmpps_use_of_force")
+
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+def test_consistent_reads_wait_for_replica(
+    replica_client, session_router, consistency_token, monkeypatch
+):
+    monkeypatch.setattr(session_router, "has_replayed", lambda engine, token: False)
+
+    response = replica_client.get(
+        "/v1/data-products/dp:hmpps_use_of_force",
+        headers={CONSISTENCY_TOKEN_HEADER: consistency_token},
+    )
+
+    assert response.status_code == status.HTTP_200_OK
+
+
+def test_invalid_consistency_token(replica_client):
+    response = replica_client.get(
+        "/v1/data-products/dp:hmpps_use_of_force",
+        headers={CONSISTENCY_TOKEN_HEADER: "latest"},
+    )
+
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
@@ -0,0 +1,89 @@
+import io
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from daap_api.config import settings
+from daap_api.services.schema_inference import schema_inference
+
+
+@pytest.fixture
+def s3(s3, monkeypatch):
+    monkeypatch.setattr(schema_inference, "_client", s3)
+    return s3
+
+
+def put_parquet(s3, bucket, key, table: pa.Table):
+    buffer = io.BytesIO()
+    pq.write_table(table, buffer)
+    s3.put_object(Bucket=bucket, Key=key, Body=buffer.getvalue())
+
+
+statement = pa.table(
+    {
+        "id": pa.array([1, 2], pa.int64()),
+        "amount": pa.array([None, None], pa.decimal128(10, 2)),
+        "created_at": pa.array([None, None], pa.timestamp("ms")),
+    }
+)
+expected_columns = [
+    {"name": "id", "type": "bigint", "description": ""},
+    {"name": "amount", "type": "decimal(10,2)", "description": ""},
+    {"name": "created_at", "type": "timestamp", "description": ""},
+]
+
+
+def test_infer_and_register_schema_from_upload(client, s3, create_data_product):
+    key = "data_product_1/table_1/abc/statement.parquet"
+    put_parquet(s3, settings.landing_zone_bucket_name, key, statement)
+
+    response = client.post("/v1/schemas/infer", json={"uploadKey": key})
+    assert response.status_code == 200
+    schema = response.json()
+    assert schema["columns"] == expected_columns
+
+    create_data_product("data_product_1")
+    response = client.post(
+        "/v1/schemas/dp:data_product_1:table_1",
+        json={**schema, "tableDescription": "statements"},
+    )
+    assert response.status_code == 200
+
+
+def test_infer_schema_from_location(client, s3):
+    put_parquet(s3, settings.data_bucket_name, "curated/statement.parquet", statement)
+
+    response = client.post(
+        "/v1/schemas/infer",
+        json={
+            "location": f"s3://{settings.data_bucket_name}/curated/statement.parquet"
+        },
+    )
+    assert response.status_code == 200
+    assert response.json()["columns"] == expected_columns
+
+
+def test_infer_schema_errors(client, s3):
+    put_parquet(
+        s3,
+        settings.landing_zone_bucket_name,
+        "nested.parquet",
+        pa.table({"tags": [["a"]]}),
+    )
+    put_parquet(
+        s3,
+        settings.landing_zone_bucket_name,
+        "invalid_name.parquet",
+        pa.table({"column name": [1]}),
+    )
+
+    def infer(**file):
+        return client.post("/v1/schemas/infer", json=file).status_code
+
+    assert infer(uploadKey="missing.parquet") == 404
+    assert infer(location="s3://another-bucket/statement.parquet") == 400
+    assert infer(uploadKey="nested.parquet") == 422
+    assert infer(uploadKey="invalid_name.parquet") == 422
+    assert infer() == 422
+    assert infer(uploadKey="a", location="s3://b/c") == 422
@@ -0,0 +1,73 @@
+import pytest
+from fastapi import status
+from sqlalchemy.orm import Session
+
+from daap_api.services.stats_refresh import StatsRefresher
+
+
+@pytest.fixture
+def refresher(engine):
+    return StatsRefresher(session_factory=lambda: Session(engine), interval=3600)
+
+
+def test_stats_when_empty(client):
+    response = client.get("/v1/stats")
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == {
+        "dataProducts": 0,
+        "tables": 0,
+        "columns": 0,
+        "dpiaRequired": 0,
+        "byDomain": {},
+        "byStatus": {},
+    }
+
+
+def test_stats_are_refreshed_after_writes(client, refresher, create_data_product):
+    for name, domain, dpia_required in [
+        ("hmpps_use_of_force", "HMPPS", False),
+        ("hmpps_prisons", "HMPPS", True),
+        ("court_data", "HMCTS", False),
+    ]:
+        create_data_product(name, domain=domain, dpiaRequired=dpia_required)
+    client.post(
+        "/v1/schemas/dp:hmpps_use_of_force:statement",
+        json={
+            "tableDescription": "statement desc",
+            "columns": [
+                {"name": "id", "type": "bigint", "description": ""},
+                {"name": "name", "type": "string", "description": ""},
+            ],
+        },
+    )
+    assert client.get("/v1/stats").json()["dataProducts"] == 0
+
+    assert refresher.refresh()
+    response = client.get("/v1/stats")
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == {
+        "dataProducts": 3,
+        "tables": 1,
+        "columns": 2,
+        "dpiaRequired": 1,
+        "byDomain": {
+            "HMPPS": {"dataProducts": 2, "tables": 1, "columns": 2},
+            "HMCTS": {"dataProducts": 1, "tables": 0, "columns": 0},
+        },
+        "byStatus": {
+            "draft": {"dataProducts": 3, "tables": 1, "columns": 2},
+        },
+    }
+
+
+def test_stats_are_only_refreshed_after_changes(client, refresher, create_data_product):
+    assert refresher.refresh()
+    assert not refresher.refresh()
+
+    create_data_product()
+
+    assert refresher.refresh()
+    assert not refresher.refresh()
+    assert client.get("/v1/stats").json()["dataProducts"] == 1
@@ -0,0 +1,248 @@
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from fastapi import status
+from sqlalchemy.orm import Session
+
+from daap_api.config import settings
+from daap_api.models.orm.metadata_orm_models import JobTable
+from daap_api.models.orm.metadata_repositories import VERSION_CREATED_JOB
+from daap_api.services.change_notifications import (
+    DELIVER_NOTIFICATIONS_JOB,
+    NotificationDispatcher,
+    notify_version_created,
+)
+from daap_api.services.job_queue import JobWorkerPool
+
+
+class Receiver:
+    """
+    Stand-in for a subscriber, recording the notifications POSTed to it
+    """
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.failing_paths = set()
+        self.requests = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+
+        receiver = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                with receiver.lock:
+                    receiver.in_flight += 1
+                    receiver.max_in_flight = max(
+                        receiver.max_in_flight, receiver.in_flight
+                    )
+                time.sleep(receiver.delay)
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                with receiver.lock:
+                    receiver.in_flight -= 1
+                    receiver.requests.append((self.path, body))
+
+                failing = self.path in receiver.failing_paths
+                self.send_response(503 if failing else 204)
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def receiver():
+    receiver = Receiver()
+    yield receiver
+    receiver.close()
+
+
+@pytest.fixture
+def workers(engine, monkeypatch):
+    # Deliveries become ready immediately, and so are claimed in the same batch
+    # as any others queued before the worker runs
+    monkeypatch.setattr(settings, "notification_window_seconds", 0.2)
+    # Receivers are local, so not public
+    monkeypatch.setattr(settings, "notification_allowed_hosts", ["127.0.0.1"])
+    workers = JobWorkerPool(
+        session_factory=lambda: Session(engine),
+        concurrency=1,
+        batch_size=50,
+        poll_interval=0.05,
+        max_attempts=2,
+        retry_backoff=0,
+        max_retry_backoff=0,
+        lease=60,
+    )
+    workers.register(VERSION_CREATED_JOB, notify_version_created)
+    workers.register(
+        DELIVER_NOTIFICATIONS_JOB,
+        NotificationDispatcher(max_concurrency=2, timeout=5).dispatch,
+    )
+    return workers
+
+
+def run_jobs(workers, wait=0.25):
+    asyncio.run(workers.run_once())
+    time.sleep(wait)
+    asyncio.run(workers.run_once())
+
+
+def subscribe(client, url, id="dp:hmpps_use_of_force"):
+    response = client.post(f"/v1/data-products/{id}/subscriptions", json={"url": url})
+    assert response.status_code == status.HTTP_200_OK
+    return response.json()
+
+
+def add_schema(client, table_name):
+    response = client.post(
+        f"/v1/schemas/dp:hmpps_use_of_force:{table_name}",
+        json={
+            "tableDescription": "abcd",
+            "columns": [{"name": "id", "type": "bigint", "description": ""}],
+        },
+    )
+    assert response.status_code == status.HTTP_200_OK
+
+
+def test_manage_subscriptions(client, create_data_product):
+    create_data_product()
+
+    subscription = subscribe(client, "https://example.com/notify")
+    assert subscribe(client, "https://example.com/notify") == subscription
+    assert subscription["dataProductId"] == "dp:hmpps_use_of_force"
+    assert subscription["url"] == "https://example.com/notify"
+
+    response = client.get("/v1/data-products/dp:hmpps_use_of_force/subscriptions")
+    assert response.json() == [subscription]
+
+    response = client.delete(f"/v1/subscriptions/{subscription['id']}")
+    assert response.status_code == status.HTTP_204_NO_CONTENT
+    response = client.get("/v1/data-products/dp:hmpps_use_of_force/subscriptions")
+    assert response.json() == []
+
+
+def test_cannot_subscribe_to_missing_data_product(client):
+    response = client.post(
+        "/v1/data-products/dp:missing/subscriptions",
+        json={"url": "https://example.com/notify"},
+    )
+
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+@pytest.mark.parametrize(
+    "url",
+    [
+        "http://example.com/notify",
+        "https://169.254.169.254/latest/meta-data",
+        "https://10.0.0.1/notify",
+        "https://[::1]/notify",
+        "https://localhost/notify",
+    ],
+)
+def test_cannot_subscribe_non_public_urls(client, create_data_product, url):
+    create_data_product()
+
+    response = client.post(
+        "/v1/data-products/dp:hmpps_use_of_force/subscriptions", json={"url": url}
+    )
+
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+    assert (
+        client.get("/v1/data-products/dp:hmpps_use_of_force/subscriptions").json() == []
+    )
+
+
+def test_changes_are_sent_to_subscribers_in_batches(
+    client, create_data_product, receiver, workers
+):
+    create_data_product()
+    subscribe(client, f"{receiver.url}/a")
+    subscribe(client, f"{receiver.url}/b")
+    add_schema(client, "statement")
+    add_schema(client, "incident")
+
+    run_jobs(workers)
+
+    assert sorted(path for path, _ in receiver.requests) == ["/a", "/b"]
+    for _, body in receiver.requests:
+        assert [
+            (notification["version"], notification["schemas"])
+            for notification in body["notifications"]
+        ] == [
+            # The data product was created before the schemas were added, but
+            # its notification is described from the database after both were
+            (
+                "v1.0",
+                {"statement": {"change": "created"}, "incident": {"change": "created"}},
+            ),
+            ("v1.0", {"statement": {"change": "created"}}),
+            ("v1.0", {"incident": {"change": "created"}}),
+        ]
+
+
+def test_duplicate_notifications_are_sent_once(
+    client, create_data_product, session, receiver, workers
+):
+    create_data_product()
+    subscribe(client, receiver.url)
+    add_schema(client, "statement")
+    # Jobs run at least once, so the same change may be described twice
+    job = session.query(JobTable).order_by(JobTable.id.desc()).first()
+    session.add(JobTable(kind=job.kind, payload=job.payload))
+    session.commit()
+
+    run_jobs(workers)
+
+    assert [len(body["notifications"]) for _, body in receiver.requests] == [1]
+
+
+def test_only_failed_deliveries_are_retried(
+    client, create_data_product, receiver, workers
+):
+    create_data_product()
+    subscribe(client, f"{receiver.url}/ok")
+    subscribe(client, f"{receiver.url}/down")
+    receiver.failing_paths.add("/down")
+    add_schema(client, "statement")
+
+    run_jobs(workers)
+    asyncio.run(workers.run_once())
+
+    assert sorted(path for path, _ in receiver.requests) == ["/down", "/down", "/ok"]
+    assert workers.metrics[DELIVER_NOTIFICATIONS_JOB].completed == 1
+    assert workers.metrics[DELIVER_NOTIFICATIONS_JOB].retried == 1
+
+
+def test_deliveries_are_sent_concurrently_up_to_a_limit(
+    client, create_data_product, session, workers
+):
+    slow_receiver = Receiver(delay=0.2)
+    create_data_product()
+    for n in range(6):
+        subscribe(client, f"{slow_receiver.url}/{n}")
+    add_schema(client, "statement")
+
+    started = time.monotonic()
+    run_jobs(workers, wait=0.25)
+    elapsed = time.monotonic() - started
+    slow_receiver.close()
+
+    assert len(slow_receiver.requests) == 6
+    assert slow_receiver.max_in_flight == 2
+    # Three rounds of two, rather than six one after another
+    assert elapsed < 0.25 + 6 * 0.2
@@ -0,0 +1,135 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy.orm import Session
+
+from daap_api.models.orm.metadata_repositories import TableStatsRepository
+from daap_api.services.stats_buffer import StatsBuffer, TableStats, stats_cache
+
+schema = {
+    "tableDescription": "abcd",
+    "columns": [{"name": "id", "type": "bigint", "description": "identifier"}],
+}
+
+
+@pytest.fixture
+def tables(client, create_data_product):
+    create_data_product("data_product_1")
+    client.post("/v1/schemas/dp:data_product_1:table_1", json=schema)
+    client.post("/v1/schemas/dp:data_product_1:table_2", json=schema)
+
+
+def report(client, *stats):
+    return client.post("/v1/table-stats", json={"stats": list(stats)})
+
+
+def test_stats_are_merged_into_responses(client, tables):
+    assert "stats" not in client.get("/v1/schemas/dp:data_product_1:table_1").json()
+    assert "stats" not in client.get("/v1/data-products/dp:data_product_1").json()
+
+    response = report(
+        client,
+        {
+            "id": "dp:data_product_1:table_1",
+            "rowCount": 100,
+            "lastUpdated": "2024-01-01T10:00:00Z",
+            "s3Location": "s3://bucket/data_product_1/table_1/",
+        },
+        {
+            "id": "dp:data_product_1:table_2",
+            "rowCount": 50,
+            "lastUpdated": "2024-01-02T10:00:00+01:00",
+        },
+    )
+    assert response.status_code == 202
+
+    table = client.get("/v1/schemas/dp:data_product_1:table_1").json()
+    assert table["stats"] == {
+        "rowCount": 100,
+        "lastUpdated": "2024-01-01T10:00:00",
+        "s3Location": "s3://bucket/data_product_1/table_1/",
+    }
+    assert table["columns"] == schema["columns"]
+
+    data_product = client.get("/v1/data-products/dp:data_product_1").json()
+    assert data_product["version"] == "v1.0"
+    assert data_product["stats"] == {
+        "rowCount": 150,
+        "lastUpdated": "2024-01-02T09:00:00",
+    }
+    expanded = client.get("/v1/data-products/dp:data_product_1?expand=schemas").json()
+    assert expanded["stats"] == data_product["stats"]
+
+
+def test_stats_are_not_loaded_for_missing_data_products(client, tables):
+    assert client.get("/v1/data-products/dp:missing").status_code == 404
+    assert client.get("/v1/schemas/dp:data_product_1:missing").status_code == 404
+    assert len(stats_cache) == 0
+
+
+def test_partial_and_stale_stats(client, session, tables):
+    table = "dp:data_product_1:table_1"
+    report(client, {"id": table, "rowCount": 100, "lastUpdated": "2024-01-02T00:00:00"})
+    report(client, {"id": table, "s3Location": "s3://bucket/table_1/"})
+    report(client, {"id": table, "rowCount": 10, "lastUpdated": "2024-01-01T00:00:00"})
+
+    stats = TableStatsRepository(session).fetch("data_product_1", "table_1")
+    assert stats.row_count == 100
+    assert stats.last_updated == datetime(2024, 1, 2)
+    assert stats.s3_location == "s3://bucket/table_1/"
+
+
+def test_stats_for_unknown_tables_are_rejected(client, session, tables):
+    response = report(
+        client,
+        {"id": "dp:data_product_1:table_1", "rowCount": 1},
+        {"id": "dp:data_product_1:table_3", "rowCount": 1},
+    )
+
+    assert response.status_code == 404
+    assert "dp:data_product_1:table_3" in response.json()["detail"]
+    assert TableStatsRepository(session).list("data_product_1") == []
+
+
+def test_buffered_stats_are_saved_in_one_flush(client, engine, tables):
+    buffer = StatsBuffer(session_factory=lambda: Session(engine), interval=3600)
+    buffer.add({("data_product_1", "table_1"): TableStats(row_count=1)})
+    buffer.add(
+        {
+            ("data_product_1", "table_1"): TableStats(
+                row_count=2, last_updated=datetime(2024, 1, 1)
+            ),
+            ("data_product_1", "table_2"): TableStats(row_count=3),
+        }
+    )
+
+    assert buffer.flush() == 2
+    assert buffer.flush() == 0
+
+    with Session(engine) as session:
+        stats = {
+            row.table_name: (row.row_count, row.last_updated)
+            for row in TableStatsRepository(session).list("data_product_1")
+        }
+    assert stats == {
+        "table_1": (2, datetime(2024, 1, 1)),
+        "table_2": (3, None),
+    }
+
+
+def test_buffered_stats_are_kept_if_saving_fails(client, engine, tables):
+    def fail():
+        raise RuntimeError("Database is down")
+
+    buffer = StatsBuffer(session_factory=fail, interval=3600)
+    buffer.add({("data_product_1", "table_1"): TableStats(row_count=1)})
+    with pytest.raises(RuntimeError):
+        buffer.flush()
+
+    buffer.add({("data_product_1", "table_1"): TableStats(row_count=2)})
+    buffer.session_factory = lambda: Session(engine)
+    assert buffer.flush() == 1
+
+    with Session(engine) as session:
+        stats = TableStatsRepository(session).fetch("data_product_1", "table_1")
+        assert stats.row_count == 2
@@ -0,0 +1,195 @@
+import pytest
+import requests
+
+from daap_api.config import settings
+from daap_api.models.api.metadata_api_models import MAX_UPLOAD_PART_NUMBER
+from daap_api.services.file_validation import file_validator
+from daap_api.services.multipart_uploads import multipart_uploads
+
+schema = {
+    "tableDescription": "abcd",
+    "columns": [{"name": "id", "type": "bigint", "description": "identifier"}],
+}
+
+PART_SIZE = 5 * 1024 * 1024
+
+
+@pytest.fixture
+def s3(s3, monkeypatch):
+    monkeypatch.setattr(multipart_uploads, "_client", s3)
+    monkeypatch.setattr(file_validator, "_client", s3)
+    return s3
+
+
+@pytest.fixture
+def table(client, create_data_product):
+    create_data_product("data_product_1")
+    client.post("/v1/schemas/dp:data_product_1:table_1", json=schema)
+    return "dp:data_product_1:table_1"
+
+
+def start_upload(client, table, filename="statement.csv"):
+    response = client.post(f"/v1/schemas/{table}/uploads", json={"filename": filename})
+    assert response.status_code == 200
+    return response.json()
+
+
+def upload_parts(client, table, upload, parts: list[bytes]) -> list[dict]:
+    response = client.post(
+        f"/v1/schemas/{table}/uploads/{upload['uploadId']}/parts",
+        json={"key": upload["key"], "partNumbers": list(range(1, len(parts) + 1))},
+    )
+    assert response.status_code == 200
+    urls = response.json()["parts"]
+
+    uploaded = []
+    for url, body in zip(urls, parts):
+        put = requests.put(url["url"], data=body)
+        assert put.status_code == 200
+        uploaded.append({"partNumber": url["partNumber"], "etag": put.headers["ETag"]})
+    return uploaded
+
+
+def test_upload_a_file_in_parts(client, s3, table):
+    upload = start_upload(client, table)
+    assert upload["key"].startswith("data_product_1/table_1/")
+    assert upload["key"].endswith("/statement.csv")
+
+    parts = [b"a" * PART_SIZE, b"b" * 10]
+    uploaded = upload_parts(client, table, upload, parts)
+
+    response = client.post(
+        f"/v1/schemas/{table}/uploads/{upload['uploadId']}/complete",
+        json={"key": upload["key"], "parts": uploaded[::-1]},
+    )
+    assert response.status_code == 200
+    assert response.json()["key"] == upload["key"]
+
+    body = s3.get_object(Bucket=settings.landing_zone_bucket_name, Key=upload["key"])
+    assert body["Body"].read() == b"".join(parts)
+
+
+def test_abort_upload(client, s3, table):
+    upload = start_upload(client, table)
+    upload_parts(client, table, upload, [b"a" * 10])
+
+    response = client.delete(
+        f"/v1/schemas/{table}/uploads/{upload['uploadId']}",
+        params={"key": upload["key"]},
+    )
+    assert response.status_code == 204
+    assert "Uploads" not in s3.list_multipart_uploads(
+        Bucket=settings.landing_zone_bucket_name
+    )
+
+    response = client.delete(
+        f"/v1/schemas/{table}/uploads/{upload['uploadId']}",
+        params={"key": upload["key"]},
+    )
+    assert response.status_code == 404
+
+
+def test_upload_to_unknown_schema(client, s3, table):
+    response = client.post(
+        "/v1/schemas/dp:data_product_1:table_2/uploads",
+        json={"filename": "statement.csv"},
+    )
+    assert response.status_code == 404
+
+    response = client.post(
+        "/v1/schemas/data_product_1/uploads", json={"filename": "statement.csv"}
+    )
+    assert response.status_code == 400
+
+
+def test_upload_key_must_belong_to_schema(client, s3, table):
+    upload = start_upload(client, table)
+
+    response = client.post(
+        f"/v1/schemas/{table}/uploads/{upload['uploadId']}/parts",
+        json={"key": "data_product_2/table_1/statement.csv", "partNumbers": [1]},
+    )
+    assert response.status_code == 400
+
+
+def test_invalid_uploads_are_rejected(client, s3, table):
+    response = client.post(
+        f"/v1/schemas/{table}/uploads", json={"filename": "../statement.csv"}
+    )
+    assert response.status_code == 422
+
+    upload = start_upload(client, table)
+    response = client.post(
+        f"/v1/schemas/{table}/uploads/{upload['uploadId']}/parts",
+        json={"key": upload["key"], "partNumbers": [0]},
+    )
+    assert response.status_code == 422
+
+    response = client.post(
+        f"/v1/schemas/{table}/uploads/{upload['uploadId']}/parts",
+        json={"key": upload["key"], "partNumbers": [MAX_UPLOAD_PART_NUMBER + 1]},
+    )
+    assert response.status_code == 422
+
+    response = client.post(
+        f"/v1/schemas/{table}/uploads/{upload['uploadId']}/parts",
+        json={
+            "key": upload["key"],
+            "partNumbers": list(range(1, settings.upload_max_part_urls + 2)),
+        },
+    )
+    assert response.status_code == 400
+
+    response = client.post(
+        f"/v1/schemas/{table}/uploads/{upload['uploadId']}/complete",
+        json={"key": upload["key"], "parts": [{"partNumber": 1, "etag": "abc"}]},
+    )
+    assert response.status_code == 400
+
+
+def test_validate_uploaded_files(client, s3, table):
+    s3.put_object(
+        Bucket=settings.landing_zone_bucket_name,
+        Key="data_product_1/table_1/abc/valid.csv",
+        Body=b"id\n1\n\n2\n",
+    )
+    s3.put_object(
+        Bucket=settings.landing_zone_bucket_name,
+        Key="data_product_1/table_1/abc/invalid.csv",
+        Body=b"id,name\none,x\n",
+    )
+
+    response = client.post(
+        f"/v1/schemas/{table}/validations",
+        json={
+            "keys": [
+                "data_product_1/table_1/abc/valid.csv",
+                "data_product_1/table_1/abc/invalid.csv",
+            ]
+        },
+    )
+
+    assert response.status_code == 200
+    valid, invalid = response.json()
+    assert valid["valid"]
+    assert valid["rows"] == 2
+    assert valid["columns"] == [
+        {"name": "id", "type": "bigint", "nullCount": 0, "error": None}
+    ]
+    assert not invalid["valid"]
+    assert invalid["unexpectedColumns"] == ["name"]
+    assert invalid["columns"][0]["error"] is not None
+
+
+def test_validate_files_of_another_table(client, s3, table):
+    response = client.post(
+        f"/v1/schemas/{table}/validations",
+        json={"keys": ["data_product_2/table_1/abc/statement.csv"]},
+    )
+    assert response.status_code == 400
+
+    response = client.post(
+        "/v1/schemas/dp:data_product_1:table_2/validations",
+        json={"keys": ["data_product_1/table_2/abc/statement.csv"]},
+    )
+    assert response.status_code == 404
@@ -0,0 +1,155 @@
+from datetime import timedelta
+
+import pytest
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import Session
+
+from daap_api.models.orm.metadata_orm_models import DataProductVersionTable
+from daap_api.models.orm.metadata_repositories import DataProductRepository
+from daap_api.services.version_archive import version_archive
+from daap_api.services.version_archiver import VersionArchiver
+
+schema = {
+    "tableDescription": "abcd",
+    "columns": [{"name": "id", "type": "bigint", "description": "identifier"}],
+}
+
+
+@pytest.fixture
+def s3(s3, monkeypatch):
+    monkeypatch.setattr(version_archive, "_client", s3)
+    yield s3
+    version_archive.clear()
+
+
+@pytest.fixture
+def archiver(engine, s3):
+    return VersionArchiver(
+        session_factory=lambda: Session(engine),
+        archive=version_archive,
+        archive_after=timedelta(days=90),
+        batch_size=2,
+        interval=3600,
+    )
+
+
+@pytest.fixture
+def create_versions(client, create_data_product, update_data_product):
+    """
+    Create a data product with a schema, then update it to count versions
+    """
+
+    def create(name, count):
+        tags = {"sandbox": "true"}
+        create_data_product(name, description="version 0", tags=tags)
+        client.post(f"/v1/schemas/dp:{name}:table_1", json=schema)
+        for n in range(1, count):
+            update_data_product(name, description=f"v{n}", tags=tags)
+
+    return create
+
+
+def supersede(session, days_ago, **filters):
+    session.execute(
+        update(DataProductVersionTable)
+        .filter_by(**filters)
+        .where(DataProductVersionTable.superseded_at.is_not(None))
+        .values(superseded_at=func.now() - timedelta(days=days_ago))
+    )
+    session.commit()
+
+
+def live_versions(session, name):
+    return set(
+        session.execute(
+            select(DataProductVersionTable.version).filter_by(name=name)
+        ).scalars()
+    )
+
+
+def test_superseded_versions_are_marked(client, session, create_versions):
+    create_versions("data_product_1", 2)
+
+    versions = {
+        version.version: version.superseded_at
+        for version in session.execute(select(DataProductVersionTable)).scalars()
+    }
+    assert versions["v1.0"] is not None
+    assert versions["v1.1"] is None
+
+
+def test_only_old_superseded_versions_are_archived(
+    client, session, archiver, create_versions
+):
+    create_versions("data_product_1", 4)
+    create_versions("data_product_2", 2)
+    supersede(session, 100)
+    supersede(session, 10, name="data_product_1", version="v1.2")
+
+    assert archiver.archive_all() == 3
+
+    assert live_versions(session, "data_product_1") == {"v1.2", "v1.3"}
+    assert live_versions(session, "data_product_2") == {"v1.1"}
+    assert archiver.archive_all() == 0
+
+
+def test_archived_versions_are_read_back(client, session, archiver, create_versions):
+    create_versions("data_product_1", 3)
+    repository = DataProductRepository(session)
+    original = repository.fetch("data_product_1", "v1.0")
+    expected = original.to_attributes()
+    expected_schemas = [schema.to_attributes() for schema in original.schemas]
+    session.expire_all()
+
+    supersede(session, 100)
+    archiver.archive_all()
+    assert live_versions(session, "data_product_1") == {"v1.2"}
+
+    # Repositories only load versions from the database
+    assert repository.fetch("data_product_1", "v1.0") is None
+    archived = version_archive.fetch(session, "data_product_1", "v1.0")
+    assert archived.to_attributes() == expected
+    assert archived.superseded_at is not None
+    assert [schema.to_attributes() for schema in archived.schemas] == expected_schemas
+
+    versions = version_archive.fetch_many(
+        session, [("data_product_1", "v1.1"), ("data_product_1", "v1.2")]
+    )
+    assert versions[("data_product_1", "v1.1")].description == "v1"
+    assert versions[("data_product_1", "v1.2")].description == "v2"
+    assert version_archive.fetch(session, "data_product_1", "v9.0") is None
+
+
+def test_archive_files_are_cached(
+    client, session, archiver, s3, monkeypatch, create_versions
+):
+    create_versions("data_product_1", 3)
+    supersede(session, 100)
+    archiver.archive_all()
+
+    reads = []
+    get_object = s3.get_object
+    monkeypatch.setattr(
+        s3, "get_object", lambda **kwargs: reads.append(kwargs) or get_object(**kwargs)
+    )
+    version_archive.fetch(session, "data_product_1", "v1.0")
+    version_archive.fetch(session, "data_product_1", "v1.1")
+    version_archive.fetch(session, "data_product_1", "v1.0")
+
+    assert len(reads) == 1
+
+
+def test_versions_are_not_deleted_if_archiving_fails(
+    client, session, archiver, monkeypatch, create_versions
+):
+    create_versions("data_product_1", 2)
+    supersede(session, 100)
+
+    def fail(*args, **kwargs):
+        raise RuntimeError("S3 is down")
+
+    monkeypatch.setattr(archiver.archive, "write", fail)
+    with pytest.raises(RuntimeError):
+        archiver.archive_all()
+
+    assert live_versions(session, "data_product_1") == {"v1.0", "v1.1"}
@@ -0,0 +1,85 @@
+import asyncio
+
+import httpx
+import pytest
+from fastapi import status
+from sqlalchemy import func, select
+
+from daap_api.main import app
+from daap_api.models.orm.metadata_orm_models import DataProductVersionTable
+from daap_api.services.write_coalescer import write_coalescer
+
+
+@pytest.fixture
+def data_product(data_product_factory):
+    return data_product_factory.create()
+
+
+@pytest.fixture
+def schema(schema_factory, data_product):
+    return schema_factory.create(data_product_version=data_product.current_version)
+
+
+@pytest.fixture
+def coalescing(monkeypatch):
+    monkeypatch.setattr(write_coalescer, "window", 0.1)
+
+
+@pytest.fixture
+def metadata_update(data_product_metadata):
+    return {**data_product_metadata, "description": "Updated description"}
+
+
+def update_concurrently(*requests):
+    async def send_all():
+        async with httpx.AsyncClient(app=app, base_url="http://testserver") as client:
+            return await asyncio.gather(
+                *(client.put(url, **kwargs) for url, kwargs in requests)
+            )
+
+    return asyncio.run(send_all())
+
+
+schema_update = {
+    "tableDescription": "Updated table description",
+    "columns": [
+        {"name": "id", "type": "bigint", "description": "unique identifier"},
+    ],
+}
+
+
+def test_updates_are_coalesced(client, session, schema, coalescing, metadata_update):
+    data_product_response, schema_response = update_concurrently(
+        ("/v1/data-products/dp:hmpps_use_of_force", {"json": metadata_update}),
+        ("/v1/schemas/dp:hmpps_use_of_force:statement", {"json": schema_update}),
+    )
+
+    assert data_product_response.status_code == status.HTTP_200_OK
+    assert schema_response.status_code == status.HTTP_200_OK
+    assert data_product_response.json()["version"] == "v2.0"
+    assert schema_response.json()["dataProduct"]["version"] == "v2.0"
+    assert schema_response.json()["dataProduct"]["description"] == (
+        "Updated description"
+    )
+    assert schema_response.json()["tableDescription"] == "Updated table description"
+    assert (
+        session.execute(
+            select(func.count()).select_from(DataProductVersionTable)
+        ).scalar()
+        == 2
+    )
+
+
+def test_conditional_updates_are_not_coalesced(
+    client, session, schema, coalescing, metadata_update
+):
+    data_product_response, schema_response = update_concurrently(
+        (
+            "/v1/data-products/dp:hmpps_use_of_force",
+            {"json": metadata_update, "headers": {"If-Match": '"v1.0"'}},
+        ),
+        ("/v1/schemas/dp:hmpps_use_of_force:statement", {"json": schema_update}),
+    )
+
+    assert data_product_response.json()["version"] == "v1.1"
+    assert schema_response.json()["dataProduct"]["version"] == "v2.0"
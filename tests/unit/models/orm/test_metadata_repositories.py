@@ -1,24 +1,35 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
 import pytest
-from sqlalchemy import create_engine
+from sqlalchemy import select
+from sqlalchemy.exc import InvalidRequestError
 from sqlalchemy.orm import Session
 from sqlmodel.pool import StaticPool
 
 from daap_api.config import settings
-from daap_api.db import Base
+from daap_api.db import Base, create_database_engine
 from daap_api.models.orm.metadata_orm_models import (
+    ChangeType,
     DataProductVersionTable,
+    JobStatus,
+    JobTable,
     SchemaTable,
     Status,
 )
 from daap_api.models.orm.metadata_repositories import (
+    VERSION_CREATED_JOB,
+    ChangeLogRepository,
     DataProductRepository,
+    JobRepository,
     SchemaRepository,
+    VersionMismatch,
 )
 
 
 @pytest.fixture(name="session")
 def session_fixture():
-    engine = create_engine(settings.database_url_test, poolclass=StaticPool)
+    engine = create_database_engine(settings.database_url_test, poolclass=StaticPool)
     Base.metadata.create_all(engine)
     with Session(engine) as session:
         yield session
@@ -217,3 +228,324 @@ def test_data_product_with_schema(session):
 
 def test_no_schema(session):
     assert SchemaRepository(session).fetch_latest("abc", "def") is None
+
+
+def test_fetch_latest_many(session):
+    repo = DataProductRepository(session)
+    for name in ["data_product_1", "data_product_2"]:
+        repo.create(
+            DataProductVersionTable(
+                name=name,
+                domain="hmpps",
+                description="example data product",
+                data_product_owner="joe.bloggs@justice.gov.uk",
+                data_product_owner_display_name="Joe bloggs",
+                status=Status.draft,
+                email="data-product-contact@justice.gov.uk",
+                retention_period=365,
+                dpia_required=True,
+            )
+        )
+    schema_repo = SchemaRepository(session)
+    schema_repo.create(
+        SchemaTable(
+            name="my_schema",
+            table_description="abc",
+            columns=[],
+            data_product_version=repo.fetch_latest("data_product_1"),
+        )
+    )
+
+    fetched = repo.fetch_latest_many(["data_product_1", "data_product_3"])
+    fetched_schemas = schema_repo.fetch_latest_many(
+        [("data_product_1", "my_schema"), ("data_product_2", "my_schema")]
+    )
+
+    assert list(fetched) == ["data_product_1"]
+    assert [schema.name for schema in fetched["data_product_1"].schemas] == [
+        "my_schema"
+    ]
+    assert list(fetched_schemas) == [("data_product_1", "my_schema")]
+
+
+def test_list_only_loads_requested_fields(session):
+    repo = DataProductRepository(session)
+    repo.create(
+        DataProductVersionTable(
+            name="data_product",
+            domain="hmpps",
+            description="example data product",
+            data_product_owner="joe.bloggs@justice.gov.uk",
+            data_product_owner_display_name="Joe bloggs",
+            status=Status.draft,
+            email="data-product-contact@justice.gov.uk",
+            retention_period=365,
+            dpia_required=True,
+        )
+    )
+    session.expunge_all()
+
+    (data_product,) = repo.list(fields={"version", "status"})
+
+    assert data_product.name == "data_product"
+    assert data_product.version == "v1.0"
+    assert data_product.status == Status.draft
+    with pytest.raises(InvalidRequestError):
+        data_product.description
+
+
+@pytest.fixture
+def data_product(session):
+    return DataProductRepository(session).create(
+        DataProductVersionTable(
+            name="data_product",
+            domain="hmpps",
+            description="example data product",
+            data_product_owner="joe.bloggs@justice.gov.uk",
+            data_product_owner_display_name="Joe bloggs",
+            status=Status.draft,
+            email="data-product-contact@justice.gov.uk",
+            retention_period=365,
+            dpia_required=True,
+        )
+    )
+
+
+def test_update_latest(session, data_product):
+    repo = DataProductRepository(session)
+
+    updated = repo.update_latest(
+        "data_product",
+        lambda current: current.next_minor_version(description="updated"),
+        if_match={"v1.0"},
+    )
+
+    assert updated.version == "v1.1"
+    assert repo.fetch_latest("data_product").description == "updated"
+
+
+def test_update_latest_missing_data_product(session):
+    repo = DataProductRepository(session)
+
+    assert repo.update_latest("data_product", lambda current: current) is None
+
+
+def test_update_latest_version_mismatch(session, data_product):
+    repo = DataProductRepository(session)
+
+    with pytest.raises(VersionMismatch, match="The current version is v1.0"):
+        repo.update_latest(
+            "data_product", lambda current: current.next_minor_version(), {"v0.9"}
+        )
+
+
+def test_update_latest_retries_conflicting_updates(session, data_product):
+    repo = DataProductRepository(session)
+    attempts = []
+
+    def make_version(current):
+        attempts.append(current.version)
+        # The first attempt clashes with an existing version
+        version = "v1.0" if len(attempts) == 1 else "v1.1"
+        return current.copy(version=version, description="updated")
+
+    updated = repo.update_latest("data_product", make_version)
+
+    assert attempts == ["v1.0", "v1.0"]
+    assert updated.version == "v1.1"
+
+
+def test_update_latest_gives_up_after_max_attempts(session, data_product):
+    repo = DataProductRepository(session)
+
+    with pytest.raises(repo.IntegrityError):
+        repo.update_latest(
+            "data_product", lambda current: current.copy(), max_attempts=2
+        )
+
+
+def test_concurrent_updates_are_applied_in_turn(session, data_product):
+    engine = create_database_engine(settings.database_url_test)
+
+    def update(writer):
+        with Session(engine) as writer_session:
+            for n in range(5):
+                DataProductRepository(writer_session).update_latest(
+                    "data_product",
+                    lambda current: current.next_minor_version(
+                        description=f"update {n} from writer {writer}"
+                    ),
+                )
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        list(executor.map(update, range(4)))
+    engine.dispose()
+
+    session.expire_all()
+    assert DataProductRepository(session).fetch_latest("data_product").version == (
+        "v1.20"
+    )
+
+
+def test_removed_schemas_are_recorded_as_deleted(session, data_product):
+    schema_repo = SchemaRepository(session)
+    for name in ["schema_1", "schema_2"]:
+        schema_repo.create(
+            SchemaTable(
+                name=name,
+                table_description="abc",
+                columns=[],
+                data_product_version=data_product,
+            )
+        )
+    repo = DataProductRepository(session)
+    new_version = data_product.next_major_version()
+    new_version.schemas.append(data_product.schemas[1].copy())
+
+    repo.update(data_product.data_product, new_version)
+
+    changes = ChangeLogRepository(session).list(since=3, limit=10)
+    assert [(change.entity_id, change.change) for change in changes] == [
+        ("dp:data_product", ChangeType.updated),
+        ("dp:data_product:schema_1", ChangeType.deleted),
+    ]
+
+
+def test_jobs_are_enqueued_with_new_versions(session, data_product):
+    SchemaRepository(session).create(
+        SchemaTable(
+            name="schema_1",
+            table_description="abc",
+            columns=[],
+            data_product_version=data_product,
+        )
+    )
+    DataProductRepository(session).update_latest(
+        "data_product", lambda current: current.next_minor_version(description="new")
+    )
+
+    jobs = session.query(JobTable).order_by(JobTable.id).all()
+    assert [(job.kind, job.payload) for job in jobs] == [
+        (
+            VERSION_CREATED_JOB,
+            {
+                "dataProduct": "data_product",
+                "version": "v1.0",
+                "previousVersion": None,
+                "tables": None,
+            },
+        ),
+        (
+            VERSION_CREATED_JOB,
+            {
+                "dataProduct": "data_product",
+                "version": "v1.0",
+                "previousVersion": None,
+                "tables": ["schema_1"],
+            },
+        ),
+        (
+            VERSION_CREATED_JOB,
+            {
+                "dataProduct": "data_product",
+                "version": "v1.1",
+                "previousVersion": "v1.0",
+                "tables": None,
+            },
+        ),
+    ]
+
+
+def test_no_job_is_enqueued_if_the_update_fails(session, data_product):
+    with pytest.raises(VersionMismatch):
+        DataProductRepository(session).update_latest(
+            "data_product", lambda current: current.next_minor_version(), {"v0.9"}
+        )
+
+    assert session.query(JobTable).count() == 1
+
+
+@pytest.fixture
+def jobs(session):
+    repo = JobRepository(session)
+    for n in range(5):
+        repo.enqueue("example", {"n": n})
+    repo.enqueue("other", {"n": 5})
+    session.commit()
+    return repo
+
+
+def test_claim_jobs(jobs):
+    claimed = jobs.claim(["example"], limit=3, lease=timedelta(minutes=5))
+
+    assert [(job.payload, job.attempts) for job in claimed] == [
+        ({"n": 0}, 1),
+        ({"n": 1}, 1),
+        ({"n": 2}, 1),
+    ]
+    assert all(job.queued_seconds >= 0 for job in claimed)
+
+    # Claimed jobs are leased, so can't be claimed again until the lease expires
+    claimed = jobs.claim(["example"], limit=3, lease=timedelta(minutes=5))
+    assert [job.payload for job in claimed] == [{"n": 3}, {"n": 4}]
+
+
+def test_expired_leases_can_be_claimed_again(jobs):
+    jobs.claim(["other"], limit=1, lease=timedelta(0))
+
+    claimed = jobs.claim(["other"], limit=1, lease=timedelta(0))
+
+    assert [(job.payload, job.attempts) for job in claimed] == [({"n": 5}, 2)]
+
+
+def test_concurrent_claims_skip_locked_jobs(session, jobs):
+    engine = create_database_engine(settings.database_url_test)
+
+    with Session(engine) as other_session:
+        # Hold the lock on the first job, as a claim in progress would
+        other_session.execute(
+            select(JobTable).where(JobTable.id == 1).with_for_update()
+        )
+
+        claimed = jobs.claim(["example"], limit=2, lease=timedelta(minutes=5))
+
+    engine.dispose()
+    assert [job.id for job in claimed] == [2, 3]
+
+
+def test_retry_and_fail_jobs(session, jobs):
+    claimed = jobs.claim(["example"], limit=2, lease=timedelta(minutes=5))
+
+    jobs.retry([claimed[0].id], "error 1", delay=timedelta(0))
+    jobs.fail([claimed[1].id], "error 2")
+
+    retried, failed = (
+        session.query(JobTable)
+        .filter(JobTable.id.in_([claimed[0].id, claimed[1].id]))
+        .order_by(JobTable.id)
+    )
+    assert (retried.status, retried.last_error) == (JobStatus.pending, "error 1")
+    assert (failed.status, failed.last_error) == (JobStatus.failed, "error 2")
+    assert [
+        job.payload
+        for job in jobs.claim(["example"], limit=10, lease=timedelta(minutes=5))
+    ] == [{"n": 0}, {"n": 2}, {"n": 3}, {"n": 4}]
+
+
+def test_complete_jobs(session, jobs):
+    claimed = jobs.claim(["other"], limit=1, lease=timedelta(minutes=5))
+
+    jobs.complete([job.id for job in claimed])
+
+    assert session.query(JobTable).filter(JobTable.kind == "other").count() == 0
+
+
+def test_job_stats(jobs):
+    claimed = jobs.claim(["example"], limit=2, lease=timedelta(minutes=5))
+    jobs.fail([claimed[0].id], "error")
+
+    assert [tuple(row)[:4] for row in jobs.stats()] == [
+        ("example", 3, 1, 1),
+        ("other", 1, 0, 0),
+    ]
+    assert all(row.oldest_ready_seconds >= 0 for row in jobs.stats())
@@ -0,0 +1,81 @@
+import asyncio
+
+from daap_api.services.background import LazyClient, PeriodicTask
+
+
+class Service:
+    client = LazyClient()
+
+    def __init__(self):
+        self.created = 0
+
+    def client_factory(self):
+        self.created += 1
+        return object()
+
+
+class Counter(PeriodicTask):
+    def __init__(self, interval: float, fail: bool = False):
+        super().__init__(interval)
+        self.runs = 0
+        self.fail = fail
+
+    def run_once(self):
+        self.runs += 1
+        if self.fail:
+            raise RuntimeError("failed")
+
+
+def test_client_is_created_once_when_first_used():
+    service = Service()
+    assert service.created == 0
+
+    assert service.client is service.client
+    assert service.created == 1
+    assert Service().client is not service.client
+
+
+def test_client_can_be_set():
+    service = Service()
+    client = object()
+    service._client = client
+
+    assert service.client is client
+    assert service.created == 0
+
+
+def test_runs_on_start_and_every_interval():
+    async def run():
+        task = Counter(interval=0.05)
+        task.start()
+        assert task.running
+        await asyncio.sleep(0.12)
+        await task.stop()
+        assert not task.running
+        return task.runs
+
+    assert asyncio.run(run()) >= 2
+
+
+def test_wake_runs_again_straight_away():
+    async def run():
+        task = Counter(interval=60)
+        task.start()
+        await asyncio.sleep(0.01)
+        task.wake()
+        await asyncio.sleep(0.01)
+        await task.stop()
+        return task.runs
+
+    assert asyncio.run(run()) == 2
+
+
+def test_keeps_running_after_failures():
+    async def run():
+        task = Counter(interval=0.01, fail=True)
+        task.start()
+        await asyncio.sleep(0.05)
+        await task.stop()
+        return task.runs
+
+    assert asyncio.run(run()) > 1
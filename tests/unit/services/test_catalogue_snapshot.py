@@ -0,0 +1,133 @@
+import asyncio
+
+import pytest
+from freezegun import freeze_time
+
+from daap_api.models.api.metadata_api_models import DataProductRead
+from daap_api.models.orm.metadata_orm_models import (
+    DataProductTable,
+    DataProductVersionTable,
+    SchemaTable,
+    Status,
+)
+from daap_api.services.catalogue_snapshot import (
+    CatalogueCache,
+    CatalogueSnapshot,
+    DataProductRecord,
+)
+
+
+@pytest.fixture
+def data_product_version():
+    version = DataProductVersionTable(
+        name="data_product",
+        domain="hmpps",
+        description="example data product",
+        data_product_owner="joe.bloggs@justice.gov.uk",
+        data_product_owner_display_name="Joe bloggs",
+        status=Status.draft,
+        email="data-product-contact@justice.gov.uk",
+        retention_period=365,
+        dpia_required=True,
+        version="v1.0",
+        tags={},
+    )
+    version.schemas.append(
+        SchemaTable(
+            name="table1",
+            table_description="abc",
+            columns=[{"name": "foo", "type": "string", "description": "abc"}],
+        )
+    )
+    DataProductTable(name="data_product", current_version=version)
+    return version
+
+
+@pytest.fixture
+def cache():
+    cache = CatalogueCache(session_factory=None, max_staleness=5)
+    cache.listening = True
+    return cache
+
+
+def test_record_matches_database_read_model(data_product_version):
+    record = DataProductRecord(data_product_version)
+
+    assert record.to_read_model() == DataProductRead.from_model(data_product_version)
+    assert record.to_read_model(expand_schemas=True) == DataProductRead.from_model(
+        data_product_version, expand_schemas=True
+    )
+
+
+def test_records_share_repeated_strings(data_product_version):
+    record1 = DataProductRecord(data_product_version)
+    record2 = DataProductRecord(data_product_version.next_minor_version())
+
+    assert record1.domain is record2.domain
+    assert record1.status is record2.status
+
+
+def test_snapshot_replace(data_product_version):
+    snapshot = CatalogueSnapshot([DataProductRecord(data_product_version)])
+    new_version = data_product_version.next_minor_version(name="another_product")
+
+    replaced = snapshot.replace(
+        {"data_product": None, "another_product": DataProductRecord(new_version)}
+    )
+
+    assert list(snapshot.data_products) == ["data_product"]
+    assert list(replaced.data_products) == ["another_product"]
+
+
+def test_snapshot_get_schema(data_product_version):
+    snapshot = CatalogueSnapshot([DataProductRecord(data_product_version)])
+
+    assert snapshot.get_schema("data_product", "table1").external_id == (
+        "dp:data_product:v1.0:table1"
+    )
+    assert snapshot.get_schema("data_product", "table2") is None
+    assert snapshot.get_schema("another_product", "table1") is None
+
+
+def test_cache_is_not_used_when_not_listening(cache):
+    cache.snapshot = CatalogueSnapshot([])
+    cache.listening = False
+
+    assert cache.current() is None
+
+
+def test_cache_is_not_used_once_staleness_limit_is_reached(cache):
+    cache.snapshot = CatalogueSnapshot([])
+
+    async def receive_change():
+        # Hold the refresh task so the change is never applied
+        cache._refresh_task = asyncio.get_running_loop().create_future()
+        await cache.on_change({"dataProduct": "data_product"})
+
+    with freeze_time("2024-01-01 00:00:00") as frozen_time:
+        asyncio.run(receive_change())
+        frozen_time.tick(5)
+        assert cache.current() is cache.snapshot
+        frozen_time.tick(1)
+        assert cache.current() is None
+
+
+def test_cache_applies_changes(cache, data_product_version):
+    cache.snapshot = CatalogueSnapshot([])
+    reloaded = []
+
+    def reload(names):
+        reloaded.append(names)
+        cache.snapshot = CatalogueSnapshot([DataProductRecord(data_product_version)])
+
+    cache.reload = reload
+
+    async def receive_change():
+        await cache.on_change({"dataProduct": "data_product"})
+        await cache._refresh_task
+
+    asyncio.run(receive_change())
+
+    assert reloaded == [{"data_product"}]
+    assert cache.stale_since is None
+    assert list(cache.current().data_products) == ["data_product"]
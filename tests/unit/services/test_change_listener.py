@@ -0,0 +1,68 @@
+import asyncio
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+from sqlmodel.pool import StaticPool
+
+from daap_api.config import settings
+from daap_api.db import Base
+from daap_api.models.orm.metadata_orm_models import DataProductVersionTable, Status
+from daap_api.models.orm.metadata_repositories import DataProductRepository
+from daap_api.services.change_listener import ChangeListener, ChangeSubscriber
+
+
+@pytest.fixture(name="session")
+def session_fixture():
+    engine = create_engine(settings.database_url_test, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        yield session
+        Base.metadata.drop_all(engine)
+
+
+class RecordingSubscriber(ChangeSubscriber):
+    def __init__(self):
+        self.connected = asyncio.Event()
+        self.changed = asyncio.Event()
+        self.changes = []
+
+    async def on_connect(self):
+        self.connected.set()
+
+    async def on_change(self, change):
+        self.changes.append(change)
+        self.changed.set()
+
+
+def test_listener_receives_committed_changes(session):
+    data_product_version = DataProductVersionTable(
+        name="data_product",
+        domain="hmpps",
+        description="example data product",
+        data_product_owner="joe.bloggs@justice.gov.uk",
+        data_product_owner_display_name="Joe bloggs",
+        status=Status.draft,
+        email="data-product-contact@justice.gov.uk",
+        retention_period=365,
+        dpia_required=True,
+    )
+
+    async def create_data_product():
+        listener = ChangeListener(settings.database_url_test)
+        subscriber = RecordingSubscriber()
+        listener.subscribe(subscriber)
+        listener.start()
+        try:
+            await asyncio.wait_for(subscriber.connected.wait(), timeout=5)
+            await asyncio.to_thread(
+                DataProductRepository(session).create, data_product_version
+            )
+            await asyncio.wait_for(subscriber.changed.wait(), timeout=5)
+        finally:
+            await listener.stop()
+        return subscriber.changes
+
+    changes = asyncio.run(create_data_product())
+
+    assert changes == [{"dataProduct": "data_product", "version": "v1.0", "seq": 1}]
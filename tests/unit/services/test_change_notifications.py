@@ -0,0 +1,160 @@
+import socket
+
+import httpx
+import pytest
+
+from daap_api.config import settings
+from daap_api.models.orm.metadata_orm_models import DataProductVersionTable, SchemaTable
+from daap_api.services.change_notifications import (
+    NotificationDispatcher,
+    UnsafeURL,
+    check_subscriber_url,
+    describe_changes,
+)
+
+
+@pytest.fixture
+def previous_version():
+    data_product = DataProductVersionTable(name="abc", domain="test", version="v1.0")
+    data_product.schemas.append(
+        SchemaTable(
+            name="table1",
+            columns=[{"name": "foo", "type": "string", "description": "abc"}],
+        )
+    )
+    data_product.schemas.append(
+        SchemaTable(
+            name="table2",
+            columns=[{"name": "bar", "type": "int", "description": ""}],
+        )
+    )
+    return data_product
+
+
+def test_describe_new_data_product(previous_version):
+    assert describe_changes(previous_version) == {
+        "dataProduct": "abc",
+        "version": "v1.0",
+        "previousVersion": None,
+        "schemas": {"table1": {"change": "created"}, "table2": {"change": "created"}},
+    }
+
+
+def test_describe_schema_changes(previous_version):
+    version = previous_version.next_major_version()
+    version.schemas.append(
+        SchemaTable(
+            name="table1",
+            columns=[{"name": "foo", "type": "int", "description": "abc"}],
+        )
+    )
+    version.schemas.append(SchemaTable(name="table3", columns=[]))
+
+    assert describe_changes(version, previous_version) == {
+        "dataProduct": "abc",
+        "version": "v2.0",
+        "previousVersion": "v1.0",
+        "schemas": {
+            "table1": {
+                "change": "updated",
+                "updateType": "MajorUpdate",
+                "columns": {
+                    "removed_columns": None,
+                    "added_columns": None,
+                    "types_changed": ["foo"],
+                    "descriptions_changed": None,
+                },
+                "non_column_fields": None,
+            },
+            "table3": {"change": "created"},
+            "table2": {"change": "deleted"},
+        },
+    }
+
+
+def test_describe_changes_to_some_tables(previous_version):
+    assert describe_changes(previous_version, tables=["table2"])["schemas"] == {
+        "table2": {"change": "created"}
+    }
+
+
+def resolve_to(monkeypatch, *addresses):
+    monkeypatch.setattr(
+        socket,
+        "getaddrinfo",
+        lambda host, port, **kwargs: [
+            (socket.AF_INET, socket.SOCK_STREAM, 6, "", (address, port))
+            for address in addresses
+        ],
+    )
+
+
+@pytest.mark.parametrize(
+    "url",
+    [
+        "https://example.com/notify",
+        "https://93.184.216.34/notify",
+        "https://example.com:8443/notify",
+    ],
+)
+def test_public_https_urls_are_allowed(url):
+    check_subscriber_url(url)
+
+
+@pytest.mark.parametrize(
+    "url",
+    [
+        "http://example.com/notify",
+        "https://127.0.0.1/notify",
+        "https://169.254.169.254/latest/meta-data",
+        "https://192.168.1.1/notify",
+        "https://[fd00:ec2::254]/notify",
+        "https://[::ffff:10.0.0.1]/notify",
+        "https://localhost/notify",
+        "https://metadata.google.internal/notify",
+    ],
+)
+def test_non_public_urls_are_rejected(url):
+    with pytest.raises(UnsafeURL):
+        check_subscriber_url(url)
+
+
+def test_allowed_hosts_can_be_private(monkeypatch):
+    monkeypatch.setattr(settings, "notification_allowed_hosts", ["10.0.0.1"])
+    check_subscriber_url("http://10.0.0.1/notify")
+
+
+def test_notifications_are_sent_to_the_checked_address(monkeypatch):
+    resolve_to(monkeypatch, "93.184.216.34")
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        return httpx.Response(204)
+
+    dispatcher = NotificationDispatcher(max_concurrency=1, timeout=1)
+    dispatcher.client = httpx.Client(transport=httpx.MockTransport(handler))
+    dispatcher.deliver("https://example.com:8443/notify", [{"a": 1}])
+
+    [request] = requests
+    assert request.url == "https://93.184.216.34:8443/notify"
+    assert request.headers["Host"] == "example.com:8443"
+    assert request.extensions["sni_hostname"] == "example.com"
+
+
+def test_notifications_are_not_sent_to_hosts_resolving_to_private_addresses(
+    monkeypatch,
+):
+    resolve_to(monkeypatch, "93.184.216.34", "169.254.169.254")
+    dispatcher = NotificationDispatcher(max_concurrency=1, timeout=1)
+    dispatcher.client = httpx.Client(
+        transport=httpx.MockTransport(lambda request: httpx.Response(204))
+    )
+
+    with pytest.raises(UnsafeURL):
+        dispatcher.deliver("https://example.com/notify", [{"a": 1}])
+
+
+def test_redirects_are_not_followed():
+    dispatcher = NotificationDispatcher(max_concurrency=1, timeout=1)
+    assert not dispatcher.client.follow_redirects
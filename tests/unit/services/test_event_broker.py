@@ -0,0 +1,86 @@
+import asyncio
+
+from daap_api.services.event_broker import (
+    EVICTED_EVENT,
+    KEEPALIVE,
+    RESYNC_EVENT,
+    EventBroker,
+)
+
+
+def change(seq, version="v1.0"):
+    return {"dataProduct": "data_product", "version": version, "seq": seq}
+
+
+def test_events_are_fanned_out_to_every_subscriber():
+    broker = EventBroker(queue_size=10, max_subscribers=2000)
+    subscriptions = [broker.subscribe() for _ in range(2000)]
+
+    asyncio.run(broker.on_change(change(1)))
+
+    for subscription in subscriptions:
+        event = subscription.queue.get_nowait()
+        assert event.seq == 1
+        assert event.data == (
+            b"id: 1\n"
+            b"event: version-created\n"
+            b'data: {"id": "dp:data_product", "version": "v1.0"}\n\n'
+        )
+
+
+def test_slow_subscribers_are_evicted():
+    broker = EventBroker(queue_size=2, max_subscribers=10)
+    slow = broker.subscribe()
+    fast = broker.subscribe()
+
+    async def publish_and_consume():
+        for seq in range(1, 4):
+            await broker.on_change(change(seq))
+            fast.queue.get_nowait()
+
+        return [event async for event in slow.events(keepalive_interval=1)]
+
+    slow_events = asyncio.run(publish_and_consume())
+
+    assert slow_events == [EVICTED_EVENT]
+    assert broker.subscriptions == {fast}
+
+
+def test_subscriber_limit():
+    broker = EventBroker(queue_size=2, max_subscribers=1)
+    subscription = broker.subscribe()
+
+    assert broker.subscribe() is None
+
+    subscription.close()
+
+    assert broker.subscribe() is not None
+
+
+def test_subscribers_are_told_to_resync_on_disconnect():
+    broker = EventBroker(queue_size=2, max_subscribers=10)
+    subscription = broker.subscribe()
+
+    async def disconnect_and_consume():
+        await broker.on_connect()
+        await broker.on_disconnect()
+        return [event async for event in subscription.events(keepalive_interval=1)]
+
+    assert asyncio.run(disconnect_and_consume()) == [RESYNC_EVENT]
+    assert not broker.listening
+    assert not broker.subscriptions
+
+
+def test_keepalives_are_sent_when_idle():
+    broker = EventBroker(queue_size=2, max_subscribers=10)
+    subscription = broker.subscribe()
+
+    async def consume_first_event():
+        events = subscription.events(keepalive_interval=0.01)
+        event = await anext(events)
+        await events.aclose()
+        return event
+
+    assert asyncio.run(consume_first_event()) == KEEPALIVE
+    # Closing the stream ends the subscription
+    assert not broker.subscriptions
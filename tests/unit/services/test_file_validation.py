@@ -0,0 +1,198 @@
+import io
+
+import boto3
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+from botocore.config import Config
+from moto import mock_s3
+
+from daap_api.services.file_validation import FileValidator, arrow_type
+
+columns = [
+    {"name": "id", "type": "bigint", "description": ""},
+    {"name": "amount", "type": "decimal(10,2)", "description": ""},
+    {"name": "code", "type": "varchar(3)", "description": ""},
+    {"name": "created_at", "type": "timestamp", "description": ""},
+]
+
+
+@pytest.fixture
+def s3():
+    with mock_s3():
+        # moto doesn't decode the aws-chunked bodies botocore sends with
+        # checksums, which corrupts objects bigger than a chunk
+        client = boto3.client(
+            "s3",
+            region_name="eu-west-2",
+            config=Config(request_checksum_calculation="when_required"),
+        )
+        client.create_bucket(
+            Bucket="bucket",
+            CreateBucketConfiguration={"LocationConstraint": "eu-west-2"},
+        )
+        yield client
+
+
+def validator(s3, **kwargs):
+    return FileValidator(
+        client_factory=lambda: s3,
+        bucket="bucket",
+        **{"batch_size": 2, "block_size": 64, "processes": 1, **kwargs},
+    )
+
+
+def put_parquet(s3, key, table: pa.Table):
+    buffer = io.BytesIO()
+    pq.write_table(table, buffer)
+    s3.put_object(Bucket="bucket", Key=key, Body=buffer.getvalue())
+
+
+def errors(result) -> dict:
+    return {column.name: column.error for column in result.columns if column.error}
+
+
+@pytest.mark.parametrize(
+    "type,expected",
+    [
+        ("int", (pa.int32(), None)),
+        ("decimal(10, 2)", (pa.decimal128(10, 2), None)),
+        ("char(2)", (pa.string(), 2)),
+        ("varchar(255)", (pa.string(), 255)),
+        ("varchar", (pa.string(), None)),
+        ("timestamp", (pa.timestamp("ms"), None)),
+    ],
+)
+def test_arrow_type(type, expected):
+    assert arrow_type(type) == expected
+
+
+def test_valid_csv(s3):
+    s3.put_object(
+        Bucket="bucket",
+        Key="statement.csv",
+        Body=(
+            b"ID,amount,code,created_at\n"
+            + b"1,2.50,abc,2024-01-01 10:00:00\n" * 10
+            + b"2,,,2024-01-01 10:00:00\n"
+        ),
+    )
+
+    result = validator(s3).validate("statement.csv", columns)
+
+    assert result.valid
+    assert result.rows == 11
+    assert {column.name: column.null_count for column in result.columns} == {
+        "id": 0,
+        "amount": 1,
+        "code": 1,
+        "created_at": 0,
+    }
+
+
+def test_invalid_csv(s3):
+    s3.put_object(
+        Bucket="bucket",
+        Key="statement.csv",
+        Body=(
+            b"id,amount,code,extra\n" + b"1,2.50,abc,x\n" * 10 + b"one,2.501,abcd,x\n"
+        ),
+    )
+
+    result = validator(s3).validate("statement.csv", columns)
+
+    assert not result.valid
+    assert result.missing_columns == ["created_at"]
+    assert result.unexpected_columns == ["extra"]
+    assert set(errors(result)) == {"id", "amount", "code"}
+    assert errors(result)["id"].startswith("From row ")
+    assert "'one'" in errors(result)["id"]
+
+
+@pytest.mark.parametrize("type", ["varchar()", "int_x"])
+def test_column_of_unknown_type(s3, type):
+    s3.put_object(Bucket="bucket", Key="statement.csv", Body=b"id,code\n1,abc\n")
+
+    result = validator(s3).validate(
+        "statement.csv",
+        [
+            {"name": "id", "type": "bigint", "description": ""},
+            {"name": "code", "type": type, "description": ""},
+        ],
+    )
+
+    assert not result.valid
+    assert result.rows == 1
+    assert errors(result) == {"code": f"Unknown column type {type}"}
+
+
+def test_parquet(s3):
+    put_parquet(
+        s3,
+        "valid.parquet",
+        pa.table(
+            {
+                "id": pa.array([1, 2, None, 4, 5], pa.int32()),
+                "amount": pa.array([1.5, 2.25, 3.0, 4.0, 5.0]),
+                "code": ["a", "b", "c", "d", "e"],
+                "created_at": pa.array([0, 1, 2, 3, 4], pa.timestamp("ns")),
+            }
+        ),
+    )
+    put_parquet(
+        s3,
+        "invalid.parquet",
+        pa.table(
+            {
+                "id": pa.array([1, 2, 3, 4, 2**63], pa.uint64()),
+                "amount": pa.array([1, 2, 3, 4, 5.001], pa.float64()).cast(
+                    pa.decimal128(12, 3)
+                ),
+                "code": ["a", "b", "c", "d", "e"],
+                "created_at": ["2024-01-01", "yesterday", None, None, None],
+            }
+        ),
+    )
+
+    result = validator(s3).validate("valid.parquet", columns)
+    assert result.valid
+    assert result.rows == 5
+    assert result.columns[0].null_count == 1
+
+    result = validator(s3).validate("invalid.parquet", columns)
+    assert set(errors(result)) == {"id", "amount", "created_at"}
+    assert errors(result)["id"].startswith("From row 5:")
+    assert errors(result)["created_at"].startswith("From row 1:")
+
+
+def test_unreadable_files(s3):
+    s3.put_object(Bucket="bucket", Key="empty.csv", Body=b"")
+    s3.put_object(Bucket="bucket", Key="not.parquet", Body=b"id,amount\n")
+
+    def error(key):
+        return validator(s3).validate(key, columns).error
+
+    assert error("missing.csv") == "File does not exist"
+    assert error("missing.parquet") == "File does not exist"
+    assert error("empty.csv") == "File is empty"
+    assert error("not.parquet").startswith("File can't be read")
+    assert error("statement.json") == "Files must be one of .csv, .parquet"
+
+
+def test_validate_many_in_processes(s3):
+    s3.put_object(
+        Bucket="bucket",
+        Key="valid.csv",
+        Body=b"id,amount,code,created_at\n1,2.50,abc,2024-01-01 10:00:00\n",
+    )
+    s3.put_object(
+        Bucket="bucket", Key="invalid.csv", Body=b"id,amount,code,created_at\nx,,,\n"
+    )
+    keys = ["valid.csv", "invalid.csv", "missing.csv"]
+
+    # Forked processes share the mocked S3
+    results = validator(s3, processes=2, mp_context="fork").validate_many(keys, columns)
+
+    assert [result.key for result in results] == keys
+    assert [result.valid for result in results] == [True, False, False]
+    assert results == validator(s3).validate_many(keys, columns)
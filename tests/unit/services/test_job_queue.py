@@ -0,0 +1,23 @@
+from daap_api.services.job_queue import JobKindMetrics, retry_delay
+
+
+def test_retry_delay_backs_off_exponentially():
+    delays = [
+        retry_delay(attempts, backoff=1, max_backoff=300) for attempts in range(1, 5)
+    ]
+
+    for delay, expected in zip(delays, [1, 2, 4, 8]):
+        assert expected / 2 <= delay <= expected
+
+
+def test_retry_delay_is_capped():
+    assert 150 <= retry_delay(20, backoff=1, max_backoff=300) <= 300
+
+
+def test_latency_percentiles():
+    metrics = JobKindMetrics()
+    assert metrics.latency_percentiles() == (None, None)
+
+    metrics.latencies.extend(range(1, 101))
+
+    assert metrics.latency_percentiles() == (50.5, 95.05)
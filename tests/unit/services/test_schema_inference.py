@@ -0,0 +1,180 @@
+import io
+
+import boto3
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+from botocore.config import Config
+from moto import mock_s3
+
+from daap_api.services.schema_inference import (
+    InvalidParquet,
+    ObjectNotFound,
+    SchemaInference,
+    UnsupportedTypes,
+    athena_type,
+)
+
+
+@pytest.fixture
+def s3():
+    with mock_s3():
+        # moto doesn't decode the aws-chunked bodies botocore sends with
+        # checksums, which corrupts objects bigger than a chunk
+        client = boto3.client(
+            "s3",
+            region_name="eu-west-2",
+            config=Config(request_checksum_calculation="when_required"),
+        )
+        client.create_bucket(
+            Bucket="bucket",
+            CreateBucketConfiguration={"LocationConstraint": "eu-west-2"},
+        )
+        yield client
+
+
+@pytest.fixture
+def reads(s3, monkeypatch):
+    """
+    Record the range and size of each read
+    """
+    reads = []
+    get_object = s3.get_object
+
+    def record(**kwargs):
+        response = get_object(**kwargs)
+        body = response["Body"].read()
+        reads.append((kwargs["Range"], len(body)))
+        response["Body"] = io.BytesIO(body)
+        return response
+
+    monkeypatch.setattr(s3, "get_object", record)
+    return reads
+
+
+def put_parquet(s3, key, table: pa.Table) -> int:
+    buffer = io.BytesIO()
+    pq.write_table(table, buffer)
+    s3.put_object(Bucket="bucket", Key=key, Body=buffer.getvalue())
+    return len(buffer.getvalue())
+
+
+def inference(s3, **kwargs):
+    return SchemaInference(client_factory=lambda: s3, buckets=["bucket"], **kwargs)
+
+
+@pytest.mark.parametrize(
+    "type,expected",
+    [
+        (pa.bool_(), "boolean"),
+        (pa.int8(), "tinyint"),
+        (pa.int16(), "smallint"),
+        (pa.int32(), "int"),
+        (pa.int64(), "bigint"),
+        (pa.uint8(), "smallint"),
+        (pa.uint32(), "bigint"),
+        (pa.uint64(), "decimal(20,0)"),
+        (pa.float32(), "float"),
+        (pa.float64(), "double"),
+        (pa.decimal128(10, 2), "decimal(10,2)"),
+        (pa.string(), "string"),
+        (pa.large_string(), "string"),
+        (pa.dictionary(pa.int32(), pa.string()), "string"),
+        (pa.date32(), "date"),
+        (pa.timestamp("us", tz="UTC"), "timestamp"),
+    ],
+)
+def test_athena_type(type, expected):
+    assert athena_type(type) == expected
+
+
+@pytest.mark.parametrize(
+    "type", [pa.binary(), pa.list_(pa.int64()), pa.decimal256(40, 2), pa.time64("us")]
+)
+def test_types_with_no_athena_equivalent(type):
+    with pytest.raises(TypeError):
+        athena_type(type)
+
+
+def test_infer_schema(s3):
+    put_parquet(
+        s3,
+        "statement.parquet",
+        pa.table(
+            {
+                "ID": pa.array([1, 2], pa.int64()),
+                "amount": pa.array([None, None], pa.decimal128(10, 2)),
+                "status": pa.array(["open", "closed"]).dictionary_encode(),
+            }
+        ),
+    )
+
+    assert inference(s3).infer("bucket", "statement.parquet") == {
+        "tableDescription": "",
+        "columns": [
+            {"name": "id", "type": "bigint", "description": ""},
+            {"name": "amount", "type": "decimal(10,2)", "description": ""},
+            {"name": "status", "type": "string", "description": ""},
+        ],
+    }
+
+
+def test_only_the_footer_is_read(s3, reads):
+    size = put_parquet(
+        s3, "big.parquet", pa.table({"id": pa.array(range(1_000_000), pa.int64())})
+    )
+
+    inference(s3).infer("bucket", "big.parquet")
+
+    assert len(reads) == 1
+    assert reads[0][1] < size / 10
+
+
+def test_large_footers_are_read_in_two_requests(s3, reads):
+    put_parquet(
+        s3,
+        "wide.parquet",
+        pa.table({f"column_{i}": pa.array([i], pa.int32()) for i in range(10000)}),
+    )
+
+    schema = inference(s3).infer("bucket", "wide.parquet")
+
+    assert len(schema["columns"]) == 10000
+    assert schema["columns"][-1] == {
+        "name": "column_9999",
+        "type": "int",
+        "description": "",
+    }
+    assert len(reads) == 2
+
+
+def test_small_files_are_read_whole(s3, reads):
+    put_parquet(s3, "small.parquet", pa.table({"id": [1]}))
+
+    inference(s3, footer_read_size=1024 * 1024).infer("bucket", "small.parquet")
+
+    assert len(reads) == 1
+
+
+def test_unsupported_columns_are_reported(s3):
+    put_parquet(
+        s3,
+        "nested.parquet",
+        pa.table({"id": [1], "tags": [["a"]], "blob": pa.array([b"x"], pa.binary())}),
+    )
+
+    with pytest.raises(UnsupportedTypes) as error:
+        inference(s3).infer("bucket", "nested.parquet")
+    assert set(error.value.columns) == {"tags", "blob"}
+
+
+def test_files_that_are_not_parquet(s3):
+    s3.put_object(Bucket="bucket", Key="statement.csv", Body=b"id,amount\n1,2\n")
+    s3.put_object(Bucket="bucket", Key="corrupt.parquet", Body=b"\xff" * 8 + b"PAR1")
+
+    with pytest.raises(InvalidParquet):
+        inference(s3).infer("bucket", "statement.csv")
+    with pytest.raises(InvalidParquet):
+        inference(s3).infer("bucket", "corrupt.parquet")
+    with pytest.raises(ObjectNotFound):
+        inference(s3).infer("bucket", "missing.parquet")
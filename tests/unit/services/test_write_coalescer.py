@@ -0,0 +1,104 @@
+import asyncio
+
+from daap_api.services.write_coalescer import PendingUpdate, WriteCoalescer
+
+
+def test_merge_updates():
+    update = PendingUpdate(
+        metadata={"description": "first", "domain": "HMPPS"},
+        schemas={"table1": {"table_description": "first", "columns": []}},
+    )
+
+    update.merge(
+        PendingUpdate(
+            metadata={"description": "second"},
+            schemas={
+                "table1": {"table_description": "second"},
+                "table2": {"table_description": "new"},
+            },
+        )
+    )
+
+    assert update == PendingUpdate(
+        metadata={"description": "second", "domain": "HMPPS"},
+        schemas={
+            "table1": {"table_description": "second", "columns": []},
+            "table2": {"table_description": "new"},
+        },
+    )
+
+
+def test_updates_are_applied_immediately_without_a_window():
+    applied = []
+    coalescer = WriteCoalescer(window=0)
+
+    async def submit_both():
+        return await asyncio.gather(
+            coalescer.submit("dp", PendingUpdate(metadata={"a": 1}), applied.append),
+            coalescer.submit("dp", PendingUpdate(metadata={"b": 2}), applied.append),
+        )
+
+    asyncio.run(submit_both())
+
+    assert applied == [
+        PendingUpdate(metadata={"a": 1}),
+        PendingUpdate(metadata={"b": 2}),
+    ]
+
+
+def test_updates_within_window_are_applied_once():
+    applied = []
+    coalescer = WriteCoalescer(window=0.05)
+
+    def apply(update):
+        applied.append(update)
+        return f"v1.{len(applied)}"
+
+    async def submit_all():
+        return await asyncio.gather(
+            coalescer.submit("dp1", PendingUpdate(metadata={"a": 1}), apply),
+            coalescer.submit("dp1", PendingUpdate(schemas={"t": {"x": 1}}), apply),
+            coalescer.submit("dp1", PendingUpdate(metadata={"a": 2}), apply),
+            coalescer.submit("dp2", PendingUpdate(metadata={"a": 3}), apply),
+        )
+
+    results = asyncio.run(submit_all())
+
+    assert results == ["v1.1", "v1.1", "v1.1", "v1.2"]
+    assert applied == [
+        PendingUpdate(metadata={"a": 2}, schemas={"t": {"x": 1}}),
+        PendingUpdate(metadata={"a": 3}),
+    ]
+
+
+def test_updates_after_window_are_applied_separately():
+    applied = []
+    coalescer = WriteCoalescer(window=0.01)
+
+    async def submit_in_turn():
+        for value in (1, 2):
+            await coalescer.submit(
+                "dp", PendingUpdate(metadata={"a": value}), applied.append
+            )
+
+    asyncio.run(submit_in_turn())
+
+    assert len(applied) == 2
+
+
+def test_errors_are_raised_to_every_caller():
+    coalescer = WriteCoalescer(window=0.01)
+
+    def apply(update):
+        raise ValueError("Invalid update")
+
+    async def submit_both():
+        return await asyncio.gather(
+            coalescer.submit("dp", PendingUpdate(), apply),
+            coalescer.submit("dp", PendingUpdate(), apply),
+            return_exceptions=True,
+        )
+
+    results = asyncio.run(submit_both())
+
+    assert [str(result) for result in results] == ["Invalid update"] * 2
@@ -77,6 +77,46 @@ class TestVersioningService:
         )
         assert result.version == "v1.0"
 
+    def test_combined_update(self, service):
+        result = service.apply_updates(
+            metadata={"domain": "test2"},
+            schemas={
+                "table1": {"table_description": "new description"},
+                "table2": {
+                    "columns": [
+                        {"name": "bar", "type": "int", "description": ""},
+                        {"name": "baz", "type": "int", "description": ""},
+                    ]
+                },
+            },
+        )
+        assert result.version == "v1.1"
+        assert result.domain == "test2"
+        assert [schema.table_description for schema in result.schemas] == [
+            "new description",
+            None,
+        ]
+        assert len(result.schemas[1].columns) == 2
+
+    def test_combined_update_with_major_change(self, service):
+        result = service.apply_updates(
+            metadata={"domain": "test2"},
+            schemas={"table2": {"columns": []}},
+        )
+        assert result.version == "v2.0"
+        assert result.domain == "test2"
+
+    def test_noop_combined_update(self, service):
+        result = service.apply_updates(
+            metadata={"domain": "test"},
+            schemas={"table1": {"table_description": None}},
+        )
+        assert result.version == "v1.0"
+
+    def test_cannot_update_missing_schema(self, service):
+        with pytest.raises(InvalidUpdate):
+            service.apply_updates(schemas={"table3": {"table_description": "abc"}})
+
     def test_cannot_update_name(self, service):
         with pytest.raises(InvalidUpdate):
             service.update_metadata(name="new_name")
@@ -0,0 +1,29 @@
+from freezegun import freeze_time
+
+from daap_api.cache import TTLCache
+
+
+def test_get_missing_key():
+    assert TTLCache(ttl=1, max_size=10).get("abc") is None
+
+
+def test_entries_expire():
+    with freeze_time("2024-01-01 00:00:00") as frozen_time:
+        cache = TTLCache(ttl=5, max_size=10)
+        cache.set("abc", 1)
+        frozen_time.tick(4)
+        assert cache.get("abc") == 1
+        frozen_time.tick(1)
+        assert cache.get("abc") is None
+
+
+def test_least_recently_used_entries_are_evicted():
+    cache = TTLCache(ttl=60, max_size=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
@@ -0,0 +1,152 @@
+import logging
+import threading
+
+import pytest
+import sqlalchemy as sa
+from alembic.migration import MigrationContext
+from alembic.operations import Operations
+from sqlalchemy.exc import OperationalError
+
+from daap_api.config import settings
+from migrations.helpers import (
+    backfill,
+    create_index_concurrently,
+    drop_index_concurrently,
+    set_timeouts,
+    timeouts,
+)
+
+
+@pytest.fixture
+def engine():
+    engine = sa.create_engine(settings.database_url_test)
+    with engine.begin() as connection:
+        connection.execute(sa.text("DROP TABLE IF EXISTS widgets"))
+        connection.execute(
+            sa.text(
+                "CREATE TABLE widgets (id serial PRIMARY KEY, name text, copy text)"
+            )
+        )
+        connection.execute(
+            sa.text(
+                "INSERT INTO widgets (name) "
+                "SELECT 'widget_' || n FROM generate_series(1, 25) AS n"
+            )
+        )
+    yield engine
+    with engine.begin() as connection:
+        connection.execute(sa.text("DROP TABLE widgets"))
+
+
+@pytest.fixture
+def connection(engine):
+    with engine.connect() as connection:
+        context = MigrationContext.configure(connection)
+        with Operations.context(context), context.begin_transaction():
+            yield connection
+
+
+def index_names(engine):
+    return {index["name"] for index in sa.inspect(engine).get_indexes("widgets")}
+
+
+def test_create_and_drop_index_concurrently(engine, connection):
+    create_index_concurrently("ix_widgets_name", "widgets", ["name"])
+    # Rerunning a migration is harmless
+    create_index_concurrently("ix_widgets_name", "widgets", ["name"])
+
+    assert index_names(engine) == {"ix_widgets_name"}
+
+    drop_index_concurrently("ix_widgets_name", "widgets")
+    drop_index_concurrently("ix_widgets_name", "widgets")
+
+    assert index_names(engine) == set()
+
+
+def test_create_index_concurrently_replaces_invalid_index(engine, connection):
+    create_index_concurrently("ix_widgets_name", "widgets", ["name"])
+    with engine.begin() as other:
+        other.execute(
+            sa.text(
+                "UPDATE pg_index SET indisvalid = false "
+                "WHERE indexrelid = 'ix_widgets_name'::regclass"
+            )
+        )
+
+    create_index_concurrently("ix_widgets_name", "widgets", ["name"])
+
+    valid = connection.execute(
+        sa.text(
+            "SELECT indisvalid FROM pg_index "
+            "WHERE indexrelid = 'ix_widgets_name'::regclass"
+        )
+    ).scalar()
+    assert valid
+
+
+def test_backfill_updates_rows_in_batches(connection, caplog):
+    caplog.set_level(logging.INFO, logger="alembic.helpers")
+
+    updated = backfill("widgets", "copy = name", "copy IS NULL", batch_size=10)
+
+    assert updated == 25
+    assert len(caplog.records) == 3
+    assert (
+        caplog.records[-1].message == "Backfilled 25 rows of widgets (100% of id range)"
+    )
+    assert (
+        connection.execute(
+            sa.text("SELECT count(*) FROM widgets WHERE copy = name")
+        ).scalar()
+        == 25
+    )
+
+
+def test_backfill_can_resume(connection):
+    backfill("widgets", "copy = name", "id <= 5")
+
+    assert backfill("widgets", "copy = name", "copy IS NULL", batch_size=10) == 20
+
+
+def test_backfill_empty_table(connection):
+    connection.execute(sa.text("DELETE FROM widgets"))
+
+    assert backfill("widgets", "copy = name") == 0
+
+
+def test_lock_timeout(engine, connection):
+    set_timeouts(connection, lock_timeout="50ms")
+
+    with engine.connect() as other:
+        other.execute(sa.text("LOCK TABLE widgets IN ACCESS EXCLUSIVE MODE"))
+
+        with pytest.raises(OperationalError, match="lock timeout"):
+            connection.execute(sa.text("ALTER TABLE widgets ADD COLUMN size int"))
+
+
+def test_timeouts_are_restored(connection):
+    set_timeouts(connection, lock_timeout="5s", statement_timeout="1min")
+
+    with timeouts(lock_timeout="1min", statement_timeout="0"):
+        assert connection.execute(sa.text("SHOW lock_timeout")).scalar() == "1min"
+        assert connection.execute(sa.text("SHOW statement_timeout")).scalar() == "0"
+
+    assert connection.execute(sa.text("SHOW lock_timeout")).scalar() == "5s"
+    assert connection.execute(sa.text("SHOW statement_timeout")).scalar() == "1min"
+
+
+def test_create_index_concurrently_waits_for_older_transactions(engine, connection):
+    set_timeouts(connection, lock_timeout="50ms")
+
+    with engine.connect() as other:
+        # A concurrent build waits for open transactions that have written to
+        # the table to finish
+        other.execute(sa.text("UPDATE widgets SET copy = name WHERE id = 1"))
+        finish = threading.Timer(0.5, other.commit)
+        finish.start()
+
+        create_index_concurrently("ix_widgets_name", "widgets", ["name"])
+        finish.join()
+
+    assert index_names(engine) == {"ix_widgets_name"}
+    assert connection.execute(sa.text("SHOW lock_timeout")).scalar() == "50ms"